@@ -0,0 +1,214 @@
+"""
+Compares how many slow kiosk connections one pod can serve concurrently with
+sync gunicorn workers versus uvicorn (ASGI) workers.
+
+Each client opens a connection, sends half of its request, stalls for --client-delay
+seconds (like a kiosk on a poor mobile link) and then finishes the request with a bearer token.
+The token is checked against a local fake OIDC userinfo endpoint that answers after
+--upstream-delay seconds, like the round trip to Google on every API request.
+A sync worker is blocked while it waits, an ASGI worker keeps serving other connections.
+
+Run from the src directory with the same environment as the API (database migrated):
+
+    python -m benchmarks.asgi_capacity --workers 2 --connections 100
+
+Results are printed as JSON, one entry per mode. "concurrent_requests" is the average number
+of requests the pod had in flight past the client stall, i.e. its concurrent-connection capacity
+(a sync pod tops out at its worker count).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARK_EMAIL = "asgi-benchmark@example.com"
+
+MODES = {
+    "sync": {
+        "app": "config.wsgi:application",
+        "worker_class": "sync",
+        "path": "/api/v1/products/",
+    },
+    "asgi": {
+        "app": "config.asgi:application",
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "path": "/api/v1/async/products/",
+    },
+}
+
+
+def start_fake_userinfo(delay):
+    """Serves OIDC userinfo claims for the benchmark user after the given delay"""
+
+    class UserInfoHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps({"sub": "asgi-benchmark", "email": BENCHMARK_EMAIL}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), UserInfoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def create_benchmark_user():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+    from shop.models import User
+
+    User.objects.get_or_create(
+        email=BENCHMARK_EMAIL, defaults={"role": User.CUSTOMER, "openid_sub": "asgi-benchmark"}
+    )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s.")
+
+
+async def slow_client(port, path, headers, client_delay, timeout):
+    """Sends a request in two parts with a stall in between and returns (status, latency)"""
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n".encode())
+        await writer.drain()
+        await asyncio.sleep(client_delay)
+        extra = "".join(f"{header}\r\n" for header in ["Authorization: Bearer asgi-benchmark", *headers])
+        writer.write(f"{extra}Connection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+        status = status_line.split()[1].decode() if status_line else "closed"
+    except (OSError, asyncio.TimeoutError):
+        status = "timeout"
+    return status, time.monotonic() - started
+
+
+async def run_load(port, path, headers, connections, client_delay, timeout):
+    started = time.monotonic()
+    results = await asyncio.gather(
+        *(slow_client(port, path, headers, client_delay, timeout) for _ in range(connections))
+    )
+    return results, time.monotonic() - started
+
+
+def benchmark_mode(mode, args, userinfo_url):
+    config = MODES[mode]
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(args.workers),
+            "--worker-class",
+            config["worker_class"],
+            "--timeout",
+            str(int(args.timeout * 2)),
+            "--log-level",
+            "warning",
+            config["app"],
+        ],
+        env={**os.environ, "OIDC_OP_USER_ENDPOINT": userinfo_url},
+    )
+    try:
+        wait_for_port(port)
+        path = args.path or config["path"]
+        results, wall_time = asyncio.run(
+            run_load(port, path, args.header, args.connections, args.client_delay, args.timeout)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for status, latency in results if status != "timeout")
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    served = len(latencies)
+    return {
+        "mode": mode,
+        "workers": args.workers,
+        "connections": args.connections,
+        "client_delay": args.client_delay,
+        "upstream_delay": args.upstream_delay,
+        "served": served,
+        "statuses": statuses,
+        "wall_time": round(wall_time, 3),
+        "latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+        "latency_max": round(latencies[-1], 3) if latencies else None,
+        "requests_per_second": round(served / wall_time, 1),
+        "concurrent_requests": round(
+            served * args.upstream_delay / max(wall_time - args.client_delay, 0.001), 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes per pod")
+    parser.add_argument("--connections", type=int, default=100, help="concurrent slow clients")
+    parser.add_argument("--client-delay", type=float, default=0.5, help="seconds each client stalls")
+    parser.add_argument(
+        "--upstream-delay", type=float, default=0.3, help="seconds the fake userinfo call takes"
+    )
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-client timeout in seconds")
+    parser.add_argument("--path", help="override the request path for every mode")
+    parser.add_argument(
+        "--header",
+        action="append",
+        default=[],
+        help='extra request header, e.g. "Authorization: Bearer <token>"',
+    )
+    args = parser.parse_args()
+
+    create_benchmark_user()
+    userinfo = start_fake_userinfo(args.upstream_delay)
+    userinfo_url = f"http://127.0.0.1:{userinfo.server_port}/userinfo"
+    try:
+        results = [benchmark_mode(mode, args, userinfo_url) for mode in args.modes]
+    finally:
+        userinfo.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Compares how long SMS wait behind slow emails when every task shares one Celery queue
+against the dedicated sms/email queues and worker profiles used in production (compose.prod.yaml).
+
+The tasks only sleep for --sms-time / --email-time seconds, like a gateway or SMTP round trip,
+so no database, gateway or SMTP server is needed. Workers are started as subprocesses against a
+local Redis broker (--broker, a spare database by default) and both modes get the same total concurrency.
+
+    python -m benchmarks.celery_throughput --messages 200 --concurrency 4
+
+Results are printed as JSON, one entry per mode. "stored_results" counts the result keys the
+run left in Redis; pass --store-results to see what the tasks wrote before results were ignored.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from celery import Celery
+
+BROKER_URL = os.environ.get("BENCHMARK_BROKER_URL", "redis://localhost:6379/15")
+WAIT_KEY = "benchmark:celery:wait:{}"
+
+app = Celery("benchmarks", broker=BROKER_URL, backend=BROKER_URL)
+app.conf.update(
+    task_default_queue="default",
+    task_ignore_result=os.environ.get("BENCHMARK_STORE_RESULTS") != "1",
+    worker_hijack_root_logger=False,
+)
+
+
+def record_wait(kind, enqueued_at, duration):
+    wait = time.time() - enqueued_at
+    time.sleep(duration)
+    with app.connection_for_write() as connection:
+        connection.default_channel.client.rpush(WAIT_KEY.format(kind), wait)
+
+
+@app.task(name="benchmark.sms")
+def sms(enqueued_at, duration):
+    record_wait("sms", enqueued_at, duration)
+
+
+@app.task(name="benchmark.email")
+def email(enqueued_at, duration):
+    record_wait("email", enqueued_at, duration)
+
+
+def worker_profiles(mode, concurrency):
+    """Returns the (queue, concurrency, extra options) of each worker a mode runs, as in compose.prod.yaml"""
+    if mode == "shared":
+        return [("default", concurrency, ["--prefetch-multiplier=4"])]
+    sms_concurrency = max(concurrency // 2, 1)
+    return [
+        ("sms", sms_concurrency, ["--prefetch-multiplier=4"]),
+        ("email", max(concurrency - sms_concurrency, 1), ["--prefetch-multiplier=1", "-O", "fair"]),
+    ]
+
+
+def start_workers(mode, args):
+    env = dict(
+        os.environ, BENCHMARK_BROKER_URL=args.broker, BENCHMARK_STORE_RESULTS=str(int(args.store_results))
+    )
+    workers = []
+    for queue, concurrency, options in worker_profiles(mode, args.concurrency):
+        command = [
+            sys.executable,
+            "-m",
+            "celery",
+            "-A",
+            "benchmarks.celery_throughput",
+            "worker",
+            "-Q",
+            queue,
+            "-n",
+            f"{queue}@benchmark",
+            f"--concurrency={concurrency}",
+            *options,
+            "--without-gossip",
+            "--without-mingle",
+            "--loglevel=warning",
+        ]
+        workers.append(subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL))
+
+    deadline = time.monotonic() + 30
+    while len(app.control.ping(timeout=0.5)) < len(workers):
+        if time.monotonic() > deadline:
+            raise RuntimeError("Celery workers did not start.")
+    return workers
+
+
+def stop_workers(workers):
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.wait(timeout=30)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def benchmark_mode(mode, args):
+    with app.connection_for_write() as connection:
+        redis = connection.default_channel.client
+        redis.flushdb()
+
+        workers = start_workers(mode, args)
+        try:
+            started = time.perf_counter()
+            # a burst of new orders: each sends an admin email and a customer SMS
+            for _ in range(args.messages):
+                email.apply_async(
+                    (time.time(), args.email_time), queue="default" if mode == "shared" else "email"
+                )
+                sms.apply_async((time.time(), args.sms_time), queue="default" if mode == "shared" else "sms")
+
+            deadline = time.monotonic() + args.timeout
+            while (
+                redis.llen(WAIT_KEY.format("sms")) + redis.llen(WAIT_KEY.format("email")) < 2 * args.messages
+            ):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Tasks did not finish within {args.timeout} seconds.")
+                time.sleep(0.05)
+            wall_time = time.perf_counter() - started
+        finally:
+            stop_workers(workers)
+
+        sms_waits = [float(wait) for wait in redis.lrange(WAIT_KEY.format("sms"), 0, -1)]
+        email_waits = [float(wait) for wait in redis.lrange(WAIT_KEY.format("email"), 0, -1)]
+        stored_results = sum(1 for _ in redis.scan_iter("celery-task-meta-*"))
+        redis.flushdb()
+
+    return {
+        "mode": mode,
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "tasks_per_second": round(2 * args.messages / wall_time, 1),
+        "sms_wait_p50": round(statistics.median(sms_waits), 3),
+        "sms_wait_p95": round(percentile(sms_waits, 0.95), 3),
+        "email_wait_p50": round(statistics.median(email_waits), 3),
+        "stored_results": stored_results,
+        "wall_time": round(wall_time, 3),
+    }
+
+
+MODES = ("shared", "routed")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--messages", type=int, default=200, help="orders, each queues one SMS and one email")
+    parser.add_argument("--concurrency", type=int, default=4, help="total worker slots in each mode")
+    parser.add_argument("--sms-time", type=float, default=0.01, help="seconds an SMS send takes")
+    parser.add_argument("--email-time", type=float, default=0.2, help="seconds an SMTP send takes")
+    parser.add_argument("--broker", default=BROKER_URL, help="Redis database the benchmark may flush")
+    parser.add_argument("--store-results", action="store_true", help="store task results, as before")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    app.conf.broker_url = app.conf.result_backend = args.broker
+    app.conf.task_ignore_result = not args.store_results
+    results = [benchmark_mode(mode, args) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
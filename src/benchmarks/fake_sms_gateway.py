@@ -0,0 +1,120 @@
+"""
+Local stand-in for the AfricasTalking SMS API, for benchmarking SMS sending offline.
+
+It answers POST /version1/messaging like the real API (one "Success" entry per recipient)
+after --latency seconds, and counts the TCP connections it accepts, so connection reuse is visible.
+With --fail-status it answers every request with that HTTP status instead, to inject outages.
+
+    python -m benchmarks.fake_sms_gateway --port 8090 --latency 0.05
+
+then point the app at it with AT_API_URL=http://127.0.0.1:8090.
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeSMSGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, fail_status=None):
+        self.latency = latency
+        self.fail_status = fail_status
+        self.connections = 0
+        self.requests = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+        super().__init__(address, FakeSMSHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, connections=0, requests=0, messages=0):
+        with self._lock:
+            self.connections += connections
+            self.requests += requests
+            self.messages += messages
+
+
+class FakeSMSHandler(BaseHTTPRequestHandler):
+    # keep connections open between requests, like the real API
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # headers and body are written separately, don't let Nagle hold the body back on reused connections
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count(connections=1)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        recipients = form.get("to", [""])[0].split(",")
+        time.sleep(self.server.latency)
+
+        if self.server.fail_status:
+            self.server.count(requests=1)
+            self.send_error(self.server.fail_status)
+            return
+
+        self.server.count(requests=1, messages=len(recipients))
+
+        body = json.dumps(
+            {
+                "SMSMessageData": {
+                    "Message": f"Sent to {len(recipients)}/{len(recipients)} Total Cost: KES 0.8000",
+                    "Recipients": [
+                        {
+                            "statusCode": 101,
+                            "number": number,
+                            "status": "Success",
+                            "cost": "KES 0.8000",
+                            "messageId": f"ATXid_{self.server.messages}_{index}",
+                        }
+                        for index, number in enumerate(recipients)
+                    ],
+                }
+            }
+        ).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_sms_gateway(port=0, latency=0.0, fail_status=None):
+    """Starts the gateway in a background thread and returns it, call shutdown() to stop it"""
+    server = FakeSMSGateway(("127.0.0.1", port), latency=latency, fail_status=fail_status)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--fail-status", type=int, help="answer every request with this HTTP status")
+    args = parser.parse_args()
+
+    server = FakeSMSGateway(("127.0.0.1", args.port), latency=args.latency, fail_status=args.fail_status)
+    print(f"Fake SMS gateway listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
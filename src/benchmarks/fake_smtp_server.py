@@ -0,0 +1,87 @@
+"""
+Minimal local SMTP server for exercising the email path offline.
+
+It accepts mail without delivering it and counts sessions and messages.
+With --fail it answers every connection with "421 Service not available", to inject outages.
+
+    python -m benchmarks.fake_smtp_server --port 8025
+
+then point the app at it with EMAIL_HOST=127.0.0.1 EMAIL_PORT=8025 EMAIL_USE_TLS=False.
+"""
+
+import argparse
+import socketserver
+import threading
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, fail=False):
+        self.fail = fail
+        self.sessions = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+        super().__init__(address, FakeSMTPHandler)
+
+    def count(self, sessions=0, messages=0):
+        with self._lock:
+            self.sessions += sessions
+            self.messages += messages
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.count(sessions=1)
+        if self.server.fail:
+            self.reply("421 Service not available")
+            return
+
+        self.reply("220 localhost fake SMTP")
+        while line := self.rfile.readline():
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.server.count(messages=1)
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+
+def start_fake_smtp_server(port=0, fail=False):
+    """Starts the server in a background thread and returns it, call shutdown() to stop it"""
+    server = FakeSMTPServer(("127.0.0.1", port), fail=fail)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail", action="store_true", help="refuse every connection with a 421 reply")
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(("127.0.0.1", args.port), fail=args.fail)
+    print(f"Fake SMTP server listening on 127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
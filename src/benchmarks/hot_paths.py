@@ -0,0 +1,313 @@
+"""
+Times the order and catalog hot paths at several data volumes, so releases can be compared.
+
+For each catalog size in --scales the benchmark seeds products (and a customer), then measures:
+
+* ``place_order`` and ``approve_order`` for each basket size in --baskets
+* ``product_list`` - GET /api/v1/products/ (unpaginated, so skipped above --list-max products)
+* ``bulk_upload`` - POST /api/v1/products/bulk_upload/ with a --upload-rows row CSV
+
+Every operation runs --repeat times and reports its median and p95 time and its query count.
+Notification and catalog snapshot scheduling, and rate limiting, are switched off, so only the
+request path's own database work is measured.
+
+The benchmark runs in a separate test database (``test_<name>``), never the configured one.
+Use --keepdb to keep it, and the seeded products, for the next run: seeding 1M products takes minutes.
+Run from the src directory with the same environment as the API:
+
+    python -m benchmarks.hot_paths --scales 1000 100000 --output results.json
+    python -m benchmarks.hot_paths --scales 1000 100000 --baseline results.json --threshold 0.2
+    python -m benchmarks.hot_paths --compare before.json after.json
+
+With --baseline or --compare, the exit status is 1 if any operation got slower than the
+threshold allows or runs more queries than before.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+SEED_BATCH_SIZE = 5000
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database(keepdb):
+    """Runs the block against a freshly migrated test database, with the test client's host allowed"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def request_path_only():
+    """Switches off the side effects that talk to Redis or Celery"""
+    with ExitStack() as stack:
+        stack.enter_context(patch("shop.outbox.schedule_outbox_drain"))
+        stack.enter_context(patch("shop.signals.schedule_catalog_snapshot"))
+        stack.enter_context(patch("shop.throttling.TokenBucketThrottle.allow_request", return_value=True))
+        yield
+
+
+def seed_products(count, rng):
+    """Tops the catalog up to ``count`` products, with enough stock that approvals never run out"""
+    from shop.models import Category, Product
+
+    category, _ = Category.objects.get_or_create(name="Benchmark")
+    existing = Product.objects.count()
+    while existing < count:
+        batch = min(SEED_BATCH_SIZE, count - existing)
+        Product.objects.bulk_create(
+            Product(
+                name=f"Benchmark product {existing + i}",
+                category=category,
+                price=Decimal(rng.randint(50, 50000)) / 100,
+                stock=1_000_000,
+            )
+            for i in range(batch)
+        )
+        existing += batch
+
+
+def get_users():
+    from shop.models import User
+
+    customer, _ = User.objects.get_or_create(
+        email="customer@hot-paths.example.com",
+        defaults={"role": User.CUSTOMER, "phone_number": "+254700000001"},
+    )
+    admin, _ = User.objects.get_or_create(
+        email="admin@hot-paths.example.com", defaults={"role": User.ADMIN, "is_staff": True}
+    )
+    return customer, admin
+
+
+class QueryCounter:
+    """Counts queries without logging their SQL, unlike CaptureQueriesContext, so it adds no overhead"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(operation, repeat, setup=lambda: None):
+    """Runs ``operation(setup())`` ``repeat`` times, returning its timings (ms) and query count"""
+    from django.db import connection
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        arg = setup()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            operation(arg)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(sorted(timings)[min(int(len(timings) * 0.95), len(timings) - 1)], 3),
+        "queries": max(queries),
+    }
+
+
+def benchmark_orders(scale, basket_size, customer, product_ids, rng, repeat):
+    from shop.models import Order
+
+    def new_order():
+        return Order.objects.create(customer=customer)
+
+    placed = []
+
+    def place(order):
+        order.place_order(
+            [(product_id, rng.randint(1, 3)) for product_id in rng.sample(product_ids, basket_size)]
+        )
+        placed.append(order)
+
+    results = [{"operation": "place_order", **measure(place, repeat, new_order)}]
+    results.append(
+        {"operation": "approve_order", **measure(lambda order: order.approve_order(), repeat, placed.pop)}
+    )
+    return [{**result, "scale": scale, "basket_size": basket_size} for result in results]
+
+
+def upload_csv(rows, offset):
+    content = io.StringIO()
+    writer = csv.DictWriter(content, fieldnames=["name", "category", "price", "stock"])
+    writer.writeheader()
+    for i in range(rows):
+        writer.writerow(
+            {"name": f"Uploaded {offset + i}", "category": "Uploads", "price": "9.99", "stock": 10}
+        )
+    upload = io.BytesIO(content.getvalue().encode("utf-8"))
+    upload.name = "products.csv"
+    return upload
+
+
+def check_response(response):
+    if response.status_code >= 300:
+        raise RuntimeError(f"Request failed with status {response.status_code}: {response.content[:200]!r}")
+
+
+def benchmark_catalog(scale, admin, args):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    results = []
+
+    if scale <= args.list_max:
+        result = measure(lambda _: check_response(client.get("/api/v1/products/")), args.list_repeat)
+        results.append({"operation": "product_list", **result})
+
+    uploads = iter(range(0, args.repeat * args.upload_rows, args.upload_rows))
+    result = measure(
+        lambda upload: check_response(
+            client.post("/api/v1/products/bulk_upload/", {"file": upload}, format="multipart")
+        ),
+        args.repeat,
+        lambda: upload_csv(args.upload_rows, next(uploads)),
+    )
+    results.append({"operation": "bulk_upload", "rows": args.upload_rows, **result})
+    return [{**result, "scale": scale} for result in results]
+
+
+def run(args):
+    from shop.models import Product
+
+    rng = random.Random(args.seed)
+    results = []
+    with test_database(args.keepdb), request_path_only():
+        customer, admin = get_users()
+        for scale in sorted(args.scales):
+            started = time.perf_counter()
+            seed_products(scale, rng)
+            print(f"Seeded {scale} products in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+            product_ids = list(Product.objects.order_by("id").values_list("id", flat=True)[:scale])
+            for basket_size in args.baskets:
+                results.extend(benchmark_orders(scale, basket_size, customer, product_ids, rng, args.repeat))
+            results.extend(benchmark_catalog(scale, admin, args))
+    return results
+
+
+def result_key(result):
+    return result["operation"], result["scale"], result.get("basket_size")
+
+
+def compare(baseline, current, threshold):
+    """Returns a line per operation measured in both runs, and whether any of them regressed"""
+    previous = {result_key(result): result for result in baseline}
+    lines, regressed = [], False
+    for result in current:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else 1
+        slower = ratio > 1 + threshold
+        more_queries = result["queries"] > before["queries"]
+        regressed = regressed or slower or more_queries
+        operation, scale, basket_size = result_key(result)
+        label = f"{operation} scale={scale}" + (f" basket={basket_size}" if basket_size else "")
+        lines.append(
+            f"{'REGRESSION' if slower or more_queries else 'ok':<10} {label:<40} "
+            f"{before['median_ms']:>10.2f}ms -> {result['median_ms']:>10.2f}ms ({ratio - 1:+.0%}), "
+            f"queries {before['queries']} -> {result['queries']}"
+        )
+    return lines, regressed
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--scales", nargs="+", type=int, default=[1000, 10000], help="products in the catalog"
+    )
+    parser.add_argument("--baskets", nargs="+", type=int, default=[1, 10, 50], help="items per order")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each operation")
+    parser.add_argument("--list-repeat", type=int, default=3, help="runs of the product listing")
+    parser.add_argument("--list-max", type=int, default=100_000, help="largest catalog to list")
+    parser.add_argument("--upload-rows", type=int, default=100, help="CSV rows per bulk upload")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for prices and baskets")
+    parser.add_argument(
+        "--keepdb", action="store_true", help="keep the seeded test database for the next run"
+    )
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this earlier JSON output")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two outputs, no run"
+    )
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    if args.compare:
+        lines, regressed = compare(
+            load_results(args.compare[0]), load_results(args.compare[1]), args.threshold
+        )
+        print("\n".join(lines))
+        sys.exit(1 if regressed else 0)
+
+    setup_django()
+    from django.db import connection
+
+    results = run(args)
+    output = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "args": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "baseline", "compare")
+            },
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        lines, regressed = compare(load_results(args.baseline), results, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Reports what the API spends its start-up time importing, so the cost can be tracked across releases.
+
+A fresh interpreter runs with ``-X importtime`` and loads what a gunicorn worker loads before its
+first request: config.wsgi (Django setup, apps, middleware) and shop.warmup.import_application
+(URLconf, views, serializers, DRF classes). The report lists:
+
+* ``total_ms`` - median wall time of --repeat fresh imports
+* ``packages`` - import time per top-level package (django, rest_framework, shop, ...), counting
+  each module's own time, so a package is not charged for the packages it imports
+* ``modules`` - the modules with the most import time of their own
+
+Run from the src directory with the same environment as the API:
+
+    python -m benchmarks.import_time --output startup.json
+    python -m benchmarks.import_time --baseline startup.json --threshold 0.2
+
+With --baseline, the exit status is 1 if start-up got slower than the threshold allows.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+IMPORT_CODE = """
+import time
+started = time.perf_counter()
+import config.wsgi
+from shop.warmup import import_application
+import_application()
+print(time.perf_counter() - started)
+"""
+
+# "import time:       412 |       1790 |     django.db.models"
+IMPORT_TIME_REGEX = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)$")
+
+
+def run_import():
+    """Returns the wall time of one fresh import (seconds) and its -X importtime lines"""
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_CODE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr.splitlines()
+
+
+def parse_import_times(lines):
+    """Returns [(module, self microseconds, cumulative microseconds)] from -X importtime output"""
+    imports = []
+    for line in lines:
+        match = IMPORT_TIME_REGEX.match(line)
+        if match:
+            self_us, cumulative_us, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def summarize(imports, top):
+    """Adds up the modules' own import time per package, and ranks the modules by it"""
+    packages = defaultdict(int)
+    for module, self_us, _ in imports:
+        packages[module.split(".")[0]] += self_us
+    modules = sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "modules_imported": len(imports),
+        "packages": [
+            {"package": package, "self_ms": round(us / 1000, 1)}
+            for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        "modules": [
+            {
+                "module": module,
+                "self_ms": round(self_us / 1000, 1),
+                "cumulative_ms": round(cumulative_us / 1000, 1),
+            }
+            for module, self_us, cumulative_us in modules
+        ],
+    }
+
+
+def compare(baseline, current, threshold):
+    """Returns report lines for the total and each package, and whether the total regressed"""
+    ratio = current["total_ms"] / baseline["total_ms"] if baseline["total_ms"] else 1
+    regressed = ratio > 1 + threshold
+    lines = [
+        f"{'REGRESSION' if regressed else 'ok':<10} {'total':<30} "
+        f"{baseline['total_ms']:>8.1f}ms -> {current['total_ms']:>8.1f}ms ({ratio - 1:+.0%})"
+    ]
+    before = {package["package"]: package["self_ms"] for package in baseline["packages"]}
+    for package in current["packages"]:
+        if package["package"] in before:
+            lines.append(
+                f"{'':<10} {package['package']:<30} "
+                f"{before[package['package']]:>8.1f}ms -> {package['self_ms']:>8.1f}ms"
+            )
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="fresh imports to time")
+    parser.add_argument("--top", type=int, default=25, help="packages and modules to list")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="compare with this earlier JSON report")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    # the first run compiles the bytecode, which a deployed image already has
+    run_import()
+    timings, lines = [], []
+    for _ in range(args.repeat):
+        seconds, lines = run_import()
+        timings.append(seconds)
+
+    report = {
+        "total_ms": round(statistics.median(timings) * 1000, 1),
+        **summarize(parse_import_times(lines), args.top),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            lines, regressed = compare(json.load(f), report, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Measures the database work done by the OIDC login path.
+
+Each login runs what the OIDC callback does once the provider has answered:
+CustomOIDCBackend.get_or_create_user (claim sync) followed by django.contrib.auth.login.
+The provider's userinfo call is stubbed out, so only the app's own work is measured.
+
+Two modes are compared:
+
+* ``legacy`` - full ``user.save()`` on every login and a synchronous ``last_login`` UPDATE.
+* ``current`` - diff-based claim sync and ``last_login`` queued in Redis, flushed in one batch.
+
+Run from the src directory with the same environment as the API (database migrated, Redis up):
+
+    python -m benchmarks.login --users 200 --logins 2000 --threads 8
+
+Results are printed as JSON, one entry per mode.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from importlib import import_module
+
+BENCHMARK_DOMAIN = "login-benchmark.example.com"
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+
+def make_backends():
+    from shop.backends import CustomOIDCBackend
+
+    class StubbedUserinfoMixin:
+        """Returns the benchmark user's claims instead of calling the provider"""
+
+        def get_userinfo(self, access_token, id_token, payload):
+            return {"sub": access_token, "email": f"{access_token}@{BENCHMARK_DOMAIN}"}
+
+    class CurrentBackend(StubbedUserinfoMixin, CustomOIDCBackend):
+        pass
+
+    class LegacyBackend(StubbedUserinfoMixin, CustomOIDCBackend):
+        def update_user(self, user, claims):
+            user.email = claims.get("email", user.email)
+            user.phone_number = claims.get("phone_number", user.phone_number)
+            user.save()
+            return user
+
+    return {"legacy": LegacyBackend, "current": CurrentBackend}
+
+
+@contextmanager
+def last_login_receiver(mode):
+    """Connects the last_login receiver the mode uses for the duration of the block"""
+    from django.contrib.auth.models import update_last_login
+    from django.contrib.auth.signals import user_logged_in
+
+    from shop.last_login import record_last_login
+
+    receivers = {"legacy": update_last_login, "current": record_last_login}
+    for dispatch_uid in ("update_last_login", "record_last_login"):
+        user_logged_in.disconnect(dispatch_uid=dispatch_uid)
+    user_logged_in.connect(receivers[mode], dispatch_uid="benchmark_last_login")
+    try:
+        yield
+    finally:
+        user_logged_in.disconnect(dispatch_uid="benchmark_last_login")
+
+
+def create_benchmark_users(count):
+    from shop.models import User
+
+    existing = set(User.objects.filter(email__endswith=BENCHMARK_DOMAIN).values_list("openid_sub", flat=True))
+    subs = [f"login-benchmark-{i}" for i in range(count)]
+    User.objects.bulk_create(
+        [
+            User(email=f"{sub}@{BENCHMARK_DOMAIN}", openid_sub=sub, role=User.CUSTOMER)
+            for sub in subs
+            if sub not in existing
+        ]
+    )
+    return subs
+
+
+def login(backend_class, sub):
+    from django.conf import settings
+    from django.contrib.auth import login as auth_login
+    from django.test import RequestFactory
+
+    request = RequestFactory().get("/api/v1/oidc/callback/")
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    user = backend_class().get_or_create_user(sub, None, None)
+    auth_login(request, user, backend="shop.backends.CustomOIDCBackend")
+
+
+def count_queries(backend_class, subs):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        for sub in subs:
+            login(backend_class, sub)
+    statements = [query["sql"].lstrip().split(" ", 1)[0].upper() for query in context.captured_queries]
+    writes = sum(statement in ("INSERT", "UPDATE", "DELETE") for statement in statements)
+    return len(statements) / len(subs), writes / len(subs)
+
+
+def run_logins(backend_class, subs, logins, threads):
+    from django.db import connections
+
+    def worker(index):
+        try:
+            for i in range(index, logins, threads):
+                login(backend_class, subs[i % len(subs)])
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return time.perf_counter() - started
+
+
+def benchmark_mode(mode, backend_class, subs, args):
+    from shop.last_login import flush_last_logins
+
+    with last_login_receiver(mode):
+        queries, writes = count_queries(backend_class, subs[: args.sample])
+        wall_time = run_logins(backend_class, subs, args.logins, args.threads)
+
+    flush_started = time.perf_counter()
+    flushed = flush_last_logins()
+    flush_time = time.perf_counter() - flush_started
+
+    return {
+        "mode": mode,
+        "users": len(subs),
+        "logins": args.logins,
+        "threads": args.threads,
+        "queries_per_login": round(queries, 2),
+        "writes_per_login": round(writes, 2),
+        "logins_per_second": round(args.logins / wall_time, 1),
+        "wall_time": round(wall_time, 3),
+        "last_login_rows_flushed": flushed,
+        "flush_time": round(flush_time, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--modes", nargs="+", choices=["legacy", "current"], default=["legacy", "current"])
+    parser.add_argument("--users", type=int, default=200, help="distinct users logging in")
+    parser.add_argument("--logins", type=int, default=2000, help="total logins per mode")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent logins")
+    parser.add_argument("--sample", type=int, default=20, help="logins used to count queries")
+    args = parser.parse_args()
+
+    setup_django()
+    backends = make_backends()
+    subs = create_benchmark_users(args.users)
+    results = [benchmark_mode(mode, backends[mode], subs, args) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Stress test for concurrent order placement and approval on a few hot products.
+
+--workers threads, each with its own database connection, place orders and approve orders placed
+by the others for --duration seconds. Most basket items (--hot-ratio) come from --hot-products products
+with --stock units each, so row locks are contended and stock runs out during the run.
+place_order and approve_order already retry deadlocks and serialization failures themselves
+(shop.db_retry). Those retries are read from the ekiosk_db_transaction_retries_total and
+ekiosk_db_transaction_retries_exhausted_total metrics and reported under "transaction_retries".
+Errors that still reach the harness, lock timeouts included, are retried up to --max-retries times.
+
+At the end it checks the invariants the order code must keep:
+
+* no product's stock is negative
+* stock is conserved: initial stock - units in completed orders == current stock
+  (no lost updates, no overselling)
+* every order's total_price matches its items
+* every approval that reported success left a completed order
+
+Run it against a local PostgreSQL (SQLite serializes writers, so it can only smoke-test the harness).
+It uses a separate test database (``test_<name>``), never the configured one:
+
+    DB_ENGINE=django.db.backends.postgresql python -m benchmarks.order_stress --workers 16 --duration 30
+
+Results are printed as JSON. The exit status is 1 if an invariant was violated.
+"""
+
+import argparse
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from .hot_paths import request_path_only, setup_django, test_database
+
+# PostgreSQL error codes worth retrying: the transaction lost a lock race, not a business rule
+RETRYABLE_SQLSTATES = {"40P01": "deadlocks", "40001": "serialization_failures", "55P03": "lock_timeouts"}
+
+
+def get_sqlstate(exc):
+    cause = exc.__cause__
+    return getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(fraction):
+        return round(values[min(int(len(values) * fraction), len(values) - 1)], 3)
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(values[-1], 3)}
+
+
+class Stats:
+    """Counters and latencies shared by the worker threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.latencies = {"place_order": [], "approve_order": []}
+        self.approved_ids = set()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def record(self, operation, milliseconds):
+        with self.lock:
+            self.latencies[operation].append(milliseconds)
+
+
+def seed(args, rng):
+    """Creates the products and a customer per worker: (hot product ids, cold product ids, customers)"""
+    from shop.models import Category, Product, User
+
+    category = Category.objects.create(name="Stress")
+    products = Product.objects.bulk_create(
+        Product(
+            name=f"Stress product {i}",
+            category=category,
+            price=Decimal(rng.randint(100, 10000)) / 100,
+            stock=args.stock,
+        )
+        for i in range(args.hot_products + args.cold_products)
+    )
+    hot = args.hot_products
+    customers = User.objects.bulk_create(
+        User(email=f"stress{i}@stress.example.com", role=User.CUSTOMER, phone_number="+254700000001")
+        for i in range(args.workers)
+    )
+    ids = [product.id for product in products]
+    return ids[:hot], ids[hot:], customers
+
+
+def transaction_retry_counts():
+    """Returns the retry_on_conflict counters of this process, as {kind: {operation: {reason: count}}}"""
+    from prometheus_client import REGISTRY
+
+    from shop.db_retry import RETRYABLE_SQLSTATES as APP_RETRYABLE
+
+    metrics = {
+        "retried": "ekiosk_db_transaction_retries_total",
+        "exhausted": "ekiosk_db_transaction_retries_exhausted_total",
+    }
+    return {
+        kind: {
+            operation: {
+                reason: REGISTRY.get_sample_value(name, {"operation": operation, "reason": reason}) or 0
+                for reason in APP_RETRYABLE.values()
+            }
+            for operation in ("place_order", "approve_order")
+        }
+        for kind, name in metrics.items()
+    }
+
+
+def counts_since(before, after):
+    return {
+        kind: {
+            operation: {
+                reason: int(count - before[kind][operation][reason]) for reason, count in reasons.items()
+            }
+            for operation, reasons in operations.items()
+        }
+        for kind, operations in after.items()
+    }
+
+
+def run_with_retries(operation, stats, max_retries):
+    """Runs ``operation`` again after a retryable database error, with jittered backoff"""
+    from django.db import OperationalError
+
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except OperationalError as e:
+            kind = RETRYABLE_SQLSTATES.get(get_sqlstate(e))
+            if kind is None:
+                stats.count("database_errors")
+                return None
+            stats.count(kind)
+            if attempt == max_retries:
+                stats.count("gave_up")
+                return None
+            stats.count("retries")
+            time.sleep(random.uniform(0, 0.01 * 2**attempt))
+
+
+def pick_basket(rng, hot_ids, cold_ids, args):
+    size = rng.randint(1, args.max_items)
+    items = {}
+    for _ in range(size):
+        pool = hot_ids if not cold_ids or rng.random() < args.hot_ratio else cold_ids
+        product_id = rng.choice(pool)
+        items[product_id] = items.get(product_id, 0) + rng.randint(1, args.max_quantity)
+    return list(items.items())
+
+
+def worker(index, customer, hot_ids, cold_ids, pending, stats, args, deadline):
+    from django.db import IntegrityError, connection
+
+    from shop.models import Order
+
+    rng = random.Random(args.seed + index)
+
+    def place():
+        order = Order.objects.create(customer=customer)
+        order.place_order(pick_basket(rng, hot_ids, cold_ids, args))
+        return order
+
+    def approve(order):
+        try:
+            return order.approve_order()
+        except IntegrityError:
+            # reduce_stock refuses to go below zero
+            stats.count("approvals_out_of_stock")
+            return False
+
+    try:
+        while time.monotonic() < deadline:
+            if rng.random() < args.approve_ratio:
+                try:
+                    order_id = pending.get_nowait()
+                except queue.Empty:
+                    order_id = None
+                if order_id is not None:
+                    started = time.perf_counter()
+                    approved = run_with_retries(
+                        lambda: approve(Order.objects.get(id=order_id)), stats, args.max_retries
+                    )
+                    if approved:
+                        stats.record("approve_order", (time.perf_counter() - started) * 1000)
+                        stats.count("approvals")
+                        with stats.lock:
+                            stats.approved_ids.add(order_id)
+                    continue
+
+            started = time.perf_counter()
+            order = run_with_retries(place, stats, args.max_retries)
+            if order is not None:
+                stats.record("place_order", (time.perf_counter() - started) * 1000)
+                stats.count("placements")
+                pending.put(order.id)
+    except Exception as e:
+        stats.count("worker_crashes")
+        print(f"Worker {index} crashed: {e!r}", file=sys.stderr)
+    finally:
+        connection.close()
+
+
+def check_invariants(args, stats):
+    """Returns {invariant: list of violations}"""
+    from django.db.models import F, Sum
+
+    from shop.models import Order, OrderItem, Product
+
+    sold = dict(
+        OrderItem.objects.filter(order__status=Order.COMPLETED)
+        .values("product")
+        .annotate(units=Sum("quantity"))
+        .values_list("product", "units")
+    )
+    products = list(Product.objects.values_list("id", "stock"))
+    totals = (
+        OrderItem.objects.values("order")
+        .annotate(items_total=Sum(F("price_at_time_of_order") * F("quantity")))
+        .values_list("order", "items_total")
+    )
+    order_totals = dict(Order.objects.values_list("id", "total_price"))
+    completed = set(Order.objects.filter(status=Order.COMPLETED).values_list("id", flat=True))
+
+    return {
+        "stock_never_negative": [product_id for product_id, stock in products if stock < 0],
+        "stock_conserved": [
+            {"product": product_id, "stock": stock, "expected": args.stock - sold.get(product_id, 0)}
+            for product_id, stock in products
+            if stock != args.stock - sold.get(product_id, 0)
+        ],
+        "totals_match_items": [
+            {"order": order_id, "total_price": str(order_totals[order_id]), "items": str(items_total)}
+            for order_id, items_total in totals
+            if order_totals[order_id] != items_total
+        ],
+        "approvals_completed": sorted(stats.approved_ids - completed),
+    }
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    stats = Stats()
+    pending = queue.Queue()
+
+    with test_database(keepdb=False), request_path_only():
+        hot_ids, cold_ids, customers = seed(args, rng)
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(
+                target=worker, args=(i, customers[i], hot_ids, cold_ids, pending, stats, args, deadline)
+            )
+            for i in range(args.workers)
+        ]
+        retries_before = transaction_retry_counts()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - started
+        transaction_retries = counts_since(retries_before, transaction_retry_counts())
+
+        violations = check_invariants(args, stats)
+
+    operations = stats.counts["placements"] + stats.counts["approvals"]
+    return {
+        "workers": args.workers,
+        "duration": round(wall_time, 3),
+        "operations_per_second": round(operations / wall_time, 1),
+        **{
+            name: stats.counts[name]
+            for name in (
+                "placements",
+                "approvals",
+                "approvals_out_of_stock",
+                "retries",
+                *RETRYABLE_SQLSTATES.values(),
+                "gave_up",
+                "database_errors",
+                "worker_crashes",
+            )
+        },
+        # retried inside place_order/approve_order, invisible to the counters above
+        "transaction_retries": transaction_retries,
+        "latency": {operation: percentiles(values) for operation, values in stats.latencies.items()},
+        "invariants": {name: "ok" if not found else found[:20] for name, found in violations.items()},
+    }, any(violations.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, default=8, help="concurrent threads")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--hot-products", type=int, default=5)
+    parser.add_argument("--cold-products", type=int, default=200)
+    parser.add_argument(
+        "--hot-ratio", type=float, default=0.8, help="share of basket items from hot products"
+    )
+    parser.add_argument("--stock", type=int, default=500, help="initial stock of every product")
+    parser.add_argument("--max-items", type=int, default=5, help="most products per basket")
+    parser.add_argument("--max-quantity", type=int, default=3, help="most units per basket item")
+    parser.add_argument("--approve-ratio", type=float, default=0.5, help="share of iterations that approve")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    if connection.vendor != "postgresql":
+        print(
+            f"Running on {connection.vendor}: writers are serialized, expect database errors.",
+            file=sys.stderr,
+        )
+    result, violated = run(args)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if violated else 0)
+
+
+if __name__ == "__main__":
+    main()
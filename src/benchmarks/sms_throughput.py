@@ -0,0 +1,91 @@
+"""
+Compares SMS sending throughput of a fresh AfricasTalking client per send (the SDK's default,
+one new connection per SMS) against the pooled per-process client used by the Celery workers.
+
+Sends go to the local fake gateway (benchmarks.fake_sms_gateway), so no network or API key is needed.
+The fake gateway speaks plain HTTP, so TLS handshakes, the largest saving in production, are not included.
+
+    python -m benchmarks.sms_throughput --messages 500 --threads 8 --latency 0.01
+
+Results are printed as JSON, one entry per mode.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .fake_sms_gateway import start_fake_sms_gateway
+
+
+def setup_django(gateway_url):
+    os.environ["AT_API_URL"] = gateway_url
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+
+def fresh_client_send(number, message):
+    """What send_sms_task did before: initialize the SDK and send through module-level requests.post"""
+    import africastalking
+    from django.conf import settings
+
+    africastalking.initialize(settings.AT_USERNAME, settings.AT_API_KEY)
+    sms = africastalking.SMS
+    sms._baseUrl = sms._contentUrl = settings.AT_API_URL + "/version1"
+    return sms.send(message, [number])
+
+
+def pooled_client_send(number, message):
+    from shop.africastalking_client import get_africastalking_client
+
+    return get_africastalking_client().sms.send(message, [number])
+
+
+MODES = {"fresh": fresh_client_send, "pooled": pooled_client_send}
+
+
+def benchmark_mode(mode, gateway, args):
+    send = MODES[mode]
+    gateway.connections = gateway.messages = 0
+    numbers = [f"+2547{i:08d}" for i in range(args.messages)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(lambda number: send(number, "Benchmark message"), numbers))
+    wall_time = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "messages": args.messages,
+        "threads": args.threads,
+        "latency": args.latency,
+        "sms_per_second": round(args.messages / wall_time, 1),
+        "connections_opened": gateway.connections,
+        "wall_time": round(wall_time, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent sends, like worker concurrency")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake gateway response time in seconds")
+    args = parser.parse_args()
+
+    gateway = start_fake_sms_gateway(latency=args.latency)
+    setup_django(gateway.url)
+    try:
+        results = [benchmark_mode(mode, gateway, args) for mode in args.modes]
+    finally:
+        gateway.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
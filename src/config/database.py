@@ -0,0 +1,48 @@
+"""
+Connection reuse settings for the PostgreSQL databases.
+
+Three modes are supported, selected with DB_CONNECTION_MODE:
+
+* ``persistent`` - each gunicorn/Celery worker thread keeps its connection open for
+  DB_CONN_MAX_AGE seconds and health-checks it before reuse.
+* ``pool`` - psycopg's connection pool, shared by the threads of a worker process.
+* ``pgbouncer`` - persistent connections to a transaction-pooling proxy such as PgBouncer.
+  Server-side cursors are disabled because they do not survive across pooled transactions.
+"""
+
+CONNECTION_MODES = ("persistent", "pool", "pgbouncer")
+
+
+def connection_settings(mode, conn_max_age=60, pool_min_size=2, pool_max_size=10, pool_timeout=10):
+    """
+    Returns the keys to merge into a DATABASES entry for the given connection mode.
+    """
+    if mode not in CONNECTION_MODES:
+        raise ValueError(
+            f"Unknown DB_CONNECTION_MODE {mode!r}, expected one of {', '.join(CONNECTION_MODES)}."
+        )
+
+    if mode == "pool":
+        from psycopg_pool import ConnectionPool
+
+        return {
+            # Django requires persistent connections to be off when pooling
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": pool_min_size,
+                    "max_size": pool_max_size,
+                    "timeout": pool_timeout,
+                    # health check each connection as it is handed out
+                    "check": ConnectionPool.check_connection,
+                }
+            },
+        }
+
+    database_settings = {
+        "CONN_MAX_AGE": conn_max_age,
+        "CONN_HEALTH_CHECKS": True,
+    }
+    if mode == "pgbouncer":
+        database_settings["DISABLE_SERVER_SIDE_CURSORS"] = True
+    return database_settings
@@ -0,0 +1,103 @@
+"""
+gunicorn settings for the API: ``gunicorn -c config/gunicorn.py config.wsgi:application``.
+
+Every setting can be overridden from the environment (GUNICORN_*), or on the command line.
+
+* The application is preloaded in the master, so Django and its dependencies are imported once
+  and shared by the forked workers. Code changes then need a full restart, not a HUP.
+* Workers default to 2 x CPUs + 1, counting the container's CPU limit rather than the host's CPUs.
+  Each runs GUNICORN_THREADS threads: requests mostly wait on PostgreSQL and Redis.
+* Workers are recycled after about GUNICORN_MAX_REQUESTS requests, returning leaked memory.
+* Each worker imports the views and primes its caches (shop.warmup) before accepting requests.
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker writes its metrics to that directory and
+/metrics serves the sum over all workers (shop.metrics).
+"""
+
+import math
+import os
+
+
+def available_cpus():
+    """CPUs this process may use: the cgroup CPU limit when the container has one, else the usable CPUs"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    for quota_file, period_file in (
+        ("/sys/fs/cgroup/cpu.max", None),  # cgroup v2: "<quota> <period>" or "max <period>"
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),  # cgroup v1
+    ):
+        try:
+            with open(quota_file) as f:
+                values = f.read().split()
+            if period_file:
+                with open(period_file) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[-1]
+        except (OSError, IndexError):
+            continue
+        if quota not in ("max", "-1"):
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+        break
+    return cpus
+
+
+def env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+workers = env_int("GUNICORN_WORKERS", 2 * available_cpus() + 1)
+# more than one thread switches the sync worker to gthread; keep DB_POOL_MAX_SIZE at or above it
+threads = env_int("GUNICORN_THREADS", 4)
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 1000)
+# spread the restarts, so the workers are not all recycled at once
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# longer than the load balancer's idle timeout, so it never reuses a connection gunicorn just closed
+keepalive = env_int("GUNICORN_KEEPALIVE", 75)
+# worker heartbeats on a container's overlay filesystem can stall and get workers killed
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+# preloading creates the metrics files, before on_starting runs
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    """Empties the metrics directory, so counters of a previous run's workers are not served"""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def when_ready(server):
+    """With preload, imports the rest of the application once in the master, before any worker forks"""
+    if server.cfg.preload_app:
+        from shop.warmup import import_application
+
+        import_application()
+
+
+def post_worker_init(worker):
+    """Warms the worker up before it accepts its first request"""
+    from shop.warmup import import_application, prime_caches
+
+    import_application()
+    prime_caches()
+
+
+def child_exit(server, worker):
+    """Drops an exited worker's live gauges (in-flight requests) from the aggregated metrics"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -14,6 +14,8 @@ from pathlib import Path
 import environ
 import os
 
+from .database import connection_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,11 +58,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.middleware.HealthCheckMiddleware',
+    'shop.middleware.RequestMetricsMiddleware',
+    'shop.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -100,6 +106,41 @@ DATABASES = {
     }
 }
 
+# Connection reuse for gunicorn and Celery workers: "persistent", "pool" or "pgbouncer".
+# See config/database.py for what each mode configures.
+DB_CONNECTION_MODE = env('DB_CONNECTION_MODE', default='persistent')
+DATABASES['default'].update(
+    connection_settings(
+        DB_CONNECTION_MODE,
+        conn_max_age=env.int('DB_CONN_MAX_AGE', default=60),
+        pool_min_size=env.int('DB_POOL_MIN_SIZE', default=2),
+        pool_max_size=env.int('DB_POOL_MAX_SIZE', default=10),
+        pool_timeout=env.float('DB_POOL_TIMEOUT', default=10),
+    )
+)
+
+# Read replicas share the primary's credentials. Safe-method API requests read from them,
+# see shop.db_routers and shop.middleware.ReplicaRoutingMiddleware.
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(env.list('POSTGRES_REPLICA_HOSTS', default=[])):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['shop.db_routers.PrimaryReplicaRouter']
+
+# How long a client keeps reading from the primary after it writes
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+
+# Order transactions aborted by a deadlock or serialization failure are run again (shop.db_retry)
+DB_RETRY_MAX_RETRIES = env.int('DB_RETRY_MAX_RETRIES', default=3)
+DB_RETRY_BACKOFF = env.float('DB_RETRY_BACKOFF', default=0.05)  # seconds, doubled on each retry
+DB_RETRY_BACKOFF_MAX = env.float('DB_RETRY_BACKOFF_MAX', default=1)  # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -146,20 +187,27 @@ AUTH_USER_MODEL = 'shop.User'
 
 AUTHENTICATION_BACKENDS = [
     "shop.backends.CustomOIDCBackend",
-    "django.contrib.auth.backends.ModelBackend",
+    "shop.backends.CachedModelBackend",
 ]
 
 # OIDC configuration
 OIDC_RP_CLIENT_ID = env('OIDC_RP_CLIENT_ID')
 OIDC_RP_CLIENT_SECRET = env('OIDC_RP_CLIENT_SECRET')
-OIDC_OP_AUTHORIZATION_ENDPOINT = "https://accounts.google.com/o/oauth2/v2/auth"
-OIDC_OP_TOKEN_ENDPOINT = "https://oauth2.googleapis.com/token"
-OIDC_OP_USER_ENDPOINT = "https://openidconnect.googleapis.com/v1/userinfo"
-OIDC_OP_JWKS_ENDPOINT = "https://www.googleapis.com/oauth2/v3/certs"
+OIDC_OP_AUTHORIZATION_ENDPOINT = env('OIDC_OP_AUTHORIZATION_ENDPOINT', default="https://accounts.google.com/o/oauth2/v2/auth")
+OIDC_OP_TOKEN_ENDPOINT = env('OIDC_OP_TOKEN_ENDPOINT', default="https://oauth2.googleapis.com/token")
+OIDC_OP_USER_ENDPOINT = env('OIDC_OP_USER_ENDPOINT', default="https://openidconnect.googleapis.com/v1/userinfo")
+OIDC_OP_JWKS_ENDPOINT = env('OIDC_OP_JWKS_ENDPOINT', default="https://www.googleapis.com/oauth2/v3/certs")
 
 OIDC_RP_SCOPES = "openid email profile"
+
 OIDC_RP_SIGN_ALGO = env('OIDC_RP_SIGN_ALGO', default='RS256')
 
+# Local verification of signed tokens (shop.authentication.JWTAuthentication)
+OIDC_OP_ISSUERS = env.list('OIDC_OP_ISSUERS', default=['https://accounts.google.com', 'accounts.google.com'])
+OIDC_JWKS_MAX_AGE = env.int('OIDC_JWKS_MAX_AGE', default=3600)  # seconds before keys are refreshed in the background
+OIDC_JWKS_MIN_REFRESH_INTERVAL = env.int('OIDC_JWKS_MIN_REFRESH_INTERVAL', default=60)  # seconds
+OIDC_JWT_LEEWAY = env.int('OIDC_JWT_LEEWAY', default=30)  # clock skew allowance in seconds
+
 # Redirect URLs
 LOGIN_URL = "/api/v1/oidc/authenticate/"
 LOGIN_REDIRECT_URL = "/api/v1/"  # Redirect after successful login
@@ -167,14 +215,41 @@ LOGOUT_REDIRECT_URL = "/api/v1/"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'mozilla_django_oidc.contrib.drf.OIDCAuthentication',  # Core OIDC Authentication
+        'shop.authentication.JWTAuthentication',  # Signed ID tokens, verified locally against the JWKS
+        'shop.authentication.CachedOIDCAuthentication',  # Core OIDC Authentication, with validated tokens cached
         'rest_framework.authentication.SessionAuthentication',
     ),
+    # Token-bucket limits per "<scope>.<role>", see shop.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'order_create.customer': env('THROTTLE_ORDER_CREATE_CUSTOMER', default='20/min'),
+        'order_create.admin': env('THROTTLE_ORDER_CREATE_ADMIN', default='120/min'),
+        'bulk_upload.admin': env('THROTTLE_BULK_UPLOAD_ADMIN', default='10/hour'),
+    },
 }
 
+# Validated bearer tokens are cached in Redis (and briefly in process memory) so repeated
+# requests skip the userinfo call. A revoked token stays usable for at most OIDC_TOKEN_CACHE_TTL.
+OIDC_TOKEN_CACHE_TTL = env.int('OIDC_TOKEN_CACHE_TTL', default=300)  # seconds
+OIDC_TOKEN_LRU_SIZE = env.int('OIDC_TOKEN_LRU_SIZE', default=1024)
+OIDC_TOKEN_LRU_TTL = env.int('OIDC_TOKEN_LRU_TTL', default=30)  # seconds
+# how often each process checks whether a user was saved elsewhere, bounding how long it serves a stale user
+OIDC_TOKEN_LRU_SYNC_INTERVAL = env.int('OIDC_TOKEN_LRU_SYNC_INTERVAL', default=1)  # seconds
+USER_CACHE_TTL = env.int('USER_CACHE_TTL', default=300)  # seconds
+
 # Africa's Talking Settings
 AT_USERNAME = 'sandbox'  
 AT_API_KEY = env('ATSK_API_KEY')
+AT_API_URL = env('AT_API_URL', default=None)  # overrides the SDK's API host, e.g. a local fake gateway
+AT_CONNECT_TIMEOUT = env.float('AT_CONNECT_TIMEOUT', default=3.05)  # seconds
+AT_READ_TIMEOUT = env.float('AT_READ_TIMEOUT', default=10)  # seconds
+AT_POOL_SIZE = env.int('AT_POOL_SIZE', default=10)  # keep-alive connections per worker process
+
+# SMS are queued and sent in batches every SMS_BATCH_WINDOW seconds (0 flushes once a worker is free).
+# SMS with the same text share one multi-recipient call, the others are sent concurrently.
+SMS_BATCH_WINDOW = env.int('SMS_BATCH_WINDOW', default=2)
+SMS_BATCH_MAX_SIZE = env.int('SMS_BATCH_MAX_SIZE', default=500)  # queued SMS handled per flush
+SMS_BATCH_MAX_RECIPIENTS = env.int('SMS_BATCH_MAX_RECIPIENTS', default=100)  # recipients per API call
+SMS_BATCH_CONCURRENCY = env.int('SMS_BATCH_CONCURRENCY', default=AT_POOL_SIZE)  # API calls in flight per flush
 
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
 
@@ -182,10 +257,124 @@ CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0' 
+CELERY_TASK_IGNORE_RESULT = True  # every task is fire-and-forget, nothing reads their results
+CELERY_RESULT_EXPIRES = 3600  # seconds, for results a task explicitly chooses to store
+
+# Each queue is consumed by its own worker profile (compose.prod.yaml), so slow SMTP sends or imports never hold up SMS
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'shop.tasks.send_sms_task': {'queue': 'sms'},
+    'shop.tasks.flush_sms_batch_task': {'queue': 'sms'},
+    'shop.tasks.send_email_task': {'queue': 'email'},
+    'shop.tasks.flush_mail_batch_task': {'queue': 'email'},
+    'shop.tasks.build_catalog_snapshot_task': {'queue': 'import'},
+    'shop.tasks.flush_last_login_task': {'queue': 'maintenance'},
+    'shop.tasks.prune_notifications_task': {'queue': 'maintenance'},
+    'shop.tasks.replay_parked_notifications_task': {'queue': 'maintenance'},
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int('CELERY_WORKER_PREFETCH_MULTIPLIER', default=4)
+
+# Prometheus metrics (shop.metrics): the API serves them at /metrics, each Celery worker on CELERY_METRICS_PORT (0 disables)
+# scrapes must send it as a bearer token; without it /metrics is only served when DEBUG is on
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+CELERY_METRICS_PORT = env.int('CELERY_METRICS_PORT', default=0)
+
+# Liveness (/health/) and readiness (/health/ready/) probes (shop.health)
+HEALTH_CHECK_CACHE_SECONDS = env.float('HEALTH_CHECK_CACHE_SECONDS', default=5)  # readiness result reuse
+HEALTH_CHECK_TIMEOUT = env.float('HEALTH_CHECK_TIMEOUT', default=2)  # seconds, for the Redis ping
+
+# Request profiling (shop.profiling): a sample of requests, plus those sending REQUEST_PROFILING_TOKEN
+# in the X-Profile-Token header, is profiled with cProfile and written to REQUEST_PROFILING_DIR
+REQUEST_PROFILING_RATE = env.float('REQUEST_PROFILING_RATE', default=0.0)  # 0.01 profiles 1% of requests
+REQUEST_PROFILING_TOKEN = env('REQUEST_PROFILING_TOKEN', default='')
+REQUEST_PROFILING_DIR = env('REQUEST_PROFILING_DIR', default=os.path.join(BASE_DIR, 'var', 'profiles'))
+REQUEST_PROFILING_MAX_QUERIES = env.int('REQUEST_PROFILING_MAX_QUERIES', default=1000)  # SQL kept per request
+
+# last_login is queued in Redis on login and written in batches (shop.last_login)
+LAST_LOGIN_BATCHING = env.bool('LAST_LOGIN_BATCHING', default=True)
+LAST_LOGIN_FLUSH_INTERVAL = env.int('LAST_LOGIN_FLUSH_INTERVAL', default=60)  # seconds
+
+# Order notifications are written to an outbox table and dispatched after commit (shop.outbox)
+NOTIFICATION_OUTBOX_BATCH_SIZE = env.int('NOTIFICATION_OUTBOX_BATCH_SIZE', default=100)
+NOTIFICATION_OUTBOX_SWEEP_INTERVAL = env.int('NOTIFICATION_OUTBOX_SWEEP_INTERVAL', default=60)  # seconds
+# entries claimed by a drain that died before deleting them are dispatched again after this long
+NOTIFICATION_OUTBOX_CLAIM_TIMEOUT = env.int('NOTIFICATION_OUTBOX_CLAIM_TIMEOUT', default=300)  # seconds
+# sent entries are remembered this long, so a re-dispatched entry is not sent twice
+NOTIFICATION_DELIVERED_TTL = env.int('NOTIFICATION_DELIVERED_TTL', default=86400)  # seconds
+
+# Notification log retention (shop.notification_log)
+NOTIFICATION_RETENTION_DAYS = env.int('NOTIFICATION_RETENTION_DAYS', default=90)
+NOTIFICATION_PRUNE_BATCH_SIZE = env.int('NOTIFICATION_PRUNE_BATCH_SIZE', default=1000)  # rows deleted per statement
+
+# Notification gateway protection (shop.delivery): retries with backoff, per-gateway circuit breakers
+NOTIFICATION_MAX_RETRIES = env.int('NOTIFICATION_MAX_RETRIES', default=5)
+NOTIFICATION_RETRY_BACKOFF = env.int('NOTIFICATION_RETRY_BACKOFF', default=2)  # seconds, doubled on each retry
+NOTIFICATION_RETRY_BACKOFF_MAX = env.int('NOTIFICATION_RETRY_BACKOFF_MAX', default=300)  # seconds
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.int('CIRCUIT_BREAKER_FAILURE_THRESHOLD', default=5)
+CIRCUIT_BREAKER_FAILURE_WINDOW = env.int('CIRCUIT_BREAKER_FAILURE_WINDOW', default=60)  # seconds
+CIRCUIT_BREAKER_RESET_TIMEOUT = env.int('CIRCUIT_BREAKER_RESET_TIMEOUT', default=30)  # seconds open before a trial call
+PARKED_REPLAY_INTERVAL = env.int('PARKED_REPLAY_INTERVAL', default=60)  # seconds
+PARKED_REPLAY_BATCH_SIZE = env.int('PARKED_REPLAY_BATCH_SIZE', default=100)
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-last-login': {
+        'task': 'shop.tasks.flush_last_login_task',
+        'schedule': LAST_LOGIN_FLUSH_INTERVAL,
+    },
+    # sends outbox entries whose drain could not be scheduled after commit
+    'drain-notification-outbox': {
+        'task': 'shop.tasks.drain_notification_outbox_task',
+        'schedule': NOTIFICATION_OUTBOX_SWEEP_INTERVAL,
+    },
+    'replay-parked-notifications': {
+        'task': 'shop.tasks.replay_parked_notifications_task',
+        'schedule': PARKED_REPLAY_INTERVAL,
+    },
+    'prune-notifications': {
+        'task': 'shop.tasks.prune_notifications_task',
+        'schedule': 3600,  # hourly
+    },
+}
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
+EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT = env.int('EMAIL_PORT', default=587)
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')  
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD') 
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=10)  # seconds, so a stalled SMTP server cannot hold a worker
+
+# Admin alerts are queued and sent over one SMTP connection every ADMIN_EMAIL_BATCH_WINDOW seconds (0 sends each at once)
+ADMIN_EMAIL_BATCH_WINDOW = env.int('ADMIN_EMAIL_BATCH_WINDOW', default=5)
+ADMIN_EMAIL_BATCH_MAX_SIZE = env.int('ADMIN_EMAIL_BATCH_MAX_SIZE', default=500)  # queued emails handled per flush
+ADMIN_EMAIL_DIGEST = env.bool('ADMIN_EMAIL_DIGEST', default=False)  # roll each batch up into one digest email
+
+# Cache for users and validated bearer tokens
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('CACHE_URL', default='redis://redis:6379/2'),
+    },
+    # Sessions get their own database so clearing the cache does not log everyone out
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('SESSION_CACHE_URL', default='redis://redis:6379/3'),
+    },
+}
+
+# Sessions live in Redis, so session-authenticated requests do not query django_session
+SESSION_ENGINE = env('SESSION_ENGINE', default='django.contrib.sessions.backends.cache')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Redis used by the app itself (catalog snapshots, schedulers); kept apart from the Celery broker database
+REDIS_URL = env('REDIS_URL', default='redis://redis:6379/1')
+
+# Catalog snapshot served to kiosks on cold start.
+# "redis" shares one snapshot across all pods, "disk" needs the directory on a volume shared with workers.
+CATALOG_SNAPSHOT_STORAGE = env('CATALOG_SNAPSHOT_STORAGE', default='redis')
+CATALOG_SNAPSHOT_DIR = env('CATALOG_SNAPSHOT_DIR', default=os.path.join(BASE_DIR, 'var', 'catalog'))
+# Redis snapshots up to this size are also kept in each API process, loaded by the worker warm-up
+CATALOG_SNAPSHOT_LOCAL_MAX_SIZE = env.int('CATALOG_SNAPSHOT_LOCAL_MAX_SIZE', default=16 * 1024 * 1024)  # bytes
+CATALOG_SNAPSHOT_DEBOUNCE = env.int('CATALOG_SNAPSHOT_DEBOUNCE', default=5)  # seconds
+# stock-only changes (order approvals) reach the snapshot on this slower schedule; orders are checked against live stock
+CATALOG_SNAPSHOT_STOCK_DEBOUNCE = env.int('CATALOG_SNAPSHOT_STOCK_DEBOUNCE', default=60)  # seconds
@@ -2,7 +2,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from shop.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include('shop.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -2,7 +2,15 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _  # For i18n
 
-from .models import Category, Notification, Order, OrderItem, Product, User
+from .models import (
+    Category,
+    Notification,
+    NotificationOutbox,
+    Order,
+    OrderItem,
+    Product,
+    User,
+)
 
 
 @admin.register(User)
@@ -64,3 +72,4 @@ admin.site.register(Category)
 admin.site.register(Product)
 admin.site.register(OrderItem)
 admin.site.register(Notification)
+admin.site.register(NotificationOutbox)
@@ -1,17 +1,79 @@
 import logging
+import re
 
-import africastalking
+import requests
+from africastalking.Service import AfricasTalkingException
+from africastalking.SMS import SMSService
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from shop.constants import NOTIFICATION_TEMPLATES
 
 logger = logging.getLogger(__name__)
 
+# the SDK's own check: it raises ValueError (TypeError for None) for anything else, before any HTTP call
+PHONE_NUMBER_REGEX = re.compile(r"^\+\d{1,3}\d{3,}$")
+
+
+def is_valid_phone_number(number):
+    """Whether the gateway can be asked to send to ``number``. Users created through OIDC often have none."""
+    return isinstance(number, str) and PHONE_NUMBER_REGEX.match(number) is not None
+
+
+def build_session():
+    """
+    Returns a requests session that keeps connections to the SMS gateway alive between sends.
+    Only failed connection attempts are retried, a retried POST could deliver an SMS twice.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.AT_POOL_SIZE,
+        max_retries=Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.2),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PooledSMSService(SMSService):
+    """
+    The SDK's SMSService, sending through a pooled session with timeouts.
+    The SDK posts with module-level ``requests.post``, which opens a new HTTPS connection per SMS
+    and waits forever on a stalled gateway.
+    """
+
+    def __init__(self, username, api_key, session, timeout, base_url=None):
+        super().__init__(username, api_key)
+        self._session = session
+        self._timeout = timeout
+        if base_url:
+            self._baseUrl = self._contentUrl = base_url.rstrip("/") + "/version1"
+
+    def _make_request(self, url, method, headers, data, params, callback=None):
+        if callback is not None:
+            return super()._make_request(url, method, headers, data, params, callback)
+
+        response = self._session.request(
+            method, url, headers=headers, data=data, params=params, timeout=self._timeout
+        )
+        if not 200 <= response.status_code < 300:
+            raise AfricasTalkingException(response.text)
+        if response.headers.get("content-type", "").startswith("application/json"):
+            return response.json()
+        return response.text
+
 
 class AfricasTalkingClient:
     def __init__(self):
-        africastalking.initialize(settings.AT_USERNAME, settings.AT_API_KEY)
-        self.sms = africastalking.SMS
+        self.sms = PooledSMSService(
+            settings.AT_USERNAME,
+            settings.AT_API_KEY,
+            session=build_session(),
+            timeout=(settings.AT_CONNECT_TIMEOUT, settings.AT_READ_TIMEOUT),
+            base_url=settings.AT_API_URL,
+        )
 
     REQUIRED_KEYS = {"customer_name", "order_id"}
 
@@ -34,3 +96,40 @@ class AfricasTalkingClient:
         except Exception as e:
             logger.error(f"Failed to send SMS to {to}. Error: {e}", exc_info=True)
             return None
+
+    def send_bulk_sms(self, recipients, message):
+        """
+        Sends one message to many recipients in a single API call.
+        Returns the delivery status reported for each recipient, keyed by phone number,
+        or None if the gateway could not be reached or failed.
+        """
+        try:
+            response = self.sms.send(message, recipients)
+            logger.info(f"SMS sent to {len(recipients)} recipients. Response: {response}")
+            reported = response["SMSMessageData"]["Recipients"]
+        except Exception as e:
+            logger.error(f"Failed to send SMS to {len(recipients)} recipients. Error: {e}", exc_info=True)
+            return None
+
+        statuses = {status["number"]: status for status in reported}
+        # recipients missing from the response were not accepted by the gateway
+        return {number: statuses.get(number, {"status": "Failed"}) for number in recipients}
+
+
+_client = None
+
+
+def get_africastalking_client():
+    """
+    Returns the process-wide client, so its pooled connections are reused across tasks.
+    Celery workers create it on worker_process_init, after forking, since sockets cannot be shared.
+    """
+    global _client
+    if _client is None:
+        _client = AfricasTalkingClient()
+    return _client
+
+
+def reset_africastalking_client():
+    global _client
+    _client = None
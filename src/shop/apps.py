@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop"
+
+    def ready(self):
+        from django.conf import settings
+        from django.contrib.auth.signals import user_logged_in
+
+        from . import db_pool, signals  # noqa: F401
+        from .last_login import record_last_login
+
+        if settings.LAST_LOGIN_BATCHING:
+            # replace django.contrib.auth's per-login UPDATE with the batched writer
+            user_logged_in.disconnect(dispatch_uid="update_last_login")
+            user_logged_in.connect(record_last_login, dispatch_uid="record_last_login")
@@ -0,0 +1,101 @@
+"""
+Async read endpoints for ASGI deployments.
+
+They return the same payloads as the catalog and order viewsets, but use Django's async ORM,
+so a slow kiosk connection only holds a coroutine instead of a whole worker.
+DRF views are synchronous, hence these are plain Django views.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import Category, Order, Product
+from .serializers import CategorySerializer, OrderSerializer, ProductSerializer
+
+User = get_user_model()
+
+
+def authenticate(request):
+    """Runs the configured DRF authentication classes and returns the request's user"""
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    return Request(request, authenticators=authenticators).user
+
+
+def async_login_required(view):
+    """
+    Authenticates the request like a DRF view with IsAuthenticated would.
+    Authentication classes may do network and database I/O, so they run in a worker thread.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await sync_to_async(authenticate)(request)
+        except exceptions.APIException as e:
+            return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+
+        if not user.is_authenticated:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+                headers={"WWW-Authenticate": 'Bearer realm="api"'},
+            )
+
+        request.user = user
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({"detail": "No matching object found."}, status=status.HTTP_404_NOT_FOUND)
+
+    return require_GET(wrapper)
+
+
+@async_login_required
+async def product_list(request):
+    products = [product async for product in Product.objects.select_related("category")]
+    return JsonResponse(ProductSerializer(products, many=True).data, safe=False)
+
+
+@async_login_required
+async def product_detail(request, pk):
+    try:
+        product = await Product.objects.select_related("category").aget(pk=pk)
+    except Product.DoesNotExist:
+        raise Http404
+    return JsonResponse(ProductSerializer(product).data)
+
+
+@async_login_required
+async def category_list(request):
+    categories = [category async for category in Category.objects.all()]
+    return JsonResponse(CategorySerializer(categories, many=True).data, safe=False)
+
+
+@async_login_required
+async def category_detail(request, pk):
+    try:
+        category = await Category.objects.aget(pk=pk)
+    except Category.DoesNotExist:
+        raise Http404
+    return JsonResponse(CategorySerializer(category).data)
+
+
+@async_login_required
+async def order_detail(request, pk):
+    orders = Order.objects.prefetch_related("order_items")
+    if request.user.role == User.CUSTOMER:
+        # Customers can only see the orders they created
+        orders = orders.filter(customer=request.user)
+
+    try:
+        order = await orders.aget(pk=pk)
+    except Order.DoesNotExist:
+        raise Http404
+    return JsonResponse(OrderSerializer(order).data)
@@ -0,0 +1,187 @@
+import base64
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .metrics import record_cache_lookup
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU cache with per-entry expiry.
+    Used in front of Redis so hot entries are served without a network round trip.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete_where(self, predicate):
+        """Removes every entry whose value matches the predicate"""
+        with self._lock:
+            for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def user_cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """Returns the user with the given id, loading it from the database only on a cache miss"""
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    record_cache_lookup("user", user is not None)
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.set(key, user, settings.USER_CACHE_TTL)
+    return user
+
+
+def sub_cache_key(openid_sub):
+    return f"oidc_sub:{openid_sub}"
+
+
+def get_user_by_sub(openid_sub):
+    """Returns the user with the given OIDC subject, looked up by the indexed openid_sub column"""
+    key = sub_cache_key(openid_sub)
+    user_id = cache.get(key)
+    record_cache_lookup("oidc_sub", user_id is not None)
+    if user_id is not None:
+        user = get_cached_user(user_id)
+        if user is not None and user.openid_sub == openid_sub:
+            return user
+
+    user = get_user_model().objects.filter(openid_sub=openid_sub).first()
+    if user is not None:
+        cache.set(key, user.pk, settings.USER_CACHE_TTL)
+        cache.set(user_cache_key(user.pk), user, settings.USER_CACHE_TTL)
+    return user
+
+
+TOKEN_USERS_GENERATION_KEY = "oidc_token:generation"
+
+
+def invalidate_cached_user(user):
+    """
+    Drops the user from the shared cache and this process's token LRU.
+    Other processes empty their LRU once they see the bumped generation, within OIDC_TOKEN_LRU_SYNC_INTERVAL.
+    """
+    cache.delete_many([user_cache_key(user.pk), sub_cache_key(user.openid_sub)])
+    _token_users.delete_where(lambda entry: entry[0] == user.pk)
+    cache.add(TOKEN_USERS_GENERATION_KEY, 0, None)
+    cache.incr(TOKEN_USERS_GENERATION_KEY)
+
+
+# entries are (user id, pickled user): each request gets its own copy, threads never share an instance
+_token_users = LRUCache(settings.OIDC_TOKEN_LRU_SIZE)
+_token_users_sync = {"generation": None, "checked_at": float("-inf")}
+
+
+def sync_token_users():
+    """Empties the token LRU if a user was invalidated in another process since the last check"""
+    now = time.monotonic()
+    if now - _token_users_sync["checked_at"] < settings.OIDC_TOKEN_LRU_SYNC_INTERVAL:
+        return
+    _token_users_sync["checked_at"] = now
+    generation = cache.get(TOKEN_USERS_GENERATION_KEY, 0)
+    if generation != _token_users_sync["generation"]:
+        _token_users.clear()
+        _token_users_sync["generation"] = generation
+
+
+def cache_token_user_locally(key, user, ttl):
+    _token_users.set(key, (user.pk, pickle.dumps(user)), min(settings.OIDC_TOKEN_LRU_TTL, ttl))
+
+
+def token_cache_key(access_token):
+    return f"oidc_token:{hashlib.sha256(access_token.encode('utf-8')).hexdigest()}"
+
+
+def get_token_expiry(access_token):
+    """
+    Returns the ``exp`` claim of a JWT access token, or None for opaque tokens.
+    The signature is not checked: the value only bounds how long a validated token stays cached.
+    """
+    parts = access_token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def get_token_ttl(access_token):
+    """Caches a token for OIDC_TOKEN_CACHE_TTL seconds, but never past its own expiry"""
+    ttl = settings.OIDC_TOKEN_CACHE_TTL
+    expires_at = get_token_expiry(access_token)
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - int(time.time()))
+    return ttl
+
+
+def get_token_user(access_token):
+    """Returns the user a previously validated access token belongs to, or None"""
+    key = token_cache_key(access_token)
+    sync_token_users()
+    entry = _token_users.get(key)
+    record_cache_lookup("token_local", entry is not None)
+    if entry is not None:
+        return pickle.loads(entry[1])
+
+    user_id = cache.get(key)
+    record_cache_lookup("token", user_id is not None)
+    if user_id is None:
+        return None
+
+    user = get_cached_user(user_id)
+    if user is not None:
+        cache_token_user_locally(key, user, get_token_ttl(access_token))
+    return user
+
+
+def cache_token_user(access_token, user):
+    """Remembers that the access token was validated for the user"""
+    ttl = get_token_ttl(access_token)
+    if ttl <= 0:
+        return
+
+    key = token_cache_key(access_token)
+    cache.set(key, user.pk, ttl)
+    cache.set(user_cache_key(user.pk), user, settings.USER_CACHE_TTL)
+    cache_token_user_locally(key, user, ttl)
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from mozilla_django_oidc.contrib.drf import OIDCAuthentication
+from rest_framework import exceptions
+
+from .auth_cache import cache_token_user, get_token_user, get_user_by_sub
+from .jwks import TokenVerificationError, get_unverified_issuer, verify_token
+
+
+class CachedOIDCAuthentication(OIDCAuthentication):
+    """
+    OIDC bearer-token authentication that remembers validated tokens.
+    The first request with a token calls the provider's userinfo endpoint; repeated requests
+    are served from an in-process LRU or Redis without any network call or user query.
+    """
+
+    def authenticate(self, request):
+        access_token = self.get_access_token(request)
+        if not access_token:
+            return None
+
+        user = get_token_user(access_token)
+        if user is not None and user.is_active:
+            return user, access_token
+
+        user, access_token = super().authenticate(request)
+        cache_token_user(access_token, user)
+        return user, access_token
+
+
+class JWTAuthentication(OIDCAuthentication):
+    """
+    Authenticates signed OIDC tokens (e.g. Google ID tokens) locally.
+    The signature is checked against the provider's cached JWKS and the user is resolved
+    by its ``openid_sub``, so no call to the provider is needed.
+    Opaque bearer tokens and JWTs from other issuers are left to the next authentication class.
+    """
+
+    def authenticate(self, request):
+        token = self.get_access_token(request)
+        if not token or token.count(".") != 2:
+            return None
+        # only tokens claiming to come from our provider are ours to verify, or to reject
+        if get_unverified_issuer(token) not in settings.OIDC_OP_ISSUERS:
+            return None
+
+        try:
+            claims = verify_token(token)
+        except TokenVerificationError as e:
+            raise exceptions.AuthenticationFailed(str(e))
+
+        user = get_user_by_sub(claims["sub"])
+        if user is None:
+            # first sign-in with this subject: matched by email or created, like a session login
+            try:
+                user = self.backend.get_or_create_user_from_claims(claims)
+            except SuspiciousOperation as e:
+                raise exceptions.AuthenticationFailed(f"Login failed: {e}")
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed("Login failed: No user found for the given token.")
+
+        return user, token
@@ -1,7 +1,40 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import SuspiciousOperation
 from mozilla_django_oidc.auth import OIDCAuthenticationBackend
 
+from .auth_cache import get_cached_user
+
+# user fields kept in sync with the OIDC claims of the same name
+SYNCED_CLAIMS = ("email", "phone_number")
+
 
 class CustomOIDCBackend(OIDCAuthenticationBackend):
+    def get_user(self, user_id):
+        """Loads the session's user from the user cache instead of querying on every request"""
+        return get_cached_user(user_id)
+
+    def get_or_create_user(self, access_token, id_token, payload):
+        """Resolves the user from the provider's userinfo, see get_or_create_user_from_claims"""
+        return self.get_or_create_user_from_claims(self.get_userinfo(access_token, id_token, payload))
+
+    def get_or_create_user_from_claims(self, claims):
+        """
+        Returns the user matching the claims' email, updated from the claims, or creates one.
+        Shared by session logins and locally verified ID tokens, which carry the claims themselves.
+        Returns None if no user matches and OIDC_CREATE_USER is off.
+        """
+        if not self.verify_claims(claims):
+            raise SuspiciousOperation("Claims verification failed")
+
+        users = self.filter_users_by_claims(claims)
+        if len(users) == 1:
+            return self.update_user(users[0], claims)
+        if len(users) > 1:
+            raise SuspiciousOperation("Multiple users returned")
+        if self.get_settings("OIDC_CREATE_USER", True):
+            return self.create_user(claims)
+        return None
+
     def create_user(self, claims):
         """
         Custom logic to create a user
@@ -12,23 +45,38 @@ class CustomOIDCBackend(OIDCAuthenticationBackend):
         role = claims.get("role", "customer")
         openid_sub = claims.get("sub", "")
 
-        # Create user with the correct email and other fields
-        user = self.UserModel.objects.create_user(
+        # Create user with the correct email and other fields, create_user saves it
+        return self.UserModel.objects.create_user(
             email=email,
             phone_number=phone_number,
             role=role,
             openid_sub=openid_sub,
         )
 
-        user.save()
-        return user
-
     def update_user(self, user, claims):
         """
         logic that handles an existing user's subsequent logins
-        used to sync user's information
+        used to sync user's information, only the fields that changed are written
         """
-        user.email = claims.get("email", user.email)
-        user.phone_number = claims.get("phone_number", user.phone_number)
-        user.save()
+        changed_fields = []
+        for field in SYNCED_CLAIMS:
+            value = claims.get(field, getattr(user, field))
+            if value != getattr(user, field):
+                setattr(user, field, value)
+                changed_fields.append(field)
+        # users created before their first OIDC login are linked to their subject, for lookups by sub
+        if not user.openid_sub and claims.get("sub"):
+            user.openid_sub = claims["sub"]
+            changed_fields.append("openid_sub")
+
+        if changed_fields:
+            user.save(update_fields=changed_fields)
         return user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend for the admin's password logins, with the session's user loaded from the user cache"""
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
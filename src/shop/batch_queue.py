@@ -0,0 +1,106 @@
+"""
+Redis work queues for the batched notifications.
+
+Producers push onto ``<name>:pending``. A flush atomically moves up to a batch of items into its own
+``<name>:processing:<batch id>`` list and acks each item once it is sent or parked, so a worker that
+dies between the pop and the send does not lose them: the batch's lease expires and the next flush
+puts whatever was not acked back at the head of the queue.
+"""
+
+import json
+import logging
+import uuid
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# longer than any flush takes, the lease is renewed on every ack
+LEASE_SECONDS = 300
+
+
+class BatchQueue:
+    def __init__(self, name, lease=LEASE_SECONDS, pending_key=None):
+        self.name = name
+        self.lease = lease
+        self.pending_key = pending_key or f"{name}:pending"
+        self.batches_key = f"{name}:batches"
+
+    def processing_key(self, batch_id):
+        return f"{self.name}:processing:{batch_id}"
+
+    def lease_key(self, batch_id):
+        return f"{self.name}:lease:{batch_id}"
+
+    def push(self, item):
+        get_redis().rpush(self.pending_key, json.dumps(item))
+
+    def pop(self, limit):
+        """Moves up to ``limit`` queued items into a new batch and returns (batch, still queued)"""
+        self.requeue_abandoned()
+        batch = Batch(self, uuid.uuid4().hex)
+        with get_redis().pipeline() as pipe:
+            pipe.set(self.lease_key(batch.id), 1, ex=self.lease)
+            pipe.sadd(self.batches_key, batch.id)
+            for _ in range(limit):
+                pipe.lmove(self.pending_key, batch.processing_key, "LEFT", "RIGHT")
+            pipe.llen(self.pending_key)
+            results = pipe.execute()
+        moved, remaining = results[2:-1], results[-1]
+        batch.load([raw for raw in moved if raw is not None])
+        if not batch.items:
+            batch.close()
+        return batch, remaining
+
+    def requeue_abandoned(self):
+        """Puts the unacked items of batches whose flush died back at the head of the queue"""
+        redis = get_redis()
+        for batch_id in redis.smembers(self.batches_key):
+            batch_id = batch_id.decode()
+            if redis.exists(self.lease_key(batch_id)):
+                continue
+            count = 0
+            # from the tail to the head, so the items keep their order
+            while redis.lmove(self.processing_key(batch_id), self.pending_key, "RIGHT", "LEFT"):
+                count += 1
+            redis.srem(self.batches_key, batch_id)
+            if count:
+                logger.warning(f"Requeued {count} items of abandoned {self.name} batch {batch_id}.")
+
+
+class Batch:
+    """Items popped by one flush, kept in Redis until they are acked"""
+
+    def __init__(self, queue, batch_id):
+        self.queue = queue
+        self.id = batch_id
+        self.processing_key = queue.processing_key(batch_id)
+        self.items = []
+        self._raw = {}
+
+    def load(self, raw_items):
+        for raw in raw_items:
+            item = json.loads(raw)
+            self.items.append(item)
+            self._raw[id(item)] = raw
+
+    def ack(self, items):
+        """Removes items that were sent or parked, they will not be requeued"""
+        with get_redis().pipeline() as pipe:
+            for item in items:
+                pipe.lrem(self.processing_key, 1, self._raw[id(item)])
+            pipe.expire(self.queue.lease_key(self.id), self.queue.lease)
+            pipe.execute()
+
+    def release(self):
+        """Puts the items that were not acked back at the head of the queue, in order, and closes the batch"""
+        redis = get_redis()
+        while redis.lmove(self.processing_key, self.queue.pending_key, "RIGHT", "LEFT"):
+            pass
+        self.close()
+
+    def close(self):
+        with get_redis().pipeline() as pipe:
+            pipe.delete(self.processing_key, self.queue.lease_key(self.id))
+            pipe.srem(self.queue.batches_key, self.id)
+            pipe.execute()
@@ -0,0 +1,312 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from shop.models import Category, Product
+from shop.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+PRODUCT_CHUNK_SIZE = 2000
+SCHEDULED_KEY = "catalog_snapshot:scheduled"
+STOCK_SCHEDULED_KEY = "catalog_snapshot:stock_scheduled"
+
+RANGE_REGEX = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class SnapshotMissing(Exception):
+    """The snapshot's metadata is there but its body is gone, e.g. evicted from Redis or deleted from disk"""
+
+
+def build_category_tree():
+    """
+    Returns the category tree as nested dicts, starting from the root categories.
+    Loads all categories in one query and links them in memory.
+    """
+    nodes = {}
+    roots = []
+    categories = Category.objects.values("id", "name", "parent_id").order_by("id")
+
+    for category in categories:
+        nodes[category["id"]] = {"id": category["id"], "name": category["name"], "subcategories": []}
+
+    for category in categories:
+        node = nodes[category["id"]]
+        parent = nodes.get(category["parent_id"])
+        if parent:
+            parent["subcategories"].append(node)
+        else:
+            roots.append(node)
+
+    return roots
+
+
+def iter_products():
+    """Yields products as plain dicts, including the effective price a customer pays."""
+    products = (
+        Product.objects.order_by("id")
+        .values_list("id", "name", "category_id", "price", "discount_price", "stock")
+        .iterator(chunk_size=PRODUCT_CHUNK_SIZE)
+    )
+    for product_id, name, category_id, price, discount_price, stock in products:
+        # mirrors Product.get_current_price without instantiating the model
+        effective_price = discount_price if discount_price else price
+        yield {
+            "id": product_id,
+            "name": name,
+            "category_id": category_id,
+            "price": str(price),
+            "discount_price": str(discount_price) if discount_price is not None else None,
+            "effective_price": str(effective_price),
+            "stock": stock,
+        }
+
+
+def write_catalog(stream):
+    """
+    Writes the catalog as compressed JSON to the given binary stream.
+    Products are streamed so the whole catalog never has to sit in memory as Python objects.
+    :return: tuple (etag, product_count) where the etag is a hash of the uncompressed JSON
+    """
+    digest = hashlib.sha256()
+    product_count = 0
+
+    # mtime=0 keeps the compressed output identical for identical catalogs
+    with gzip.GzipFile(fileobj=stream, mode="wb", mtime=0) as gz:
+
+        def write(text):
+            data = text.encode("utf-8")
+            digest.update(data)
+            gz.write(data)
+
+        write(f'{{"format":{SNAPSHOT_FORMAT},"categories":')
+        write(json.dumps(build_category_tree(), separators=(",", ":")))
+        write(',"products":[')
+        for product in iter_products():
+            if product_count:
+                write(",")
+            write(json.dumps(product, separators=(",", ":")))
+            product_count += 1
+        write("]}")
+
+    return digest.hexdigest()[:32], product_count
+
+
+class DiskSnapshotStore:
+    """Keeps snapshots as files, which lets the web server hand them to the OS with sendfile."""
+
+    META_FILE = "catalog.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, etag):
+        return os.path.join(self.directory, f"catalog-{etag}.json.gz")
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, data, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        previous = self.load_meta()
+
+        self._write_atomic(self._path(meta["etag"]), data)
+        self._write_atomic(os.path.join(self.directory, self.META_FILE), json.dumps(meta).encode("utf-8"))
+
+        # keep the previous snapshot around so in-flight ranged downloads can finish
+        keep = {self._path(meta["etag"])}
+        if previous:
+            keep.add(self._path(previous["etag"]))
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("catalog-") and path not in keep:
+                os.remove(path)
+
+    def load_meta(self):
+        try:
+            with open(os.path.join(self.directory, self.META_FILE), "rb") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def open(self, meta):
+        try:
+            return open(self._path(meta["etag"]), "rb")
+        except FileNotFoundError:
+            raise SnapshotMissing(meta["etag"])
+
+    def prime(self, meta):
+        """Nothing to load: files are sent from the OS page cache"""
+
+    def read(self, meta, start, end):
+        with self.open(meta) as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+
+# {store prefix: (etag, body)}, the Redis snapshot last served by this process
+_local_snapshots = {}
+
+
+class RedisSnapshotStore:
+    """Keeps snapshots in Redis so every API pod can serve the snapshot built by any worker."""
+
+    PREVIOUS_TTL = 3600
+
+    def __init__(self, prefix="catalog_snapshot"):
+        self.prefix = prefix
+
+    def _data_key(self, etag):
+        return f"{self.prefix}:data:{etag}"
+
+    def save(self, data, meta):
+        redis = get_redis()
+        previous = self.load_meta()
+
+        pipe = redis.pipeline()
+        pipe.set(self._data_key(meta["etag"]), data)
+        pipe.set(f"{self.prefix}:meta", json.dumps(meta))
+        if previous and previous["etag"] != meta["etag"]:
+            # keep the previous snapshot around so in-flight ranged downloads can finish
+            pipe.expire(self._data_key(previous["etag"]), self.PREVIOUS_TTL)
+        pipe.execute()
+
+    def load_meta(self):
+        meta = get_redis().get(f"{self.prefix}:meta")
+        return json.loads(meta) if meta else None
+
+    def open(self, meta):
+        return None
+
+    def load(self, meta):
+        """
+        Returns the snapshot body, from this process's copy when it is the current one.
+        Snapshots up to CATALOG_SNAPSHOT_LOCAL_MAX_SIZE bytes are kept, replacing the previous one.
+        """
+        local = _local_snapshots.get(self.prefix)
+        if local and local[0] == meta["etag"]:
+            return local[1]
+        data = get_redis().get(self._data_key(meta["etag"]))
+        if data is not None and len(data) <= settings.CATALOG_SNAPSHOT_LOCAL_MAX_SIZE:
+            _local_snapshots[self.prefix] = (meta["etag"], data)
+        return data
+
+    def prime(self, meta):
+        if meta["size"] <= settings.CATALOG_SNAPSHOT_LOCAL_MAX_SIZE:
+            self.load(meta)
+
+    def read(self, meta, start, end):
+        if meta["size"] <= settings.CATALOG_SNAPSHOT_LOCAL_MAX_SIZE:
+            data = self.load(meta)
+            if data is not None:
+                stop = end + 1  # the range end is inclusive
+                return data[start:stop]
+        # the view only asks for ranges within the snapshot, so nothing comes back only if the key is gone
+        data = get_redis().getrange(self._data_key(meta["etag"]), start, end)
+        if not data:
+            raise SnapshotMissing(meta["etag"])
+        return data
+
+
+def get_snapshot_store():
+    if settings.CATALOG_SNAPSHOT_STORAGE == "disk":
+        return DiskSnapshotStore(settings.CATALOG_SNAPSHOT_DIR)
+    return RedisSnapshotStore()
+
+
+def build_catalog_snapshot(store=None):
+    """
+    Builds the compressed catalog snapshot and stores it.
+    The store is left untouched when the catalog has not changed since the last build.
+    :return: metadata of the current snapshot
+    """
+    store = store or get_snapshot_store()
+
+    with tempfile.TemporaryFile() as tmp:
+        etag, product_count = write_catalog(tmp)
+
+        current = store.load_meta()
+        if current and current["etag"] == etag:
+            return current
+
+        tmp.seek(0)
+        data = tmp.read()
+
+    meta = {
+        "etag": etag,
+        "format": SNAPSHOT_FORMAT,
+        "size": len(data),
+        "product_count": product_count,
+        "generated_at": timezone.now().isoformat(),
+    }
+    store.save(data, meta)
+    logger.info(f"Catalog snapshot {etag} built with {product_count} products ({len(data)} bytes).")
+    return meta
+
+
+def parse_byte_range(header, size):
+    """
+    Parses a single-range ``Range`` header.
+    :return: tuple (start, end) with an inclusive end, or None if the header should be ignored
+    :raises ValueError: if the range cannot be satisfied
+    """
+    match = RANGE_REGEX.match(header.strip())
+    if not match:
+        return None  # multiple or malformed ranges, serve the full snapshot
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range.")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable.")
+    return start, min(end, size - 1)
+
+
+def schedule_catalog_snapshot(stock_only=False):
+    """
+    Queues a snapshot rebuild once the current transaction commits.
+    Rebuilds are debounced so a burst of catalog changes (e.g. a bulk upload) triggers a single build.
+    Stock-only changes, made by every order approval, wait CATALOG_SNAPSHOT_STOCK_DEBOUNCE instead.
+    """
+    from shop.tasks import build_catalog_snapshot_task
+
+    if stock_only:
+        key, debounce = STOCK_SCHEDULED_KEY, settings.CATALOG_SNAPSHOT_STOCK_DEBOUNCE
+    else:
+        key, debounce = SCHEDULED_KEY, settings.CATALOG_SNAPSHOT_DEBOUNCE
+
+    def enqueue():
+        try:
+            if get_redis().set(key, 1, nx=True, ex=debounce + 60):
+                build_catalog_snapshot_task.apply_async(countdown=debounce)
+        except Exception as e:
+            logger.error(f"Failed to schedule catalog snapshot rebuild. Exception: {e}", exc_info=True)
+
+    transaction.on_commit(enqueue)
+
+
+def clear_scheduled_snapshot():
+    """Allows catalog changes made while a build runs to schedule the next one."""
+    get_redis().delete(SCHEDULED_KEY, STOCK_SCHEDULED_KEY)
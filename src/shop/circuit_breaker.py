@@ -0,0 +1,76 @@
+import logging
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker whose state lives in Redis, so all workers share it.
+
+    * closed - calls go through. Each failure is counted for ``failure_window`` seconds.
+    * open - after ``failure_threshold`` failures, calls are refused for ``reset_timeout`` seconds.
+    * half-open - once the timeout passes, one trial call per ``reset_timeout`` is let through.
+      Its success closes the breaker, its failure opens it again.
+
+    If Redis is unavailable the breaker stays closed, so notifications are never refused by it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, failure_window=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_window = failure_window
+        self.failures_key = f"breaker:{name}:failures"
+        self.open_key = f"breaker:{name}:open"
+        self.probe_key = f"breaker:{name}:probe"
+
+    def allow(self):
+        """Returns True if a call to the gateway may be made now"""
+        redis = get_redis()
+        try:
+            is_open, failures = redis.mget(self.open_key, self.failures_key)
+            if is_open:
+                return False
+            if int(failures or 0) < self.failure_threshold:
+                return True
+            # half-open: the first caller gets the trial call
+            return bool(redis.set(self.probe_key, 1, nx=True, ex=self.reset_timeout))
+        except Exception as e:
+            logger.warning(f"Could not check circuit breaker {self.name}, allowing call. Exception: {e}")
+            return True
+
+    def is_closed(self):
+        """Whether calls go through without a trial call, i.e. the breaker is neither open nor half-open"""
+        try:
+            is_open, failures = get_redis().mget(self.open_key, self.failures_key)
+            return not is_open and int(failures or 0) < self.failure_threshold
+        except Exception:
+            return True
+
+    def is_open(self):
+        try:
+            return bool(get_redis().exists(self.open_key))
+        except Exception:
+            return False
+
+    def record_success(self):
+        try:
+            get_redis().delete(self.failures_key, self.open_key, self.probe_key)
+        except Exception as e:
+            logger.warning(f"Could not reset circuit breaker {self.name}. Exception: {e}")
+
+    def record_failure(self):
+        try:
+            with get_redis().pipeline() as pipe:
+                pipe.incr(self.failures_key)
+                # outlives the open period so a failed trial call re-opens the breaker at once
+                pipe.expire(self.failures_key, max(self.failure_window, self.reset_timeout * 2))
+                failures, _ = pipe.execute()
+            if failures >= self.failure_threshold:
+                get_redis().set(self.open_key, 1, ex=self.reset_timeout)
+                get_redis().delete(self.probe_key)
+                logger.warning(f"Circuit breaker {self.name} opened after {failures} failures.")
+        except Exception as e:
+            logger.warning(f"Could not record failure on circuit breaker {self.name}. Exception: {e}")
@@ -0,0 +1,53 @@
+import threading
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_connections_opened = {}
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    """Counts physical connections per alias; a steadily growing count means connections are not reused"""
+    with _lock:
+        _connections_opened[connection.alias] = _connections_opened.get(connection.alias, 0) + 1
+
+
+def get_pool_stats():
+    """
+    Returns connection stats of the current process for every configured database alias.
+    Pooled databases report the psycopg pool counters, other databases report
+    whether this thread currently holds a connection.
+    """
+    stats = {}
+    for alias in connections:
+        conn = connections[alias]
+        alias_stats = {"connections_opened": _connections_opened.get(alias, 0)}
+
+        if conn.settings_dict["OPTIONS"].get("pool"):
+            pool_stats = conn.pool.get_stats()
+            alias_stats.update(
+                {
+                    "mode": "pool",
+                    "size": pool_stats.get("pool_size", 0),
+                    "max_size": pool_stats.get("pool_max", 0),
+                    "in_use": pool_stats.get("pool_size", 0) - pool_stats.get("pool_available", 0),
+                    "waiting": pool_stats.get("requests_waiting", 0),
+                    "waits": pool_stats.get("requests_queued", 0),
+                    "wait_ms": pool_stats.get("requests_wait_ms", 0),
+                    "timeouts": pool_stats.get("requests_errors", 0),
+                    "connections_lost": pool_stats.get("connections_lost", 0),
+                }
+            )
+        else:
+            alias_stats.update(
+                {
+                    "mode": "per-request" if conn.settings_dict["CONN_MAX_AGE"] == 0 else "persistent",
+                    "in_use": int(conn.connection is not None),
+                }
+            )
+
+        stats[alias] = alias_stats
+    return stats
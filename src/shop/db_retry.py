@@ -0,0 +1,68 @@
+"""
+Retries for order transactions that lose a lock race.
+
+PostgreSQL aborts one of two transactions that deadlock (SQLSTATE 40P01), and a transaction
+that cannot be serialized (40001). Neither means the request was wrong: running the whole
+transaction again almost always succeeds. Locking rows in primary-key order keeps deadlocks
+rare, this catches the rest instead of answering with a 500.
+"""
+
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from .metrics import DB_TRANSACTION_RETRIES, DB_TRANSACTION_RETRIES_EXHAUSTED
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_SQLSTATES = {"40P01": "deadlock", "40001": "serialization_failure"}
+
+
+def get_retry_reason(exc):
+    """Returns why the database aborted the transaction if running it again may succeed, else None"""
+    cause = exc.__cause__
+    sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+    return RETRYABLE_SQLSTATES.get(sqlstate)
+
+
+def get_retry_delay(attempt):
+    """Exponential backoff with full jitter, so the transactions that collided do not collide again"""
+    return random.uniform(0, min(settings.DB_RETRY_BACKOFF * 2**attempt, settings.DB_RETRY_BACKOFF_MAX))
+
+
+def retry_on_conflict(operation):
+    """
+    Runs the decorated function again when its transaction is aborted by a deadlock or
+    serialization failure, up to settings.DB_RETRY_MAX_RETRIES times.
+    The function must own its transaction: inside an outer atomic block the whole outer
+    transaction is aborted, so the error is left for its owner to handle.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+                return func(*args, **kwargs)
+
+            for attempt in range(settings.DB_RETRY_MAX_RETRIES + 1):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    reason = get_retry_reason(e)
+                    if reason is None:
+                        raise
+                    if attempt == settings.DB_RETRY_MAX_RETRIES:
+                        DB_TRANSACTION_RETRIES_EXHAUSTED.labels(operation=operation, reason=reason).inc()
+                        logger.error(f"{operation} failed after {attempt} retries ({reason}).")
+                        raise
+                    DB_TRANSACTION_RETRIES.labels(operation=operation, reason=reason).inc()
+                    logger.warning(f"{operation} hit a {reason}, retrying (attempt {attempt + 1}).")
+                    time.sleep(get_retry_delay(attempt))
+
+        return wrapper
+
+    return decorator
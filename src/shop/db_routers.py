@@ -0,0 +1,53 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Reads go to the primary unless a request explicitly opts into replicas (see ReplicaRoutingMiddleware)
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Allows reads made inside the block to be served by a read replica."""
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Forces every read made inside the block to go to the primary."""
+    with use_replicas(False):
+        yield
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a random replica from settings.DATABASE_REPLICAS when the current
+    context allows it, and everything else to the primary (``default``).
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get() or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+
+        # reads inside a transaction (e.g. select_for_update locks) must see the primary's rows
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas mirror the primary, so objects from any of them can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,127 @@
+"""
+Delivery guards for the notification gateways (AfricasTalking SMS and SMTP).
+
+Each gateway has a circuit breaker shared through Redis. Failed sends are retried by Celery
+with exponential backoff. While a gateway's breaker is open, or once retries are used up,
+messages are parked in Redis instead of holding worker slots, and replayed by
+``replay_parked_notifications_task`` once the gateway recovers.
+"""
+
+import json
+import logging
+import random
+
+from django.conf import settings
+
+from .batch_queue import BatchQueue
+from .circuit_breaker import CircuitBreaker
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SMS = "sms"
+EMAIL = "email"
+
+
+class GatewayError(Exception):
+    pass
+
+
+def get_breaker(channel):
+    return CircuitBreaker(
+        f"{channel}_gateway",
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+        failure_window=settings.CIRCUIT_BREAKER_FAILURE_WINDOW,
+    )
+
+
+def get_retry_countdown(retries):
+    """Exponential backoff with full jitter, so retries from many workers do not arrive together"""
+    delay = min(settings.NOTIFICATION_RETRY_BACKOFF * 2**retries, settings.NOTIFICATION_RETRY_BACKOFF_MAX)
+    return random.uniform(delay / 2, delay)
+
+
+def parked_key(channel):
+    return f"notifications:parked:{channel}"
+
+
+def park(channel, task_kwargs):
+    """Keeps a message for later instead of sending it to a failing gateway"""
+    get_redis().rpush(parked_key(channel), json.dumps(task_kwargs))
+    logger.warning(f"Parked {channel} notification {task_kwargs}.")
+
+
+def retry_or_park(task, channel, task_kwargs, exc):
+    """
+    Retries the task with backoff, or parks the message once retries are used up.
+    Tasks called directly, outside a worker, cannot be retried and park straight away.
+    :return: True if the message was parked, otherwise the Retry exception is raised
+    """
+    if task.request.called_directly or task.request.retries >= task.max_retries:
+        park(channel, task_kwargs)
+        return True
+    raise task.retry(exc=exc, countdown=get_retry_countdown(task.request.retries))
+
+
+def delivered_key(outbox_id):
+    return f"notifications:delivered:{outbox_id}"
+
+
+def delivered_ids(outbox_ids):
+    """Returns which of the outbox entries were already handled, a re-drained entry must not be sent twice"""
+    outbox_ids = [outbox_id for outbox_id in outbox_ids if outbox_id is not None]
+    if not outbox_ids:
+        return set()
+    try:
+        flags = get_redis().mget([delivered_key(outbox_id) for outbox_id in outbox_ids])
+    except Exception as e:
+        logger.warning(f"Could not check outbox entries {outbox_ids}, sending them. Exception: {e}")
+        return set()
+    return {outbox_id for outbox_id, flag in zip(outbox_ids, flags) if flag}
+
+
+def mark_delivered(outbox_ids):
+    """Remembers outbox entries that were sent, or failed for good, for NOTIFICATION_DELIVERED_TTL seconds"""
+    outbox_ids = [outbox_id for outbox_id in outbox_ids if outbox_id is not None]
+    if not outbox_ids:
+        return
+    try:
+        with get_redis().pipeline() as pipe:
+            for outbox_id in outbox_ids:
+                pipe.set(delivered_key(outbox_id), 1, ex=settings.NOTIFICATION_DELIVERED_TTL)
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not mark outbox entries {outbox_ids} delivered. Exception: {e}")
+
+
+def parked_queue(channel):
+    """The parked messages as a BatchQueue, so a replay keeps what it has not re-queued yet"""
+    return BatchQueue(parked_key(channel), pending_key=parked_key(channel))
+
+
+def replay_parked(channel, send, limit=None):
+    """
+    Re-queues up to ``limit`` parked messages once the gateway's breaker has closed.
+    A half-open breaker waits for its trial call to succeed, replays would only be parked again.
+    ``send`` is called with each message's task kwargs. Messages are acked one by one after it returns,
+    the ones left when it fails, or the worker dies, stay parked for the next replay.
+    """
+    limit = limit or settings.PARKED_REPLAY_BATCH_SIZE
+    if not get_breaker(channel).is_closed():
+        return 0
+
+    batch, _ = parked_queue(channel).pop(limit)
+    replayed = 0
+    try:
+        for message in batch.items:
+            send(message)
+            batch.ack([message])
+            replayed += 1
+    except Exception as e:
+        logger.warning(
+            f"Replayed {replayed} parked {channel} notifications, keeping the rest. Exception: {e}"
+        )
+    finally:
+        batch.release()
+    return replayed
@@ -0,0 +1,119 @@
+"""
+Liveness and readiness checks for the orchestrator, answered by shop.middleware.HealthCheckMiddleware.
+
+* ``/health/`` - liveness: the process answers requests. No I/O, so a slow database never
+  gets a healthy pod restarted.
+* ``/health/ready/`` - readiness: PostgreSQL and Redis answer and every migration is applied.
+  The result is cached for HEALTH_CHECK_CACHE_SECONDS per process, so probes from every
+  replica and the orchestrator add no steady load on the database.
+"""
+
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+logger = logging.getLogger(__name__)
+
+LIVENESS_PATH = "/health/"
+READINESS_PATH = "/health/ready/"
+
+
+def check_database():
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+_redis_client = None
+
+
+def check_redis():
+    # a client of its own with short timeouts, so a hung Redis fails the probe instead of blocking it
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.HEALTH_CHECK_TIMEOUT,
+            socket_connect_timeout=settings.HEALTH_CHECK_TIMEOUT,
+        )
+    _redis_client.ping()
+
+
+_migrations_applied = False
+
+
+def check_migrations():
+    """
+    Fails while migrations are pending. Loading the migration graph is slow,
+    so once everything is applied it is not checked again by this process.
+    """
+    global _migrations_applied
+    if _migrations_applied:
+        return
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    pending = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if pending:
+        raise RuntimeError(f"{len(pending)} migrations are not applied.")
+    _migrations_applied = True
+
+
+CHECKS = {"database": check_database, "redis": check_redis, "migrations": check_migrations}
+
+
+def run_checks():
+    """Returns (ready, {check: "ok" or "failed"}), logging why a check failed"""
+    results = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+            results[name] = "ok"
+        except Exception as e:
+            logger.warning(f"Readiness check {name} failed. Exception: {e}")
+            results[name] = "failed"
+    return all(result == "ok" for result in results.values()), results
+
+
+class ReadinessCache:
+    """
+    Keeps the last readiness result for ``ttl`` seconds.
+    Only one thread runs the checks at a time: while it does, the others answer with the last result.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._result = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            if self._checked_at is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = run_checks()
+                self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+            self._checked_at = None
+
+
+_readiness = None
+
+
+def get_readiness():
+    global _readiness
+    if _readiness is None:
+        _readiness = ReadinessCache(settings.HEALTH_CHECK_CACHE_SECONDS)
+    return _readiness.get()
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from josepy.errors import DeserializationError
+from josepy.jwk import JWK
+from josepy.jws import JWS
+
+from .metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVerificationError(Exception):
+    pass
+
+
+class JWKSCache:
+    """
+    In-process cache of the provider's signing keys (JWKS).
+    Keys are refreshed in a background thread once they are older than ``max_age``,
+    so requests keep verifying against the current keys while the refresh runs.
+    A token signed with an unknown ``kid`` triggers an immediate refresh (key rotation),
+    at most once per ``min_refresh_interval`` so bogus tokens cannot hammer the provider.
+    Fetched key sets are shared through the Django cache for ``max_age``, so other processes,
+    e.g. freshly recycled workers, load them from there instead of fetching them again.
+    """
+
+    def __init__(self, url, max_age=3600, min_refresh_interval=60, timeout=5):
+        self.url = url
+        self.max_age = max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.cache_key = f"jwks:{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
+
+    def fetch(self):
+        """Downloads the key set, shares it with other processes and returns it as a dict of kid -> JWK"""
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        jwks = response.json()
+        try:
+            cache.set(self.cache_key, jwks, self.max_age)
+        except Exception as e:
+            logger.warning(f"Could not share the JWKS from {self.url}. Exception: {e}")
+        return parse_jwks(jwks)
+
+    def load_shared(self):
+        """Returns the key set another process fetched within max_age, or None"""
+        try:
+            jwks = cache.get(self.cache_key)
+        except Exception as e:
+            logger.warning(f"Could not load the shared JWKS. Exception: {e}")
+            return None
+        return parse_jwks(jwks) if jwks else None
+
+    def refresh(self, shared=True):
+        """
+        Reloads the keys, from the copy shared by another process when there is one.
+        ``shared=False`` always asks the provider, for when a key it may have rotated in is missing.
+        """
+        with self._lock:
+            self._last_attempt = time.monotonic()
+        try:
+            keys = (shared and self.load_shared()) or self.fetch()
+        except Exception as e:
+            logger.error(f"Failed to refresh JWKS from {self.url}. Exception: {e}", exc_info=True)
+            return
+
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+        logger.info(f"Loaded {len(keys)} signing keys from {self.url}.")
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="jwks-refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+
+    def _claim_refresh(self):
+        """Returns True if a synchronous refresh may run now, at most once per min_refresh_interval"""
+        with self._lock:
+            now = time.monotonic()
+            if self._last_attempt is not None and now - self._last_attempt <= self.min_refresh_interval:
+                return False
+            self._last_attempt = now
+            return True
+
+    def get_key(self, kid):
+        """Returns the signing key with the given kid, or None if the provider does not know it"""
+        if self._fetched_at is None:
+            # no keys yet: if the first fetch failed, requests must not all retry it
+            if self._claim_refresh():
+                self.refresh()
+        elif time.monotonic() - self._fetched_at > self.max_age:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        record_cache_lookup("jwks", key is not None)
+        if key is None and self._claim_refresh():
+            # the provider may have rotated its keys
+            self.refresh(shared=False)
+            key = self._keys.get(kid)
+        return key
+
+
+def parse_jwks(jwks):
+    return {key["kid"]: JWK.from_json(key) for key in jwks["keys"]}
+
+
+_jwks_cache = None
+
+
+def get_jwks_cache():
+    global _jwks_cache
+    if _jwks_cache is None:
+        _jwks_cache = JWKSCache(
+            settings.OIDC_OP_JWKS_ENDPOINT,
+            max_age=settings.OIDC_JWKS_MAX_AGE,
+            min_refresh_interval=settings.OIDC_JWKS_MIN_REFRESH_INTERVAL,
+        )
+    return _jwks_cache
+
+
+def get_unverified_issuer(token):
+    """Returns the ``iss`` claim of a JWT without verifying it, or None if the token is not a readable JWT"""
+    try:
+        claims = json.loads(JWS.from_compact(token.encode("utf-8")).payload)
+    except (DeserializationError, ValueError, TypeError):
+        return None
+    return claims.get("iss") if isinstance(claims, dict) else None
+
+
+def verify_token(token, jwks_cache=None):
+    """
+    Verifies a signed OIDC token (JWT) locally and returns its claims.
+    Checks the signature against the cached JWKS, then the algorithm, issuer, audience and expiry.
+    :raises TokenVerificationError: if the token is not valid
+    """
+    jwks_cache = jwks_cache or get_jwks_cache()
+
+    try:
+        jws = JWS.from_compact(token.encode("utf-8"))
+        header = jws.signature.combined
+    except (DeserializationError, ValueError, TypeError) as e:
+        raise TokenVerificationError("Malformed token.") from e
+
+    if header.alg is None or header.alg.name != settings.OIDC_RP_SIGN_ALGO:
+        raise TokenVerificationError("Unexpected token signing algorithm.")
+
+    key = jwks_cache.get_key(header.kid)
+    if key is None:
+        raise TokenVerificationError("Unknown token signing key.")
+
+    if not jws.verify(key):
+        raise TokenVerificationError("Invalid token signature.")
+
+    try:
+        claims = json.loads(jws.payload)
+    except ValueError as e:
+        raise TokenVerificationError("Malformed token payload.") from e
+
+    validate_claims(claims)
+    return claims
+
+
+def validate_claims(claims):
+    now = time.time()
+    leeway = settings.OIDC_JWT_LEEWAY
+
+    if claims.get("iss") not in settings.OIDC_OP_ISSUERS:
+        raise TokenVerificationError("Unexpected token issuer.")
+
+    audience = claims.get("aud")
+    audiences = audience if isinstance(audience, list) else [audience]
+    if settings.OIDC_RP_CLIENT_ID not in audiences:
+        raise TokenVerificationError("Token was not issued for this client.")
+
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] + leeway < now:
+        raise TokenVerificationError("Token has expired.")
+
+    if isinstance(claims.get("nbf"), (int, float)) and claims["nbf"] - leeway > now:
+        raise TokenVerificationError("Token is not valid yet.")
+
+    if not claims.get("sub"):
+        raise TokenVerificationError("Token has no subject.")
@@ -0,0 +1,56 @@
+"""
+Batched ``last_login`` updates.
+
+Django writes ``last_login`` with an UPDATE on every login. During login storms those writes
+contend on ``shop_user`` rows for a value nobody reads in real time, so logins are recorded
+in a Redis hash instead and flushed to the database by ``flush_last_login_task``.
+"""
+
+import logging
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "last_login:pending"
+
+
+def record_last_login(sender, request, user, **kwargs):
+    """user_logged_in receiver that queues the login time instead of writing it"""
+    user.last_login = timezone.now()
+    try:
+        get_redis().hset(PENDING_KEY, user.pk, user.last_login.isoformat())
+    except Exception as e:
+        logger.warning(f"Could not queue last_login for user {user.pk}, writing it directly. Exception: {e}")
+        update_last_login(sender, user)
+
+
+def flush_last_logins(batch_size=500):
+    """Writes the queued login times to the database and returns how many users were updated"""
+    with get_redis().pipeline() as pipe:
+        # read and clear atomically so logins recorded meanwhile are kept for the next flush
+        pipe.hgetall(PENDING_KEY)
+        pipe.delete(PENDING_KEY)
+        pending, _ = pipe.execute()
+
+    User = get_user_model()
+    users = [
+        User(pk=int(user_id), last_login=parse_datetime(last_login.decode()))
+        for user_id, last_login in pending.items()
+    ]
+    try:
+        # no signals are sent, so cached users are not invalidated for a last_login change
+        User.objects.bulk_update(users, ["last_login"], batch_size=batch_size)
+    except Exception:
+        # put the logins back for the next flush, without overwriting newer ones
+        with get_redis().pipeline() as pipe:
+            for user_id, last_login in pending.items():
+                pipe.hsetnx(PENDING_KEY, user_id, last_login)
+            pipe.execute()
+        raise
+    return len(users)
@@ -0,0 +1,145 @@
+"""
+Batched admin email dispatch.
+
+Admin alerts are queued in Redis and sent by ``flush_mail_batch_task`` once
+settings.ADMIN_EMAIL_BATCH_WINDOW seconds have passed, over a single SMTP connection
+instead of one SMTP/TLS session per email. With settings.ADMIN_EMAIL_DIGEST the queued alerts
+are rolled up into one digest email per recipient list, so admin mail volume stays flat under load.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .batch_queue import BatchQueue
+from .delivery import EMAIL, delivered_ids, get_breaker, mark_delivered, park
+from .notification_log import elapsed_ms
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE = BatchQueue("mail_batch")
+QUEUE_KEY = QUEUE.pending_key
+SCHEDULED_KEY = "mail_batch:scheduled"
+FROM_EMAIL = "admin@ekiosk.com"
+
+
+def dispatch_admin_email(subject, message, recipient_list, order_id=None, outbox_id=None):
+    """
+    Sends an admin email, through the batch queue when ADMIN_EMAIL_BATCH_WINDOW is set.
+    ``outbox_id`` lets the send skip an outbox entry that was already delivered.
+    """
+    from shop.tasks import flush_mail_batch_task, send_email_task
+
+    window = settings.ADMIN_EMAIL_BATCH_WINDOW
+    if not window:
+        send_email_task.delay(subject, message, recipient_list, order_id=order_id, outbox_id=outbox_id)
+        return
+
+    try:
+        QUEUE.push(
+            {
+                "subject": subject,
+                "message": message,
+                "recipient_list": recipient_list,
+                "order_id": order_id,
+                "outbox_id": outbox_id,
+            }
+        )
+        redis = get_redis()
+        if redis.set(SCHEDULED_KEY, 1, nx=True, ex=window + 60):
+            flush_mail_batch_task.apply_async(countdown=window)
+    except Exception as e:
+        logger.warning(f"Could not queue email '{subject}', sending it directly. Exception: {e}")
+        send_email_task.delay(subject, message, recipient_list, order_id=order_id, outbox_id=outbox_id)
+
+
+def build_digests(pending):
+    """Rolls the queued emails up into one digest per recipient list"""
+    groups = {}
+    for email in pending:
+        groups.setdefault(tuple(email["recipient_list"]), []).append(email)
+
+    return [
+        EmailMessage(
+            subject=f"{len(emails)} new notifications" if len(emails) > 1 else emails[0]["subject"],
+            body="\n".join(f"- {email['subject']}: {email['message']}" for email in emails),
+            from_email=FROM_EMAIL,
+            to=list(recipient_list),
+        )
+        for recipient_list, emails in groups.items()
+    ]
+
+
+def flush_mail_batch():
+    """
+    Sends up to ADMIN_EMAIL_BATCH_MAX_SIZE queued emails and returns (sent, still queued).
+    Emails are parked instead while the SMTP circuit breaker is open or when sending fails.
+    """
+    from shop.models import Notification
+
+    get_redis().delete(SCHEDULED_KEY)
+    batch, remaining = QUEUE.pop(settings.ADMIN_EMAIL_BATCH_MAX_SIZE)
+    pending = batch.items
+    delivered = delivered_ids(email.get("outbox_id") for email in pending)
+    if delivered:
+        logger.info(f"Skipping emails of outbox entries {sorted(delivered)}, already delivered.")
+        batch.ack([email for email in pending if email.get("outbox_id") in delivered])
+        pending = [email for email in pending if email.get("outbox_id") not in delivered]
+    if not pending:
+        batch.close()
+        return 0, remaining
+
+    if settings.ADMIN_EMAIL_DIGEST:
+        messages = build_digests(pending)
+    else:
+        messages = [
+            EmailMessage(
+                subject=email["subject"],
+                body=email["message"],
+                from_email=FROM_EMAIL,
+                to=email["recipient_list"],
+            )
+            for email in pending
+        ]
+
+    breaker = get_breaker(EMAIL)
+    started = time.monotonic()
+    status = Notification.PARKED
+    if breaker.allow():
+        try:
+            # one SMTP session for the whole batch
+            with get_connection() as connection:
+                connection.send_messages(messages)
+            breaker.record_success()
+            mark_delivered(email.get("outbox_id") for email in pending)
+            status = Notification.SUCCESS
+        except Exception as e:
+            logger.error(f"Error sending {len(messages)} queued emails. Exception: {e}", exc_info=True)
+            breaker.record_failure()
+    latency_ms = elapsed_ms(started)
+
+    if status == Notification.PARKED:
+        for email in pending:
+            park(EMAIL, email)
+    # sent or parked, they are no longer requeued if this worker dies
+    batch.ack(pending)
+    batch.close()
+
+    # logged per queued email and recipient, also in digest mode, so each order's alerts can be traced
+    Notification.objects.bulk_create(
+        Notification(
+            channel=Notification.EMAIL,
+            order_id=email.get("order_id"),
+            message=email["message"],
+            recipient=recipient,
+            status=status,
+            latency_ms=latency_ms,
+        )
+        for email in pending
+        for recipient in email["recipient_list"]
+    )
+    logger.info(f"Sent {len(pending)} queued emails as {len(messages)} messages, {remaining} still queued.")
+    return len(pending), remaining
@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generates synthetic categories, products, customers and orders for load testing. "
+        "The same --seed on the same empty database always produces the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42, help="random seed")
+        parser.add_argument("--category-depth", type=int, default=4, help="levels in the category tree")
+        parser.add_argument("--category-breadth", type=int, default=5, help="most children per category")
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--customers", type=int, default=10_000)
+        parser.add_argument("--orders", type=int, default=50_000)
+        parser.add_argument("--max-basket", type=int, default=50, help="most items in one order")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="rows per INSERT")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        chunk_size = options["chunk_size"]
+        started = time.monotonic()
+
+        def progress(kind, done, total):
+            if done == total or done % (chunk_size * 20) < chunk_size:
+                self.stdout.write(f"{kind}: {done}/{total} ({time.monotonic() - started:.0f}s)")
+
+        leaf_ids = seeding.seed_categories(rng, options["category_depth"], options["category_breadth"])
+        self.stdout.write(f"categories: {len(leaf_ids)} leaves")
+        seeding.seed_products(rng, options["products"], leaf_ids, chunk_size, progress)
+        seeding.seed_customers(rng, options["customers"], chunk_size, progress)
+        if options["orders"]:
+            seeding.seed_orders(rng, options["orders"], options["max_basket"], chunk_size, progress)
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded the shop in {time.monotonic() - started:.0f}s."))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarizes the request profiles saved by RequestProfilingMiddleware: time per view, "
+        "the functions and the SQL queries that took the most time across all samples."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=settings.REQUEST_PROFILING_DIR, help="profiles directory")
+        parser.add_argument("--view", help="only samples of this view, e.g. OrderViewSet.create")
+        parser.add_argument("--limit", type=int, default=20, help="functions and queries to show")
+        parser.add_argument(
+            "--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"], help="function order"
+        )
+        parser.add_argument("--full-paths", action="store_true", help="show functions' full file paths")
+
+    def handle(self, *args, **options):
+        samples = profiling.load_samples(options["dir"], options["view"])
+        if not samples:
+            raise CommandError(f"No request profiles found in {options['dir']}.")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Views ({len(samples)} samples)"))
+        for view in profiling.summarize_views(samples):
+            self.stdout.write(
+                f"{view['view']:<45} {view['samples']:>6} samples  median {view['median_ms']:>9.1f}ms  "
+                f"max {view['max_ms']:>9.1f}ms  {view['mean_queries']:>7.1f} queries"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nTop functions"))
+        self.stdout.write(
+            profiling.format_top_functions(samples, options["sort"], options["limit"], options["full_paths"])
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nTop queries by total time"))
+        for query in profiling.summarize_queries(samples, options["limit"]):
+            self.stdout.write(
+                f"{query['seconds'] * 1000:>10.1f}ms  {query['count']:>7} runs  "
+                f"in {query['samples']} samples\n    {query['sql']}"
+            )
@@ -0,0 +1,173 @@
+"""
+Prometheus metrics.
+
+API requests are timed per view (``ViewSet.action`` for DRF views) with their database query
+count and time, see shop.middleware.RequestMetricsMiddleware. Cache lookups are counted as hits
+or misses per cache, and Celery tasks are timed and their failures and retries counted per task.
+
+Customer SMS latency is tracked per template in three stages, so a slow notification can be
+traced to the outbox, the queue or the gateway:
+
+* enqueue - from the order event (outbox row written) to the SMS being handed to Celery or the batch queue
+* queue wait - from there until a worker picks it up, including the batch window and retry backoff
+* send - the gateway call
+
+plus the end-to-end delivery time from the order event to the gateway's answer.
+
+Order transactions retried after a deadlock or serialization failure are counted per
+operation and reason (see shop.db_retry).
+
+With several processes per container (gunicorn or Celery prefork workers), set
+PROMETHEUS_MULTIPROC_DIR so the processes' samples are aggregated into one scrape. gunicorn
+empties it on start and drops exited workers' gauges (config/gunicorn.py).
+"""
+
+import hmac
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+# from sub-second sends to notifications that waited out a gateway outage
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+SMS_ENQUEUE_SECONDS = Histogram(
+    "ekiosk_sms_enqueue_seconds",
+    "Time from the order event to the SMS being queued for sending",
+    ["template"],
+    buckets=LATENCY_BUCKETS,
+)
+SMS_QUEUE_WAIT_SECONDS = Histogram(
+    "ekiosk_sms_queue_wait_seconds",
+    "Time an SMS waited in the Celery or batch queue before a worker picked it up",
+    ["template"],
+    buckets=LATENCY_BUCKETS,
+)
+SMS_SEND_SECONDS = Histogram(
+    "ekiosk_sms_send_seconds",
+    "Duration of the SMS gateway call",
+    ["template"],
+)
+SMS_DELIVERY_SECONDS = Histogram(
+    "ekiosk_sms_delivery_seconds",
+    "Time from the order event to the SMS gateway accepting the message",
+    ["template"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# requests and Celery tasks, in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ekiosk_http_request_seconds",
+    "Time to answer an API request",
+    ["view", "method", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "ekiosk_http_requests_in_progress",
+    "API requests being answered",
+    multiprocess_mode="livesum",
+)
+HTTP_REQUEST_QUERIES = Histogram(
+    "ekiosk_http_request_queries",
+    "Database queries run to answer an API request",
+    ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "ekiosk_http_request_db_seconds",
+    "Time an API request spent waiting on database queries",
+    ["view"],
+    buckets=REQUEST_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "ekiosk_cache_requests_total",
+    "Cache lookups, by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+
+CELERY_TASK_SECONDS = Histogram(
+    "ekiosk_celery_task_seconds",
+    "Duration of Celery task runs",
+    ["task", "state"],
+    buckets=REQUEST_BUCKETS + (60, 300, 900),
+)
+CELERY_TASK_FAILURES = Counter(
+    "ekiosk_celery_task_failures_total",
+    "Celery task runs that raised an exception",
+    ["task", "exception"],
+)
+CELERY_TASK_RETRIES = Counter(
+    "ekiosk_celery_task_retries_total",
+    "Celery task runs that scheduled a retry",
+    ["task"],
+)
+
+DB_TRANSACTION_RETRIES = Counter(
+    "ekiosk_db_transaction_retries_total",
+    "Order transactions run again after a deadlock or serialization failure",
+    ["operation", "reason"],
+)
+DB_TRANSACTION_RETRIES_EXHAUSTED = Counter(
+    "ekiosk_db_transaction_retries_exhausted_total",
+    "Order transactions that still failed after DB_RETRY_MAX_RETRIES retries",
+    ["operation", "reason"],
+)
+
+
+def observe_since(histogram, template_name, since):
+    """Records the seconds since ``since``, a time.time() value, skipping messages queued without one"""
+    if since is not None:
+        histogram.labels(template=template_name).observe(max(time.time() - since, 0))
+
+
+def record_cache_lookup(cache_name, hit):
+    CACHE_REQUESTS.labels(cache=cache_name, result="hit" if hit else "miss").inc()
+
+
+def get_registry():
+    """Returns the registry to expose, aggregating every process's samples in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, protected by the METRICS_TOKEN bearer token.
+    Without a token it is only served with DEBUG on, so a missing setting never exposes it in production.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            logger.warning("Refusing a /metrics scrape: METRICS_TOKEN is not set.")
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def start_metrics_server(port):
+    """Serves the metrics of this container's processes on ``port``, for processes without a web server"""
+    start_http_server(port, registry=get_registry())
+    logger.info(f"Serving Prometheus metrics on port {port}.")
@@ -0,0 +1,260 @@
+import hashlib
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import use_replicas
+from .health import LIVENESS_PATH, READINESS_PATH, get_readiness
+from .metrics import (
+    HTTP_REQUEST_DB_SECONDS,
+    HTTP_REQUEST_QUERIES,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS_IN_PROGRESS,
+)
+from .profiling import RequestProfile, should_profile
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class HealthCheckMiddleware:
+    """
+    Answers the liveness and readiness probes (see shop.health) before any other middleware.
+    Probes skip host validation, sessions and metrics, since orchestrators call the pod IP directly.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.path == LIVENESS_PATH:
+            return self.liveness()
+        if request.path == READINESS_PATH:
+            return self.readiness(get_readiness())
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path == LIVENESS_PATH:
+            return self.liveness()
+        if request.path == READINESS_PATH:
+            return self.readiness(await sync_to_async(get_readiness)())
+        return await self.get_response(request)
+
+    def liveness(self):
+        return JsonResponse({"status": "ok"}, headers={"Cache-Control": "no-store"})
+
+    def readiness(self, result):
+        ready, checks = result
+        return JsonResponse(
+            {"status": "ready" if ready else "not ready", "checks": checks},
+            status=200 if ready else 503,
+            headers={"Cache-Control": "no-store"},
+        )
+
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class QueryTimer:
+    """Database execute wrapper that counts queries and adds up their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def get_view_name(request):
+    """
+    Names the view that answered the request, ``ViewSet.action`` for DRF views.
+    Unresolved URLs share one name so scanners cannot create a label per path.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return match.view_name or f"{match.func.__module__}.{match.func.__qualname__}"
+    action = (getattr(match.func, "actions", None) or {}).get(request.method.lower())
+    return f"{view_class.__name__}.{action}" if action else view_class.__name__
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request per view and counts the database queries it ran (see shop.metrics).
+    Keep it first in MIDDLEWARE so the other middleware's work is included.
+    Async requests are timed too, but their queries run in other threads and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with HTTP_REQUESTS_IN_PROGRESS.track_inprogress(), ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+
+        view = self.observe(request, response, started)
+        HTTP_REQUEST_QUERIES.labels(view=view).observe(timer.count)
+        HTTP_REQUEST_DB_SECONDS.labels(view=view).observe(timer.seconds)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with HTTP_REQUESTS_IN_PROGRESS.track_inprogress():
+            response = await self.get_response(request)
+
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        view = get_view_name(request)
+        method = request.method if request.method in HTTP_METHODS else "other"
+        HTTP_REQUEST_SECONDS.labels(view=view, method=method, status=response.status_code).observe(
+            time.perf_counter() - started
+        )
+        return view
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles a sample of requests and saves the profile and SQL per view (see shop.profiling).
+    Async requests are passed through: cProfile cannot follow them across the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not should_profile(request):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        if not profile.start():
+            logger.warning("Could not profile request, another profiler is already running.")
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+
+        try:
+            profile.save(get_view_name(request), request, response)
+        except OSError as e:
+            logger.error(f"Could not save request profile. Exception: {e}", exc_info=True)
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe-method requests read from the database replicas.
+    A client that has just written is pinned to the primary for settings.REPLICA_PIN_SECONDS,
+    so it reads its own writes (e.g. a customer sees the order they just placed) despite replica lag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        pin_key = self.get_pin_key(request)
+        is_safe = request.method in SAFE_METHODS
+
+        with use_replicas(is_safe and not self.is_pinned(pin_key)):
+            response = self.get_response(request)
+
+        if not is_safe:
+            self.pin(pin_key)
+
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        pin_key = self.get_pin_key(request)
+        is_safe = request.method in SAFE_METHODS
+
+        with use_replicas(is_safe and not await sync_to_async(self.is_pinned)(pin_key)):
+            response = await self.get_response(request)
+
+        if not is_safe:
+            await sync_to_async(self.pin)(pin_key)
+
+        return response
+
+    def get_pin_key(self, request):
+        """Identifies the client by its credentials, so bearer-token kiosks without cookies are pinned too"""
+        identity = (
+            request.headers.get("Authorization")
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get("REMOTE_ADDR", "")
+        )
+        return f"db_pin:{hashlib.sha256(identity.encode('utf-8')).hexdigest()}"
+
+    def is_pinned(self, pin_key):
+        try:
+            return bool(get_redis().exists(pin_key))
+        except Exception as e:
+            # without the pin we cannot guarantee read-your-writes, so stay on the primary
+            logger.warning(f"Could not check primary pin, reading from primary. Exception: {e}")
+            return True
+
+    def pin(self, pin_key):
+        try:
+            get_redis().set(pin_key, 1, ex=settings.REPLICA_PIN_SECONDS)
+        except Exception as e:
+            logger.error(f"Could not pin client to the primary database. Exception: {e}", exc_info=True)
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0006_alter_category_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="message_id",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="recipient",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="status",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
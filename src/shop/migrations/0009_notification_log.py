@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0008_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="channel",
+            field=models.CharField(blank=True, choices=[("sms", "SMS"), ("email", "Email")], max_length=10),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="latency_ms",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="order",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="notifications",
+                to="shop.order",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="recipient",
+            field=models.CharField(blank=True, max_length=254),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["order", "created_at"], name="notification_order_created"),
+        ),
+    ]
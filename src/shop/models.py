@@ -4,7 +4,10 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.core.validators import EmailValidator, validate_email
-from django.db import IntegrityError, models, transaction
+from django.db import DatabaseError, IntegrityError, models, transaction
+
+from .db_retry import retry_on_conflict
+from .db_routers import use_primary
 
 
 class CustomUserManager(BaseUserManager):
@@ -143,6 +146,16 @@ class Product(models.Model):
         return self.name
 
 
+def lock_products(product_ids):
+    """
+    Locks the products for the current transaction and returns them by id.
+    Rows are always locked in primary-key order, so transactions with overlapping baskets
+    wait for each other instead of deadlocking.
+    """
+    products = Product.objects.filter(id__in=product_ids).select_for_update().order_by("id")
+    return {product.id: product for product in products}
+
+
 class Order(models.Model):
     PENDING = "pending"
     COMPLETED = "completed"
@@ -159,6 +172,8 @@ class Order(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @use_primary()
+    @retry_on_conflict("place_order")
     def place_order(self, items):
         """
         verifies stock for all items before placing the order
@@ -171,8 +186,7 @@ class Order(models.Model):
         product_ids = [item[0] for item in items]
 
         with transaction.atomic():
-            products = Product.objects.filter(id__in=product_ids).select_for_update()
-            product_map = {product.id: product for product in products}
+            product_map = lock_products(product_ids)
 
             # Calculate total price on order creation
             for product_id, quantity in items:
@@ -200,55 +214,91 @@ class Order(models.Model):
 
             self.notify_customer("order_placed", order_id=self.id)
 
+    @use_primary()
+    @retry_on_conflict("approve_order")
     def approve_order(self):
         """
         Admin approves an order, deducting stock for each item and sending notifications.
+        The order row and then its products are locked, so concurrent approvals cannot oversell.
         """
         if self.status != self.PENDING:
             return False  # Order must be pending to approve
 
-        with transaction.atomic():
-            for order_item in self.order_items.all():
-                if not order_item.product.reduce_stock(order_item.quantity):
-                    transaction.set_rollback(True)  # Roll back if any item is out of stock
+        try:
+            with transaction.atomic():
+                # another admin may have approved or cancelled it since it was loaded
+                if not self.lock_pending():
                     return False
 
-            self.status = self.COMPLETED
-            self.save()
+                order_items = list(self.order_items.all())
+                product_map = lock_products([order_item.product_id for order_item in order_items])
+                for order_item in order_items:
+                    if not product_map[order_item.product_id].reduce_stock(order_item.quantity):
+                        transaction.set_rollback(True)  # Roll back if any item is out of stock
+                        return False
+
+                self.status = self.COMPLETED
+                self.save()
 
-            self.notify_customer("order_approved", order_id=self.id)
+                self.notify_customer("order_approved", order_id=self.id)
+        except DatabaseError:
+            # rolled back while still pending, a retry must not find the order already approved
+            self.status = self.PENDING
+            raise
 
         return True
 
+    @use_primary()
+    @retry_on_conflict("cancel_order")
     def cancel_order(self):
         """Admin cancels an order notification sent to customer"""
         if self.status != self.PENDING:
             return False
 
-        with transaction.atomic():
-            self.status = self.CANCELLED
-            self.save()
+        try:
+            with transaction.atomic():
+                if not self.lock_pending():
+                    return False
 
-            self.notify_customer("order_cancelled", order_id=self.id)
+                self.status = self.CANCELLED
+                self.save()
+
+                self.notify_customer("order_cancelled", order_id=self.id)
+        except DatabaseError:
+            self.status = self.PENDING
+            raise
 
         return True
 
+    def lock_pending(self):
+        """Locks the order row for the current transaction and returns whether it is still pending"""
+        self.status = Order.objects.select_for_update().values_list("status", flat=True).get(pk=self.pk)
+        return self.status == self.PENDING
+
     def notify_customer(self, template_name, order_id):
-        """Sends an SMS to the customer as a background task."""
-        from .tasks import send_sms_task
+        """Queues an SMS to the customer, sent once the current transaction commits."""
+        from .outbox import enqueue_notification
 
         phone_number = self.customer.phone_number
-        send_sms_task.delay(to=phone_number, template_name=template_name, order_id=order_id)
+        enqueue_notification(
+            NotificationOutbox.SMS, to=phone_number, template_name=template_name, order_id=order_id
+        )
 
     def notify_admin(self):
-        """Notify admin via email"""
-        from .tasks import send_email_task
+        """Notify admin via email, sent once the current transaction commits"""
+        from .outbox import enqueue_notification
 
         subject = f"New Order #{self.id}"
         message = f"A new order #{self.id} placed for {self.customer.email} requires your attention."
         admin_email = ["admin@ekiosk.com"]
 
-        send_email_task.delay(subject, message, admin_email)
+        enqueue_notification(
+            NotificationOutbox.EMAIL,
+            subject=subject,
+            message=message,
+            recipient_list=admin_email,
+            order_id=self.id,
+        )
 
 
 class OrderItem(models.Model):
@@ -269,8 +319,64 @@ class OrderItem(models.Model):
 
 
 class Notification(models.Model):
+    """Log of sent notifications, one row per recipient. Old rows are pruned by shop.notification_log."""
+
+    SMS = "sms"
+    EMAIL = "email"
+
+    CHANNEL_CHOICES = [
+        (SMS, "SMS"),
+        (EMAIL, "Email"),
+    ]
+
+    SUCCESS = "Success"
+    FAILED = "Failed"
+    PARKED = "Parked"  # gateway unavailable, kept for a later retry (see shop.delivery)
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, blank=True)
+    # no database constraint: log rows must never block or cascade into order writes
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="notifications",
+    )
     message = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    recipient = models.CharField(max_length=254, blank=True)
+    status = models.CharField(max_length=50, blank=True)  # delivery status reported by the SMS gateway
+    message_id = models.CharField(max_length=100, blank=True)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)  # time the gateway took to accept it
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["order", "created_at"], name="notification_order_created")]
 
     def __str__(self):
         return f"{self.message[:20]}..."
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notifications written in the same transaction as the order event that triggers them.
+    They are dispatched after the commit and deleted once sent (see shop.outbox).
+    """
+
+    SMS = "sms"
+    EMAIL = "email"
+
+    CHANNEL_CHOICES = [
+        (SMS, "SMS"),
+        (EMAIL, "Email"),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # set once a drain has committed its claim and is handing the entry to Celery
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.channel} notification #{self.id}"
@@ -0,0 +1,51 @@
+"""
+Helpers for the Notification log: delivery details for the senders and bounded retention.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def elapsed_ms(started):
+    """Milliseconds since ``started``, a time.monotonic() value"""
+    return int((time.monotonic() - started) * 1000)
+
+
+def get_sms_status(response):
+    """Returns (status, message id) of the first recipient in an SMS API response"""
+    from shop.models import Notification
+
+    try:
+        recipient = response["SMSMessageData"]["Recipients"][0]
+    except (KeyError, IndexError, TypeError):
+        return Notification.FAILED, ""
+    return recipient.get("status", Notification.FAILED), recipient.get("messageId", "")
+
+
+def prune_notifications(retention_days=None, batch_size=None):
+    """
+    Deletes notifications older than the retention period and returns how many were deleted.
+    Rows go in batches of ``batch_size`` ids, each its own short statement, so no long locks are held.
+    """
+    from shop.models import Notification
+
+    retention_days = retention_days or settings.NOTIFICATION_RETENTION_DAYS
+    batch_size = batch_size or settings.NOTIFICATION_PRUNE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    deleted = 0
+    while True:
+        ids = list(
+            Notification.objects.filter(created_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += Notification.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,109 @@
+"""
+Transactional outbox for order notifications.
+
+Order events insert a NotificationOutbox row in their own transaction instead of talking to
+Redis/Celery while product rows are locked. Once the transaction commits, a drain task hands
+the rows to the SMS and email dispatchers in batches and deletes them. A rolled back order
+leaves no row, so nothing is sent for it. Rows whose drain could not be scheduled are picked up
+by the periodic sweep, so delivery is at least once.
+
+A drain claims its rows and commits before publishing, so nothing is published from a
+transaction that may still roll back. Rows of a drain that died after publishing are claimed
+again after NOTIFICATION_OUTBOX_CLAIM_TIMEOUT; the send tasks skip entries already delivered.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_KEY = "notification_outbox:scheduled"
+
+
+def enqueue_notification(channel, **payload):
+    """Records a notification in the current transaction and drains the outbox after commit"""
+    from shop.models import NotificationOutbox
+
+    NotificationOutbox.objects.create(channel=channel, payload=payload)
+    transaction.on_commit(schedule_outbox_drain)
+
+
+def schedule_outbox_drain():
+    """Queues one drain task for the events committed until it runs"""
+    from shop.tasks import drain_notification_outbox_task
+
+    try:
+        if get_redis().set(SCHEDULED_KEY, 1, nx=True, ex=60):
+            drain_notification_outbox_task.delay()
+    except Exception as e:
+        logger.error(f"Could not schedule outbox drain, the periodic sweep will send it. Exception: {e}")
+
+
+def dispatch(entry):
+    from shop.mail_batching import dispatch_admin_email
+    from shop.metrics import SMS_ENQUEUE_SECONDS, observe_since
+    from shop.models import NotificationOutbox
+    from shop.sms_batching import dispatch_sms
+
+    if entry.channel == NotificationOutbox.SMS:
+        event_at = entry.created_at.timestamp()
+        observe_since(SMS_ENQUEUE_SECONDS, entry.payload["template_name"], event_at)
+        dispatch_sms(**entry.payload, event_at=event_at, outbox_id=entry.id)
+    elif entry.channel == NotificationOutbox.EMAIL:
+        dispatch_admin_email(**entry.payload, outbox_id=entry.id)
+    else:
+        logger.error(f"Dropping outbox entry {entry.id} with unknown channel {entry.channel}.")
+
+
+def claim_entries(batch_size):
+    """Claims up to ``batch_size`` entries that no live drain is handling, and commits the claim"""
+    from shop.models import NotificationOutbox
+
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.NOTIFICATION_OUTBOX_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=expired))
+            .order_by("id")[:batch_size]
+        )
+        if entries:
+            NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(claimed_at=now)
+    return entries
+
+
+def drain_outbox(batch_size=None):
+    """
+    Dispatches pending outbox entries in batches and returns how many were handled.
+    Rows are claimed with SKIP LOCKED, so concurrent drains never send the same entry.
+    A batch is published only once its claim has committed, and deleted once published.
+    """
+    from shop.models import NotificationOutbox
+
+    batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    handled = 0
+    while True:
+        entries = claim_entries(batch_size)
+        if not entries:
+            return handled
+
+        dispatched = []
+        try:
+            for entry in entries:
+                dispatch(entry)
+                dispatched.append(entry.id)
+        finally:
+            NotificationOutbox.objects.filter(id__in=dispatched).delete()
+            failed = [entry.id for entry in entries if entry.id not in dispatched]
+            if failed:
+                # left to the next drain right away instead of waiting for the claim to expire
+                NotificationOutbox.objects.filter(id__in=failed).update(claimed_at=None)
+
+        handled += len(entries)
@@ -4,6 +4,17 @@ from rest_framework.permissions import SAFE_METHODS, BasePermission
 User = get_user_model()
 
 
+class IsAdmin(BasePermission):
+    """Allow access to authenticated admins only."""
+
+    def has_permission(self, request, view):
+        return (
+            request.user.is_authenticated
+            and hasattr(request.user, "role")
+            and request.user.role == User.ADMIN
+        )
+
+
 class IsAdminOrReadOnly(BasePermission):
     """Allow read-only access for everyone, but only admins can modify resources."""
 
@@ -0,0 +1,183 @@
+"""
+Request profiling for production hot-path analysis.
+
+RequestProfilingMiddleware (shop.middleware) profiles a random sample of requests
+(settings.REQUEST_PROFILING_RATE), and any request sending settings.REQUEST_PROFILING_TOKEN in
+the X-Profile-Token header. Each profiled request leaves two files in
+REQUEST_PROFILING_DIR/<view>/:
+
+* ``<sample>.prof`` - cProfile stats, readable with pstats or snakeviz
+* ``<sample>.json`` - the request, its duration and the SQL it ran, with each query's time
+
+``manage.py summarize_profiles`` adds up the top functions and queries across samples.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+PROFILE_HEADER = "X-Profile-Token"
+
+IN_LIST_REGEX = re.compile(r"IN \((?:%s, )*%s\)")
+VALUES_REGEX = re.compile(r"VALUES (\([^()]*\))(?:, \([^()]*\))+")
+
+
+def should_profile(request):
+    """Profiles requests carrying the profiling token, and a random sample of the others"""
+    token = settings.REQUEST_PROFILING_TOKEN
+    header = request.headers.get(PROFILE_HEADER)
+    if token and header and hmac.compare_digest(header, token):
+        return True
+    rate = settings.REQUEST_PROFILING_RATE
+    return rate > 0 and random.random() < rate
+
+
+class SQLRecorder:
+    """Database execute wrapper that keeps each query's SQL and time, up to ``limit`` queries"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queries = []
+        self.dropped = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < self.limit:
+                self.queries.append({"sql": sql, "seconds": round(time.perf_counter() - started, 6)})
+            else:
+                self.dropped += 1
+
+
+class RequestProfile:
+    """
+    Profiles the code run between start() and stop() and records its SQL.
+    cProfile only sees the thread that started it, which is the request's thread.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sql = SQLRecorder(settings.REQUEST_PROFILING_MAX_QUERIES)
+        self.duration = None
+
+    def start(self):
+        """Returns False, without recording anything, if another profiler is already active"""
+        try:
+            self.profiler.enable()
+        except ValueError:
+            return False
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self.sql))
+        self._started = time.perf_counter()
+        return True
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        self.profiler.disable()
+        self._stack.close()
+
+    def save(self, view, request, response):
+        """Writes the profile and the request's SQL under the view's directory, returns their path prefix"""
+        directory = os.path.join(settings.REQUEST_PROFILING_DIR, re.sub(r"[^\w.-]", "_", view))
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}")
+
+        self.profiler.dump_stats(f"{prefix}.prof")
+        sample = {
+            "view": view,
+            "method": request.method,
+            # the query string is left out, it may carry tokens
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(self.duration * 1000, 3),
+            "queries": self.sql.queries,
+            "dropped_queries": self.sql.dropped,
+        }
+        with open(f"{prefix}.json", "w") as f:
+            json.dump(sample, f)
+        return prefix
+
+
+def load_samples(directory, view=None):
+    """Returns the saved samples as (.prof path, sample dict), optionally only those of one view"""
+    samples = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(root, name)) as f:
+                sample = json.load(f)
+            if view and sample["view"] != view:
+                continue
+            profile_path = os.path.join(root, f"{name[:-5]}.prof")
+            if os.path.exists(profile_path):
+                samples.append((profile_path, sample))
+    return samples
+
+
+def normalize_sql(sql):
+    """Folds IN lists and multi-row VALUES of any length, so the same query always reads the same"""
+    return VALUES_REGEX.sub(r"VALUES \1, ...", IN_LIST_REGEX.sub("IN (...)", sql))
+
+
+def summarize_views(samples):
+    """Returns per-view sample count, median and slowest duration, and mean query count"""
+    by_view = defaultdict(list)
+    for _, sample in samples:
+        by_view[sample["view"]].append(sample)
+    return [
+        {
+            "view": view,
+            "samples": len(view_samples),
+            "median_ms": statistics.median(sample["duration_ms"] for sample in view_samples),
+            "max_ms": max(sample["duration_ms"] for sample in view_samples),
+            "mean_queries": statistics.mean(
+                len(sample["queries"]) + sample["dropped_queries"] for sample in view_samples
+            ),
+        }
+        for view, view_samples in sorted(by_view.items())
+    ]
+
+
+def summarize_queries(samples, limit):
+    """Returns the ``limit`` queries that took the most time in total across samples"""
+    totals = defaultdict(lambda: {"count": 0, "seconds": 0.0, "samples": 0})
+    for _, sample in samples:
+        seen = set()
+        for query in sample["queries"]:
+            sql = normalize_sql(query["sql"])
+            totals[sql]["count"] += 1
+            totals[sql]["seconds"] += query["seconds"]
+            if sql not in seen:
+                totals[sql]["samples"] += 1
+                seen.add(sql)
+    ranked = sorted(totals.items(), key=lambda item: item[1]["seconds"], reverse=True)
+    return [{"sql": sql, **total} for sql, total in ranked[:limit]]
+
+
+def format_top_functions(samples, sort="cumulative", limit=25, full_paths=False):
+    """Returns the pstats report of all samples' profiles combined, sorted by ``sort``"""
+    stream = io.StringIO()
+    stats = pstats.Stats(*(profile_path for profile_path, _ in samples), stream=stream)
+    # pstats would start with a line per profile file
+    stats.files = []
+    if not full_paths:
+        stats.strip_dirs()
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue().strip("\n")
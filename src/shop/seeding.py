@@ -0,0 +1,191 @@
+"""
+Synthetic shop data for load tests and benchmarks, used by ``manage.py seed_shop``.
+
+Rows are built in memory and written with bulk_create in chunks, so no signals run and each
+chunk is one INSERT. All randomness comes from the ``random.Random`` passed in, so the same seed
+on the same (empty) database always produces the same data.
+
+Distributions are skewed like a real catalog: prices are log-normal, stock is heavy-tailed with
+some products sold out, and a few categories and products get most of the traffic (log-uniform ranks).
+"""
+
+import math
+from array import array
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+
+from .models import Category, Order, OrderItem, Product, User
+
+SEED_EMAIL_DOMAIN = "seed.ekiosk.example"
+
+ADJECTIVES = [
+    "Fresh",
+    "Organic",
+    "Classic",
+    "Premium",
+    "Family",
+    "Mini",
+    "Jumbo",
+    "Spicy",
+    "Crunchy",
+    "Smart",
+]
+NOUNS = [
+    "Maize Flour",
+    "Tea Leaves",
+    "Sugar",
+    "Milk",
+    "Bread",
+    "Soap",
+    "Cooking Oil",
+    "Rice",
+    "Juice",
+    "Charger",
+]
+
+
+def skewed_index(rng, count):
+    """Returns an index in [0, count) where low indexes are far more likely, like popularity ranks"""
+    return min(int(math.exp(rng.random() * math.log(count + 1))) - 1, count - 1)
+
+
+def chunks(count, chunk_size):
+    """Yields (start, size) pairs covering ``count`` items"""
+    for start in range(0, count, chunk_size):
+        yield start, min(chunk_size, count - start)
+
+
+def seed_categories(rng, depth=4, breadth=5):
+    """
+    Creates a category tree ``depth`` levels deep with up to ``breadth`` children per category.
+    Returns the ids of the leaf categories, where products are filed.
+    """
+    parents = [None]
+    for level in range(depth):
+        categories = []
+        for parent in parents:
+            prefix = f"{parent.name}." if parent else "Category "
+            children = breadth if level == 0 else rng.randint(1, breadth)
+            categories.extend(Category(name=f"{prefix}{i + 1}", parent=parent) for i in range(children))
+        parents = Category.objects.bulk_create(categories)
+    return [category.id for category in parents]
+
+
+def generate_price_cents(rng):
+    """Log-normal price in cents, median around KES 800"""
+    return max(100, min(int(rng.lognormvariate(11.3, 1.1)), 99_999_999))
+
+
+def generate_stock(rng):
+    """Roughly 10% sold out, most products with a handful in stock and a long tail of bulk items"""
+    if rng.random() < 0.1:
+        return 0
+    return min(int(rng.paretovariate(1.1) * 5), 10_000)
+
+
+def seed_products(rng, count, category_ids, chunk_size=5000, progress=None):
+    """Creates ``count`` products filed under ``category_ids``, a few categories holding most of them"""
+    for start, size in chunks(count, chunk_size):
+        products = []
+        for i in range(start, start + size):
+            price_cents = generate_price_cents(rng)
+            discount_cents = int(price_cents * rng.uniform(0.7, 0.95)) if rng.random() < 0.15 else None
+            products.append(
+                Product(
+                    name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i + 1}",
+                    category_id=category_ids[skewed_index(rng, len(category_ids))],
+                    price=Decimal(price_cents) / 100,
+                    discount_price=Decimal(discount_cents) / 100 if discount_cents else None,
+                    stock=generate_stock(rng),
+                )
+            )
+        Product.objects.bulk_create(products)
+        if progress:
+            progress("products", start + size, count)
+
+
+def generate_phone_number(rng):
+    """A Kenyan mobile number in the format the User model validates (+254 and 9 digits)"""
+    return f"+254{rng.choice('71')}{rng.randrange(10**8):08d}"
+
+
+def seed_customers(rng, count, chunk_size=5000, progress=None):
+    """Creates ``count`` OIDC customers with unusable passwords, numbered after any seeded before"""
+    offset = User.objects.filter(email__endswith=f"@{SEED_EMAIL_DOMAIN}").count()
+    password = make_password(None)
+    for start, size in chunks(count, chunk_size):
+        User.objects.bulk_create(
+            User(
+                email=f"customer{offset + i + 1}@{SEED_EMAIL_DOMAIN}",
+                openid_sub=f"seed|{offset + i + 1}",
+                role=User.CUSTOMER,
+                phone_number=generate_phone_number(rng),
+                password=password,
+            )
+            for i in range(start, start + size)
+        )
+        if progress:
+            progress("customers", start + size, count)
+
+
+def load_product_prices(chunk_size=5000):
+    """Returns the ids and current prices (in cents) of all products, as compact arrays"""
+    product_ids, prices = array("q"), array("q")
+    rows = Product.objects.order_by("id").values_list("id", "price", "discount_price")
+    for product_id, price, discount_price in rows.iterator(chunk_size=chunk_size):
+        product_ids.append(product_id)
+        prices.append(int((discount_price or price) * 100))
+    return product_ids, prices
+
+
+def generate_basket(rng, product_count, max_items):
+    """Returns {product index: quantity}: mostly 1-3 items, rarely up to ``max_items``"""
+    size = min(1 + int(rng.expovariate(1 / 2.5)), max_items)
+    basket = {}
+    for _ in range(size):
+        index = skewed_index(rng, product_count)
+        basket[index] = basket.get(index, 0) + 1 + int(rng.expovariate(2))
+    return basket
+
+
+def basket_total_cents(prices, basket):
+    return sum(prices[index] * quantity for index, quantity in basket.items())
+
+
+ORDER_STATUSES = [Order.COMPLETED, Order.PENDING, Order.CANCELLED]
+ORDER_STATUS_WEIGHTS = [70, 20, 10]
+
+
+def seed_orders(rng, count, max_items=50, chunk_size=2000, progress=None):
+    """
+    Creates ``count`` orders for the existing customers from the existing products.
+    Order totals always match their items. Stock is not reduced: this is history, not live traffic.
+    """
+    customer_ids = list(User.objects.filter(role=User.CUSTOMER).order_by("id").values_list("id", flat=True))
+    product_ids, prices = load_product_prices()
+    if not customer_ids or not product_ids:
+        raise ValueError("Seeding orders needs customers and products.")
+
+    for start, size in chunks(count, chunk_size):
+        baskets = [generate_basket(rng, len(product_ids), max_items) for _ in range(size)]
+        orders = Order.objects.bulk_create(
+            Order(
+                customer_id=rng.choice(customer_ids),
+                status=rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0],
+                total_price=Decimal(basket_total_cents(prices, basket)) / 100,
+            )
+            for basket in baskets
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product_id=product_ids[index],
+                quantity=quantity,
+                price_at_time_of_order=Decimal(prices[index]) / 100,
+            )
+            for order, basket in zip(orders, baskets)
+            for index, quantity in basket.items()
+        )
+        if progress:
+            progress("orders", start + size, count)
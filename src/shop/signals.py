@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth_cache import invalidate_cached_user
+from .catalog_snapshot import schedule_catalog_snapshot
+from .models import Category, Product
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, update_fields=None, **kwargs):
+    """Rebuild the catalog snapshot when a product changes, stock-only saves on a slower schedule"""
+    schedule_catalog_snapshot(stock_only=update_fields is not None and set(update_fields) == {"stock"})
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Rebuild the catalog snapshot whenever products or categories change"""
+    schedule_catalog_snapshot()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached user now and again once the change commits, so readers cannot re-cache old data"""
+    invalidate_cached_user(instance)
+    transaction.on_commit(lambda: invalidate_cached_user(instance))
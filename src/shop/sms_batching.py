@@ -0,0 +1,216 @@
+"""
+Batched SMS dispatch.
+
+SMS, including replayed parked ones, are queued in Redis and sent by ``flush_sms_batch_task`` once
+settings.SMS_BATCH_WINDOW seconds have passed. A flush renders the queued SMS and groups them by text:
+SMS with the same text go out in one multi-recipient AfricasTalking call. Order SMS carry the
+customer's number and order id, so the bulk endpoint, which takes one text per call, needs a call for
+each of them. The flush makes those calls concurrently over the client's pooled connections, one
+Celery task per batch instead of one per SMS, and records every recipient's delivery status in
+Notification with one bulk insert. Only SMS that cannot be queued are sent, and logged, one by one.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .batch_queue import BatchQueue
+from .delivery import SMS, delivered_ids, get_breaker, mark_delivered, park
+from .metrics import (
+    SMS_DELIVERY_SECONDS,
+    SMS_QUEUE_WAIT_SECONDS,
+    SMS_SEND_SECONDS,
+    observe_since,
+)
+from .notification_log import elapsed_ms
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE = BatchQueue("sms_batch")
+QUEUE_KEY = QUEUE.pending_key
+SCHEDULED_KEY = "sms_batch:scheduled"
+
+
+def dispatch_sms(to, template_name, order_id, event_at=None, outbox_id=None):
+    """
+    Sends a templated SMS through the batch queue.
+    ``event_at`` is when the order event happened, carried along with the queue time for latency metrics.
+    ``outbox_id`` lets the send skip an outbox entry that was already delivered.
+    SMS that cannot be queued, e.g. while Redis is unreachable, are sent on their own by send_sms_task.
+    """
+    from shop.tasks import send_sms_task
+
+    sms = {
+        "to": to,
+        "template_name": template_name,
+        "order_id": order_id,
+        "event_at": event_at,
+        "queued_at": time.time(),
+        "outbox_id": outbox_id,
+    }
+    try:
+        queue_sms(sms)
+    except Exception as e:
+        logger.warning(f"Could not queue SMS to {to}, sending it directly. Exception: {e}")
+        send_sms_task.delay(**sms)
+
+
+def queue_sms(sms):
+    """
+    Queues an SMS for the next flush, scheduled SMS_BATCH_WINDOW seconds after the first SMS it sends.
+    With no window the flush runs as soon as a worker is free, still sending whatever queued up meanwhile.
+    Parked SMS are replayed through here too, so every SMS is logged with its batch's bulk insert.
+    """
+    from shop.tasks import flush_sms_batch_task
+
+    window = settings.SMS_BATCH_WINDOW
+    QUEUE.push(sms)
+    if get_redis().set(SCHEDULED_KEY, 1, nx=True, ex=window + 60):
+        flush_sms_batch_task.apply_async(countdown=window)
+
+
+def group_by_message(client, pending):
+    """Renders the queued SMS and groups them by text, returned as {message: [queued SMS]}"""
+    groups = {}
+    for sms in pending:
+        message = client.get_templated_message(
+            template_name=sms["template_name"], to=sms["to"], order_id=sms["order_id"]
+        )
+        groups.setdefault(message, []).append(sms)
+    return groups
+
+
+def chunk_recipients(queued, max_recipients):
+    """
+    Splits the SMS queued for one message into API calls of at most ``max_recipients``.
+    A number queued twice gets its second SMS in a later call, as a recipient list with duplicates
+    would be collapsed into one message by the gateway.
+    """
+    chunks = []
+    for sms in queued:
+        for chunk in chunks:
+            if len(chunk) < max_recipients and sms["to"] not in chunk:
+                chunk[sms["to"]] = sms
+                break
+        else:
+            chunks.append({sms["to"]: sms})
+    return chunks
+
+
+def record_sent(sent, latency_ms):
+    """Records the gateway call and end-to-end latency of SMS the gateway accepted"""
+    for sms in sent:
+        SMS_SEND_SECONDS.labels(template=sms["template_name"]).observe(latency_ms / 1000)
+        observe_since(SMS_DELIVERY_SECONDS, sms["template_name"], sms.get("event_at"))
+
+
+def send_chunk(client, message, chunk):
+    """Sends one message to a chunk's recipients and returns (statuses, latency in ms)"""
+    started = time.monotonic()
+    statuses = client.send_bulk_sms(list(chunk), message)
+    return statuses, elapsed_ms(started)
+
+
+def flush_sms_batch():
+    """
+    Sends up to SMS_BATCH_MAX_SIZE queued SMS and returns (sent, still queued).
+    Gateway calls run SMS_BATCH_CONCURRENCY at a time, the breaker is asked before each round of calls.
+    SMS are parked instead while the gateway's circuit breaker is open or when a send fails.
+    """
+    from shop.africastalking_client import (
+        get_africastalking_client,
+        is_valid_phone_number,
+    )
+    from shop.models import Notification
+
+    get_redis().delete(SCHEDULED_KEY)
+    batch, remaining = QUEUE.pop(settings.SMS_BATCH_MAX_SIZE)
+    pending = batch.items
+    if not pending:
+        return 0, remaining
+
+    for sms in pending:
+        observe_since(SMS_QUEUE_WAIT_SECONDS, sms["template_name"], sms.get("queued_at"))
+
+    delivered = delivered_ids(sms.get("outbox_id") for sms in pending)
+    if delivered:
+        logger.info(f"Skipping SMS of outbox entries {sorted(delivered)}, already delivered.")
+        batch.ack([sms for sms in pending if sms.get("outbox_id") in delivered])
+        pending = [sms for sms in pending if sms.get("outbox_id") not in delivered]
+
+    client = get_africastalking_client()
+    breaker = get_breaker(SMS)
+    notifications = []
+    # a bad number would fail, and park, its whole chunk: record it as failed and send the others
+    invalid = [sms for sms in pending if not is_valid_phone_number(sms["to"])]
+    for sms in invalid:
+        logger.warning(f"Not sending SMS for order {sms['order_id']}, invalid phone number {sms['to']!r}.")
+        notifications.append(
+            Notification(
+                channel=Notification.SMS,
+                order_id=sms["order_id"],
+                message=client.get_templated_message(
+                    template_name=sms["template_name"], to=sms["to"], order_id=sms["order_id"]
+                ),
+                recipient=sms["to"] or "",
+                status=Notification.FAILED,
+            )
+        )
+    batch.ack(invalid)
+    mark_delivered(sms.get("outbox_id") for sms in invalid)
+    pending = [sms for sms in pending if is_valid_phone_number(sms["to"])]
+
+    calls = [
+        (message, chunk)
+        for message, queued in group_by_message(client, pending).items()
+        for chunk in chunk_recipients(queued, settings.SMS_BATCH_MAX_RECIPIENTS)
+    ]
+    concurrency = settings.SMS_BATCH_CONCURRENCY
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for start in range(0, len(calls), concurrency):
+            stop = start + concurrency
+            # a round whose calls open the breaker stops the next rounds from reaching the gateway
+            sends = [
+                (
+                    message,
+                    chunk,
+                    executor.submit(send_chunk, client, message, chunk) if breaker.allow() else None,
+                )
+                for message, chunk in calls[start:stop]
+            ]
+            for message, chunk, send in sends:
+                statuses, latency_ms = send.result() if send else (None, None)
+                if send and statuses is None:
+                    breaker.record_failure()
+                elif send:
+                    breaker.record_success()
+                    record_sent(chunk.values(), latency_ms)
+                    mark_delivered(sms.get("outbox_id") for sms in chunk.values())
+
+                if statuses is None:
+                    for sms in chunk.values():
+                        park(SMS, sms)
+                    statuses = {number: {"status": Notification.PARKED} for number in chunk}
+                # sent or parked, a worker dying from here on does not send them twice
+                batch.ack(chunk.values())
+
+                notifications.extend(
+                    Notification(
+                        channel=Notification.SMS,
+                        order_id=chunk[number]["order_id"],
+                        message=message,
+                        recipient=number,
+                        status=status.get("status", Notification.FAILED),
+                        message_id=status.get("messageId", ""),
+                        latency_ms=latency_ms,
+                    )
+                    for number, status in statuses.items()
+                )
+
+    batch.close()
+    Notification.objects.bulk_create(notifications)
+    logger.info(f"Sent {len(pending)} queued SMS in {len(calls)} calls, {remaining} still queued.")
+    return len(pending), remaining
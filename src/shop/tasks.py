@@ -1,46 +1,298 @@
 import logging
+import time
 
 from celery import shared_task
+from celery.exceptions import Retry
+from celery.signals import (
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_process_init,
+    worker_ready,
+)
+from django.conf import settings
 from django.core.mail import send_mail
 
-from .africastalking_client import AfricasTalkingClient
+from .africastalking_client import (
+    get_africastalking_client,
+    is_valid_phone_number,
+    reset_africastalking_client,
+)
+from .delivery import (
+    EMAIL,
+    SMS,
+    GatewayError,
+    delivered_ids,
+    get_breaker,
+    mark_delivered,
+    park,
+    retry_or_park,
+)
+from .metrics import (
+    CELERY_TASK_FAILURES,
+    CELERY_TASK_RETRIES,
+    CELERY_TASK_SECONDS,
+    SMS_DELIVERY_SECONDS,
+    SMS_QUEUE_WAIT_SECONDS,
+    SMS_SEND_SECONDS,
+    observe_since,
+    start_metrics_server,
+)
+from .notification_log import elapsed_ms, get_sms_status
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def send_sms_task(to, template_name, order_id):
-    """Background task to send SMS with exception handling"""
+@worker_process_init.connect
+def init_worker_clients(**kwargs):
+    """Creates the SMS client once per worker process, after the fork, so connections are not shared"""
+    reset_africastalking_client()
+    get_africastalking_client()
+
+
+@worker_ready.connect
+def start_worker_metrics_server(**kwargs):
+    """Exposes the worker's metrics for Prometheus, the API's /metrics endpoint cannot see them"""
+    if settings.CELERY_METRICS_PORT:
+        start_metrics_server(settings.CELERY_METRICS_PORT)
+
+
+# start times of the tasks running in this process, by task id
+_task_started = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.monotonic()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_SECONDS.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.monotonic() - started
+        )
+
+
+@task_failure.connect
+def count_task_failure(sender=None, exception=None, **kwargs):
+    CELERY_TASK_FAILURES.labels(task=sender.name, exception=type(exception).__name__).inc()
+
+
+@task_retry.connect
+def count_task_retry(sender=None, **kwargs):
+    CELERY_TASK_RETRIES.labels(task=sender.name).inc()
+
+
+@shared_task(bind=True, max_retries=settings.NOTIFICATION_MAX_RETRIES)
+def send_sms_task(self, to, template_name, order_id, event_at=None, queued_at=None, outbox_id=None):
+    """
+    Background task to send SMS with exception handling, for SMS that could not be queued for a batch.
+    Retried with backoff when the gateway fails, parked while its circuit breaker is open.
+    An outbox entry that was already delivered is skipped.
+    """
     from shop.models import Notification
 
+    if outbox_id in delivered_ids([outbox_id]):
+        logger.info(f"Skipping SMS of outbox entry {outbox_id}, already delivered.")
+        return
+
+    observe_since(SMS_QUEUE_WAIT_SECONDS, template_name, queued_at)
+    task_kwargs = {
+        "to": to,
+        "template_name": template_name,
+        "order_id": order_id,
+        "event_at": event_at,
+        "queued_at": queued_at,
+        "outbox_id": outbox_id,
+    }
+    breaker = get_breaker(SMS)
     try:
-        client = AfricasTalkingClient()
+        client = get_africastalking_client()
         message = client.get_templated_message(template_name=template_name, to=to, order_id=order_id)
+        notification = Notification(
+            channel=Notification.SMS, order_id=order_id, message=message, recipient=to or ""
+        )
+
+        if not is_valid_phone_number(to):
+            # the customer's number is wrong, not the gateway: no retry, no breaker failure
+            logger.warning(f"Not sending SMS for order {order_id}, invalid phone number {to!r}.")
+            notification.status = Notification.FAILED
+            notification.save()
+            mark_delivered([outbox_id])
+            return
+
+        if not breaker.allow():
+            park(SMS, task_kwargs)
+            notification.status = Notification.PARKED
+            notification.save()
+            return
+
+        started = time.monotonic()
         response = client.send_sms(to, message)
+        notification.latency_ms = elapsed_ms(started)
 
-        if response:
-            Notification.objects.create(message=message)
-            logger.info(f"Notification created for order {order_id}.")
-        else:
+        if response is None:
+            breaker.record_failure()
             logger.warning(f"Failed to send SMS to {to}. No response.")
+            retry_or_park(self, SMS, task_kwargs, GatewayError(f"SMS gateway failed for order {order_id}."))
+            notification.status = Notification.PARKED
+            notification.save()
+            return
+
+        breaker.record_success()
+        mark_delivered([outbox_id])
+        SMS_SEND_SECONDS.labels(template=template_name).observe(notification.latency_ms / 1000)
+        observe_since(SMS_DELIVERY_SECONDS, template_name, event_at)
+        notification.status, notification.message_id = get_sms_status(response)
+        notification.save()
+        logger.info(f"Notification created for order {order_id}.")
 
+    except Retry:
+        raise
     except Exception as e:
         logger.error(f"Error sending SMS to {to}. Exception: {e}", exc_info=True)
 
 
 @shared_task
-def send_email_task(subject, message, recipient_list):
-    """Sends an email to admin asynchronously"""
-    from shop.models import Notification
+def drain_notification_outbox_task():
+    """Dispatches the notifications committed to the outbox"""
+    from shop.outbox import SCHEDULED_KEY, drain_outbox
+    from shop.redis_client import get_redis
+
+    get_redis().delete(SCHEDULED_KEY)
+    count = drain_outbox()
+    if count:
+        logger.info(f"Dispatched {count} notifications from the outbox.")
+
+
+@shared_task
+def flush_sms_batch_task():
+    """Sends the SMS queued by shop.sms_batching.dispatch_sms"""
+    from shop.sms_batching import flush_sms_batch
 
     try:
-        send_mail(
-            subject=subject,
+        _, remaining = flush_sms_batch()
+    except Exception as e:
+        logger.error(f"Error sending queued SMS. Exception: {e}", exc_info=True)
+        return
+
+    if remaining:
+        flush_sms_batch_task.delay()
+
+
+@shared_task(bind=True, max_retries=settings.NOTIFICATION_MAX_RETRIES)
+def send_email_task(self, subject, message, recipient_list, order_id=None, outbox_id=None):
+    """
+    Sends an email to admin asynchronously.
+    Retried with backoff when SMTP fails, parked while its circuit breaker is open.
+    An outbox entry that was already delivered is skipped.
+    """
+    from shop.models import Notification
+
+    if outbox_id in delivered_ids([outbox_id]):
+        logger.info(f"Skipping email of outbox entry {outbox_id}, already delivered.")
+        return
+
+    task_kwargs = {
+        "subject": subject,
+        "message": message,
+        "recipient_list": recipient_list,
+        "order_id": order_id,
+        "outbox_id": outbox_id,
+    }
+    breaker = get_breaker(EMAIL)
+    started = time.monotonic()
+
+    if not breaker.allow():
+        park(EMAIL, task_kwargs)
+        status = Notification.PARKED
+    else:
+        try:
+            send_mail(
+                subject=subject,
+                message=message,
+                from_email="admin@ekiosk.com",
+                recipient_list=recipient_list,
+                fail_silently=False,
+            )
+            breaker.record_success()
+            mark_delivered([outbox_id])
+            status = Notification.SUCCESS
+        except Exception as e:
+            logger.error(f"Error sending email. Exception: {e}", exc_info=True)
+            breaker.record_failure()
+            retry_or_park(self, EMAIL, task_kwargs, e)
+            status = Notification.PARKED
+
+    Notification.objects.bulk_create(
+        Notification(
+            channel=Notification.EMAIL,
+            order_id=order_id,
             message=message,
-            from_email="admin@ekiosk.com",
-            recipient_list=recipient_list,
-            fail_silently=False,
+            recipient=recipient,
+            status=status,
+            latency_ms=elapsed_ms(started),
         )
-        Notification.objects.create(message=message)
+        for recipient in recipient_list
+    )
+
+
+@shared_task
+def flush_mail_batch_task():
+    """Sends the admin emails queued by shop.mail_batching.dispatch_admin_email"""
+    from shop.mail_batching import flush_mail_batch
+
+    try:
+        _, remaining = flush_mail_batch()
     except Exception as e:
-        logger.error(f"Error sending email. Exception: {e}", exc_info=True)
+        logger.error(f"Error sending queued emails. Exception: {e}", exc_info=True)
+        return
+
+    if remaining:
+        flush_mail_batch_task.delay()
+
+
+@shared_task
+def replay_parked_notifications_task():
+    """Re-queues parked SMS and emails once their gateway's circuit breaker has closed"""
+    from shop.delivery import replay_parked
+    from shop.sms_batching import queue_sms
+
+    count = replay_parked(SMS, queue_sms) + replay_parked(
+        EMAIL, lambda kwargs: send_email_task.delay(**kwargs)
+    )
+    if count:
+        logger.info(f"Replayed {count} parked notifications.")
+
+
+@shared_task
+def build_catalog_snapshot_task():
+    """Rebuilds the compressed catalog snapshot that kiosks download on cold start"""
+    from shop.catalog_snapshot import build_catalog_snapshot, clear_scheduled_snapshot
+
+    clear_scheduled_snapshot()
+    meta = build_catalog_snapshot()
+    logger.info(f"Catalog snapshot {meta['etag']} is current.")
+
+
+@shared_task
+def flush_last_login_task():
+    """Writes the login times queued by shop.last_login to the database"""
+    from shop.last_login import flush_last_logins
+
+    count = flush_last_logins()
+    if count:
+        logger.info(f"Updated last_login for {count} users.")
+
+
+@shared_task
+def prune_notifications_task():
+    """Deletes notifications older than NOTIFICATION_RETENTION_DAYS"""
+    from shop.notification_log import prune_notifications
+
+    count = prune_notifications()
+    if count:
+        logger.info(f"Pruned {count} old notifications.")
@@ -1,12 +1,73 @@
+import os
+from urllib.parse import urlsplit
+
 import pytest
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
 from django.test import Client
 from django.urls import reverse
 
+from shop import redis_client
 from shop.models import Category, Order, OrderItem, Product
+from shop.redis_client import get_redis
 
 User = get_user_model()
 
+# the Redis database the tests use unless TEST_REDIS_URL is set, the application uses 0-3
+TEST_REDIS_DB = 14
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """Keep cached data in process memory so tests neither depend on nor pollute Redis"""
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "sessions"},
+    }
+    yield
+    cache.clear()
+    caches["sessions"].clear()
+
+
+def get_test_redis_url():
+    """TEST_REDIS_URL, or the application's Redis server with the tests' own database"""
+    return (
+        os.environ.get("TEST_REDIS_URL")
+        or urlsplit(settings.REDIS_URL)._replace(path=f"/{TEST_REDIS_DB}").geturl()
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_redis():
+    """
+    Points shop.redis_client at a Redis database of its own, so tests can reset it freely.
+    The suite runs inside the deployed api container in CI, next to live throttles, breakers and queues.
+    """
+    url = get_test_redis_url()
+    live_urls = {
+        settings.REDIS_URL,
+        settings.CELERY_BROKER_URL,
+        *(config.get("LOCATION") for config in settings.CACHES.values()),
+    }
+    if url in live_urls:
+        pytest.exit(f"TEST_REDIS_URL {url} is used by the application, refusing to reset it.", returncode=1)
+
+    application_url = settings.REDIS_URL
+    settings.REDIS_URL = url
+    redis_client._client = None
+    get_redis().flushdb()
+    yield
+    get_redis().flushdb()
+    settings.REDIS_URL = application_url
+    redis_client._client = None
+
+
+@pytest.fixture(autouse=True)
+def reset_redis_state(test_redis):
+    """Rate-limit buckets, circuit breakers and queues live in Redis, start every test with them reset"""
+    get_redis().flushdb()
+
 
 @pytest.fixture
 def user_customer(db):
@@ -0,0 +1,212 @@
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from cryptography.hazmat.primitives.asymmetric import rsa
+from josepy import jwa
+from josepy.jwk import JWKRSA
+from josepy.jws import JWS
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
+
+from shop.authentication import JWTAuthentication
+from shop.jwks import JWKSCache, TokenVerificationError, verify_token
+
+CLIENT_ID = "ekiosk-client"
+
+
+@pytest.fixture(autouse=True)
+def oidc_settings(settings):
+    settings.OIDC_RP_CLIENT_ID = CLIENT_ID
+    settings.OIDC_RP_SIGN_ALGO = "RS256"
+    settings.OIDC_OP_ISSUERS = ["https://accounts.google.com"]
+
+
+def generate_key():
+    return JWKRSA(key=rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+
+@pytest.fixture
+def signing_key():
+    return generate_key()
+
+
+@pytest.fixture
+def jwks_cache(signing_key):
+    """JWKS cache serving the public half of the local signing key"""
+    cache = JWKSCache("https://example.com/certs")
+    cache.fetch = lambda: {"key-1": signing_key.public_key()}
+    with patch("shop.jwks.get_jwks_cache", return_value=cache):
+        yield cache
+
+
+def make_token(key, kid="key-1", **claims):
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "google-sub-1",
+        "exp": int(time.time()) + 3600,
+        **claims,
+    }
+    jws = JWS.sign(
+        json.dumps(payload).encode(), key=key, alg=jwa.RS256, protect=frozenset(["alg", "kid"]), kid=kid
+    )
+    return jws.to_compact().decode()
+
+
+def authenticate(token):
+    request = APIRequestFactory().get("/api/v1/products/", HTTP_AUTHORIZATION=f"Bearer {token}")
+    return JWTAuthentication().authenticate(request)
+
+
+@pytest.mark.django_db
+def test_valid_token_authenticates_user_by_sub(jwks_cache, signing_key, user_customer):
+    user_customer.openid_sub = "google-sub-1"
+    user_customer.save()
+
+    user, _ = authenticate(make_token(signing_key))
+
+    assert user == user_customer
+
+
+@pytest.mark.django_db
+def test_repeated_token_needs_no_queries(jwks_cache, signing_key, user_customer, django_assert_num_queries):
+    user_customer.openid_sub = "google-sub-1"
+    user_customer.save()
+    token = make_token(signing_key)
+    authenticate(token)
+
+    with django_assert_num_queries(0):
+        assert authenticate(token)[0] == user_customer
+
+
+def test_opaque_tokens_are_left_to_other_authenticators(jwks_cache):
+    assert authenticate("opaque-access-token") is None
+    assert authenticate("opaque.access.token") is None
+
+
+def test_tokens_of_other_issuers_are_left_to_other_authenticators(jwks_cache):
+    assert authenticate(make_token(generate_key(), iss="https://login.example.com")) is None
+
+
+@pytest.mark.django_db
+def test_first_login_creates_user_from_claims(jwks_cache, signing_key):
+    user, _ = authenticate(make_token(signing_key, email="first@example.com", sub="google-sub-new"))
+
+    assert (user.email, user.openid_sub) == ("first@example.com", "google-sub-new")
+    assert authenticate(make_token(signing_key, email="first@example.com", sub="google-sub-new"))[0] == user
+
+
+@pytest.mark.django_db
+def test_first_login_links_existing_user_by_email(jwks_cache, signing_key, user_customer):
+    user, _ = authenticate(make_token(signing_key, email=user_customer.email, sub="google-sub-new"))
+
+    assert user == user_customer
+    user_customer.refresh_from_db()
+    assert user_customer.openid_sub == "google-sub-new"
+
+
+@pytest.mark.django_db
+def test_first_login_without_email_claim_is_rejected(jwks_cache, signing_key):
+    with pytest.raises(exceptions.AuthenticationFailed, match="Claims verification failed"):
+        authenticate(make_token(signing_key, sub="google-sub-new"))
+
+
+@pytest.mark.django_db
+def test_token_signed_with_other_key_is_rejected(jwks_cache):
+    with pytest.raises(exceptions.AuthenticationFailed, match="Invalid token signature"):
+        authenticate(make_token(generate_key()))
+
+
+@pytest.mark.parametrize(
+    "claims, error",
+    [
+        ({"exp": int(time.time()) - 3600}, "expired"),
+        ({"aud": "another-client"}, "not issued for this client"),
+        ({"iss": "https://evil.example.com"}, "issuer"),
+    ],
+)
+def test_invalid_claims_are_rejected(jwks_cache, signing_key, claims, error):
+    with pytest.raises(TokenVerificationError, match=error):
+        verify_token(make_token(signing_key, **claims), jwks_cache)
+
+
+def test_unknown_kid_refreshes_keys_for_rotation(jwks_cache, signing_key):
+    rotated_key = generate_key()
+    jwks_cache.get_key("key-1")
+    jwks_cache._last_attempt -= jwks_cache.min_refresh_interval + 1
+    jwks_cache.fetch = lambda: {"key-2": rotated_key.public_key()}
+
+    claims = verify_token(make_token(rotated_key, kid="key-2"), jwks_cache)
+
+    assert claims["sub"] == "google-sub-1"
+
+
+def test_unknown_kid_refresh_is_rate_limited(jwks_cache, signing_key):
+    jwks_cache.get_key("key-1")
+    fetches = []
+    jwks_cache.fetch = lambda: fetches.append(1) or {}
+
+    assert jwks_cache.get_key("unknown") is None
+    assert fetches == []
+
+
+def test_failed_first_fetch_is_not_retried_by_every_request():
+    cache = JWKSCache("https://example.com/certs")
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        raise requests.ConnectionError("provider unreachable")
+
+    cache.fetch = fetch
+
+    assert [cache.get_key("key-1") for _ in range(3)] == [None, None, None]
+    assert fetches == [1]
+
+    cache._last_attempt -= cache.min_refresh_interval + 1
+    cache.get_key("key-1")
+    assert fetches == [1, 1]
+
+
+def test_key_set_fetched_by_one_process_is_reused_by_others(signing_key):
+    jwks = {"keys": [{**signing_key.public_key().to_partial_json(), "kid": "key-1"}]}
+    response = MagicMock(json=MagicMock(return_value=jwks))
+
+    with patch("shop.jwks.requests.get", return_value=response) as get:
+        assert JWKSCache("https://example.com/certs").get_key("key-1") is not None
+        # another worker, e.g. one just recycled
+        assert JWKSCache("https://example.com/certs").get_key("key-1") is not None
+
+    get.assert_called_once()
+
+
+def test_unknown_kid_bypasses_the_shared_key_set(signing_key):
+    rotated_key = generate_key()
+    cache = JWKSCache("https://example.com/certs")
+    cache.load_shared = lambda: {"key-1": signing_key.public_key()}
+    cache.fetch = lambda: {"key-2": rotated_key.public_key()}
+    cache.get_key("key-1")
+    cache._last_attempt -= cache.min_refresh_interval + 1
+
+    assert cache.get_key("key-2") is not None
+
+
+def test_synchronous_refresh_leaves_background_refresh_flag_alone(jwks_cache):
+    jwks_cache._refreshing = True
+
+    jwks_cache.refresh()
+
+    assert jwks_cache._refreshing
+
+
+def test_stale_keys_are_refreshed_in_background(jwks_cache, signing_key):
+    jwks_cache.get_key("key-1")
+    jwks_cache._fetched_at -= jwks_cache.max_age + 1
+
+    with patch.object(jwks_cache, "_refresh_in_background") as refresh_in_background:
+        assert jwks_cache.get_key("key-1") is not None
+
+    refresh_in_background.assert_called_once()
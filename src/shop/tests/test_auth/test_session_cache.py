@@ -0,0 +1,47 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+AUTH_TABLES = ("django_session", "shop_user")
+
+
+def auth_queries(context):
+    return [query["sql"] for query in context.captured_queries if any(t in query["sql"] for t in AUTH_TABLES)]
+
+
+@pytest.mark.django_db
+def test_session_requests_do_no_auth_queries(client, user_admin):
+    assert client.login(email="admin@example.com", password="adminpassword123")
+    client.get(reverse("category-list"))
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse("category-list"))
+
+    assert response.status_code == 200
+    assert auth_queries(context) == []
+
+
+@pytest.mark.django_db
+def test_oidc_session_user_is_loaded_from_cache(client, user_customer):
+    client.force_login(user_customer, backend="shop.backends.CustomOIDCBackend")
+    client.get(reverse("category-list"))
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse("category-list"))
+
+    assert response.status_code == 200
+    assert auth_queries(context) == []
+
+
+@pytest.mark.django_db
+def test_deactivated_admin_is_logged_out(client, user_admin):
+    assert client.login(email="admin@example.com", password="adminpassword123")
+    client.get(reverse("category-list"))
+
+    user_admin.is_active = False
+    user_admin.save()
+
+    response = client.get(reverse("category-list"))
+
+    assert not response.wsgi_request.user.is_authenticated
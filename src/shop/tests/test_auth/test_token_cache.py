@@ -0,0 +1,127 @@
+import base64
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory
+
+from shop.auth_cache import (
+    TOKEN_USERS_GENERATION_KEY,
+    LRUCache,
+    _token_users,
+    get_token_ttl,
+    user_cache_key,
+)
+from shop.authentication import CachedOIDCAuthentication
+
+
+@pytest.fixture
+def authenticate():
+    """Authenticates a bearer-token request and returns the user"""
+    factory = APIRequestFactory()
+    authentication = CachedOIDCAuthentication()
+
+    def _authenticate(token):
+        request = factory.get("/api/v1/products/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return authentication.authenticate(request)[0]
+
+    yield _authenticate
+    _token_users.clear()
+
+
+def make_jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+@pytest.mark.django_db
+@patch("shop.backends.CustomOIDCBackend.get_or_create_user")
+def test_repeated_token_skips_userinfo_and_user_query(
+    mock_get_or_create_user, authenticate, user_customer, django_assert_num_queries
+):
+    mock_get_or_create_user.return_value = user_customer
+
+    assert authenticate("kiosk-token") == user_customer
+    with django_assert_num_queries(0):
+        assert authenticate("kiosk-token") == user_customer
+
+    mock_get_or_create_user.assert_called_once()
+
+
+@pytest.mark.django_db
+@patch("shop.backends.CustomOIDCBackend.get_or_create_user")
+def test_cached_token_served_from_redis_after_local_eviction(
+    mock_get_or_create_user, authenticate, user_customer
+):
+    mock_get_or_create_user.return_value = user_customer
+    authenticate("kiosk-token")
+    _token_users.clear()
+
+    assert authenticate("kiosk-token") == user_customer
+    mock_get_or_create_user.assert_called_once()
+
+
+@pytest.mark.django_db
+@patch("shop.backends.CustomOIDCBackend.get_or_create_user")
+def test_cached_user_is_refreshed_after_save(mock_get_or_create_user, authenticate, user_customer):
+    mock_get_or_create_user.return_value = user_customer
+    authenticate("kiosk-token")
+
+    user_customer.phone_number = "+254700123456"
+    user_customer.save()
+
+    assert authenticate("kiosk-token").phone_number == "+254700123456"
+    mock_get_or_create_user.assert_called_once()
+
+
+@pytest.mark.django_db
+@patch("shop.backends.CustomOIDCBackend.get_or_create_user")
+def test_each_request_gets_its_own_user_instance(mock_get_or_create_user, authenticate, user_customer):
+    mock_get_or_create_user.return_value = user_customer
+    authenticate("kiosk-token")
+
+    first, second = authenticate("kiosk-token"), authenticate("kiosk-token")
+
+    assert first == second == user_customer
+    assert first is not second
+
+
+@pytest.mark.django_db
+@patch("shop.backends.CustomOIDCBackend.get_or_create_user")
+def test_user_saved_in_another_process_is_dropped_from_local_cache(
+    mock_get_or_create_user, authenticate, user_customer, django_user_model, settings
+):
+    settings.OIDC_TOKEN_LRU_SYNC_INTERVAL = 0
+    mock_get_or_create_user.return_value = user_customer
+    authenticate("kiosk-token")
+
+    # what invalidate_cached_user does in the other process, minus this process's own LRU
+    django_user_model.objects.filter(pk=user_customer.pk).update(phone_number="+254700123456")
+    cache.delete(user_cache_key(user_customer.pk))
+    cache.set(TOKEN_USERS_GENERATION_KEY, cache.get(TOKEN_USERS_GENERATION_KEY, 0) + 1, None)
+
+    assert authenticate("kiosk-token").phone_number == "+254700123456"
+
+
+def test_token_ttl_is_bounded_by_jwt_expiry(settings):
+    settings.OIDC_TOKEN_CACHE_TTL = 300
+
+    assert get_token_ttl("opaque-token") == 300
+    assert 55 <= get_token_ttl(make_jwt(int(time.time()) + 60)) <= 60
+    assert get_token_ttl(make_jwt(int(time.time()) - 10)) <= 0
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired_entries():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1, ttl=60)
+    lru.set("b", 2, ttl=60)
+    lru.get("a")
+    lru.set("c", 3, ttl=60)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+
+    lru.set("d", 4, ttl=0)
+    assert lru.get("d") is None
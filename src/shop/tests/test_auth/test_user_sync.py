@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth import login
+from django.contrib.sessions.backends.cache import SessionStore
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from shop.backends import CustomOIDCBackend
+from shop.last_login import PENDING_KEY, flush_last_logins
+from shop.models import User
+from shop.redis_client import get_redis
+
+
+@pytest.fixture(autouse=True)
+def clear_pending_logins():
+    get_redis().delete(PENDING_KEY)
+    yield
+    get_redis().delete(PENDING_KEY)
+
+
+@pytest.fixture
+def oidc_user(db):
+    return User.objects.create_user(
+        email="kiosk@example.com", phone_number="+254700123456", role=User.CUSTOMER, openid_sub="sub-1"
+    )
+
+
+@pytest.mark.django_db
+def test_create_user_saves_once():
+    with CaptureQueriesContext(connection) as context:
+        user = CustomOIDCBackend().create_user({"email": "new@example.com", "sub": "sub-new"})
+
+    assert [query["sql"].split(" ", 1)[0] for query in context.captured_queries] == ["INSERT"]
+    assert User.objects.get(pk=user.pk).openid_sub == "sub-new"
+
+
+def test_unchanged_claims_do_not_write(oidc_user, django_assert_num_queries):
+    claims = {"email": "kiosk@example.com", "phone_number": "+254700123456", "sub": "sub-1"}
+
+    with django_assert_num_queries(0):
+        CustomOIDCBackend().update_user(oidc_user, claims)
+
+
+def test_changed_claims_update_only_changed_fields(oidc_user):
+    claims = {"email": "kiosk-new@example.com", "sub": "sub-1"}
+
+    with CaptureQueriesContext(connection) as context:
+        CustomOIDCBackend().update_user(oidc_user, claims)
+
+    (query,) = context.captured_queries
+    assert query["sql"].startswith("UPDATE")
+    assert '"email"' in query["sql"] and '"phone_number"' not in query["sql"]
+    oidc_user.refresh_from_db()
+    assert oidc_user.email == "kiosk-new@example.com"
+    assert oidc_user.phone_number == "+254700123456"
+
+
+def test_login_queues_last_login_until_flushed(oidc_user):
+    request = RequestFactory().get("/")
+    request.session = SessionStore()
+
+    login(request, oidc_user, backend="shop.backends.CustomOIDCBackend")
+
+    assert User.objects.get(pk=oidc_user.pk).last_login is None
+    assert get_redis().hexists(PENDING_KEY, oidc_user.pk)
+
+    assert flush_last_logins() == 1
+    assert User.objects.get(pk=oidc_user.pk).last_login == oidc_user.last_login
+    assert not get_redis().exists(PENDING_KEY)
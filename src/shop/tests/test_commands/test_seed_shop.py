@@ -0,0 +1,94 @@
+import random
+import re
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Max
+
+from shop.models import Category, Order, OrderItem, Product, User
+from shop.seeding import generate_phone_number, seed_categories
+
+
+def seed(**options):
+    defaults = {"products": 200, "customers": 20, "orders": 50, "chunk_size": 64, "stdout": StringIO()}
+    call_command("seed_shop", **{**defaults, **options})
+
+
+@pytest.mark.django_db
+def test_seed_shop_creates_requested_volumes():
+    seed()
+
+    assert Product.objects.count() == 200
+    assert User.objects.filter(role=User.CUSTOMER).count() == 20
+    assert Order.objects.count() == 50
+    assert OrderItem.objects.count() >= 50
+
+
+@pytest.mark.django_db
+def test_products_are_filed_under_leaf_categories():
+    seed(category_depth=3)
+
+    assert not Product.objects.filter(category__subcategories__isnull=False).exists()
+    leaf = Product.objects.first().category
+    assert leaf.parent.parent is not None and leaf.parent.parent.parent is None
+
+
+@pytest.mark.django_db
+def test_order_totals_match_their_items():
+    seed()
+
+    for order in Order.objects.prefetch_related("order_items"):
+        items = order.order_items.all()
+        assert order.total_price == sum(item.price_at_time_of_order * item.quantity for item in items)
+    assert OrderItem.objects.aggregate(Max("quantity"))["quantity__max"] >= 1
+
+
+@pytest.mark.django_db
+def test_customers_have_valid_phone_numbers():
+    seed(orders=0)
+
+    for user in User.objects.filter(role=User.CUSTOMER):
+        user.full_clean()
+        assert re.match(r"^\+254\d{9}$", user.phone_number)
+
+
+@pytest.mark.django_db
+def test_seeding_twice_adds_new_customers():
+    seed(products=10, orders=0)
+    seed(products=10, orders=0)
+
+    assert User.objects.filter(role=User.CUSTOMER).count() == 40
+
+
+def snapshot():
+    return (
+        list(Product.objects.order_by("id").values_list("name", "price", "discount_price", "stock")),
+        list(Order.objects.order_by("id").values_list("status", "total_price")),
+    )
+
+
+@pytest.mark.django_db
+def test_same_seed_produces_same_data():
+    seed(seed=7)
+    first = snapshot()
+    Product.objects.all().delete()
+    Category.objects.all().delete()
+    User.objects.all().delete()
+
+    seed(seed=7)
+
+    assert snapshot() == first
+
+
+@pytest.mark.django_db
+def test_seed_categories_builds_a_tree():
+    leaf_ids = seed_categories(random.Random(1), depth=2, breadth=3)
+
+    assert Category.objects.filter(parent=None).count() == 3
+    assert Category.objects.filter(id__in=leaf_ids, parent__isnull=False).count() == len(leaf_ids)
+
+
+def test_generated_phone_numbers_are_kenyan_mobiles():
+    rng = random.Random(1)
+    assert all(re.match(r"^\+254[71]\d{8}$", generate_phone_number(rng)) for _ in range(100))
@@ -0,0 +1,50 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+@pytest.fixture
+def profiled(settings, tmp_path, user_admin, product_factory):
+    """Profiles a few product and category listings"""
+    settings.REQUEST_PROFILING_DIR = str(tmp_path)
+    settings.REQUEST_PROFILING_RATE = 1
+    product_factory()
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+    for _ in range(3):
+        client.get(reverse("product-list"))
+    client.get(reverse("category-list"))
+    return tmp_path
+
+
+def summarize(*args):
+    out = StringIO()
+    call_command("summarize_profiles", *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_summary_lists_views_functions_and_queries(profiled):
+    output = summarize("--dir", str(profiled))
+
+    assert "Views (4 samples)" in output
+    assert "ProductViewSet.list" in output
+    assert "CategoryViewSet.list" in output
+    assert "function calls" in output
+    assert 'FROM "shop_product"' in output
+
+
+@pytest.mark.django_db
+def test_summary_of_one_view(profiled):
+    output = summarize("--dir", str(profiled), "--view", "CategoryViewSet.list", "--sort", "tottime")
+
+    assert "Views (1 samples)" in output
+    assert "ProductViewSet.list" not in output
+
+
+def test_no_profiles(tmp_path):
+    with pytest.raises(CommandError):
+        summarize("--dir", str(tmp_path))
@@ -0,0 +1,52 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from config.database import connection_settings
+
+
+def test_persistent_mode_reuses_and_health_checks_connections():
+    database_settings = connection_settings("persistent", conn_max_age=120)
+    assert database_settings == {"CONN_MAX_AGE": 120, "CONN_HEALTH_CHECKS": True}
+
+
+def test_pool_mode_configures_psycopg_pool():
+    database_settings = connection_settings("pool", pool_min_size=1, pool_max_size=4, pool_timeout=3)
+
+    assert database_settings["CONN_MAX_AGE"] == 0
+    pool = database_settings["OPTIONS"]["pool"]
+    assert (pool["min_size"], pool["max_size"], pool["timeout"]) == (1, 4, 3)
+    assert callable(pool["check"])
+
+
+def test_pgbouncer_mode_disables_server_side_cursors():
+    database_settings = connection_settings("pgbouncer")
+    assert database_settings["DISABLE_SERVER_SIDE_CURSORS"] is True
+    assert database_settings["CONN_HEALTH_CHECKS"] is True
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="Unknown DB_CONNECTION_MODE"):
+        connection_settings("bogus")
+
+
+@pytest.mark.django_db
+def test_admin_can_view_pool_stats(user_admin):
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+
+    response = client.get(reverse("db_pool_stats"))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["default"]["in_use"] == 1
+    assert "connections_opened" in response.data["default"]
+
+
+@pytest.mark.django_db
+def test_customer_cannot_view_pool_stats(user_customer):
+    client = APIClient()
+    client.force_authenticate(user=user_customer)
+
+    response = client.get(reverse("db_pool_stats"))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
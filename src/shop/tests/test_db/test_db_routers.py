@@ -0,0 +1,67 @@
+import pytest
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from shop.db_routers import PrimaryReplicaRouter, use_primary, use_replicas
+from shop.middleware import ReplicaRoutingMiddleware
+from shop.models import Order, Product
+from shop.redis_client import get_redis
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ["replica_0"]
+    settings.REPLICA_PIN_SECONDS = 5
+
+
+@pytest.fixture
+def routing_middleware():
+    """Middleware whose response body is the database a product read would use"""
+    router = PrimaryReplicaRouter()
+    middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse(router.db_for_read(Product)))
+    yield middleware
+    for key in get_redis().scan_iter("db_pin:*"):
+        get_redis().delete(key)
+
+
+def test_reads_use_primary_by_default(replicas):
+    assert PrimaryReplicaRouter().db_for_read(Product) == "default"
+
+
+def test_reads_use_replica_when_allowed(replicas):
+    with use_replicas():
+        assert PrimaryReplicaRouter().db_for_read(Product) == "replica_0"
+        with use_primary():
+            assert PrimaryReplicaRouter().db_for_read(Product) == "default"
+
+
+def test_reads_use_primary_without_configured_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+    with use_replicas():
+        assert PrimaryReplicaRouter().db_for_read(Product) == "default"
+
+
+@pytest.mark.django_db
+def test_reads_inside_transactions_use_primary(replicas):
+    with use_replicas(), transaction.atomic():
+        assert PrimaryReplicaRouter().db_for_read(Order) == "default"
+
+
+def test_writes_always_use_primary(replicas):
+    with use_replicas():
+        assert PrimaryReplicaRouter().db_for_write(Order) == "default"
+
+
+def test_client_reads_its_own_writes_from_primary(replicas, routing_middleware):
+    factory = RequestFactory()
+    auth = {"HTTP_AUTHORIZATION": "Bearer kiosk-1"}
+
+    assert routing_middleware(factory.get("/api/v1/orders/", **auth)).content == b"replica_0"
+
+    routing_middleware(factory.post("/api/v1/orders/", **auth))
+
+    assert routing_middleware(factory.get("/api/v1/orders/", **auth)).content == b"default"
+    # other clients are not affected by the pin
+    other = {"HTTP_AUTHORIZATION": "Bearer kiosk-2"}
+    assert routing_middleware(factory.get("/api/v1/orders/", **other)).content == b"replica_0"
@@ -0,0 +1,175 @@
+from unittest.mock import patch
+
+import pytest
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+
+from shop import models
+from shop.db_retry import retry_on_conflict
+from shop.models import Order, OrderItem
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(settings):
+    settings.DB_RETRY_BACKOFF = 0
+    settings.DB_RETRY_MAX_RETRIES = 3
+
+
+class DriverError(Exception):
+    """Stands in for the psycopg error Django wraps, which carries the SQLSTATE"""
+
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+def database_error(sqlstate):
+    error = OperationalError("could not complete the transaction")
+    error.__cause__ = DriverError(sqlstate)
+    return error
+
+
+def retries(operation, reason="deadlock", exhausted=False):
+    name = (
+        "ekiosk_db_transaction_retries_exhausted_total"
+        if exhausted
+        else "ekiosk_db_transaction_retries_total"
+    )
+    return REGISTRY.get_sample_value(name, {"operation": operation, "reason": reason}) or 0
+
+
+def flaky(errors, operation="test_operation"):
+    """Returns a retried function that raises the given errors before succeeding, and its call log"""
+    calls = []
+    errors = list(errors)
+
+    @retry_on_conflict(operation)
+    def run():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "done"
+
+    return run, calls
+
+
+def test_deadlock_is_retried_and_counted():
+    before = retries("test_operation")
+    run, calls = flaky([database_error("40P01"), database_error("40001")])
+
+    assert run() == "done"
+    assert len(calls) == 3
+    assert retries("test_operation") == before + 1
+    assert retries("test_operation", "serialization_failure") >= 1
+
+
+def test_retries_give_up_after_max_retries():
+    before = retries("test_operation", exhausted=True)
+    run, calls = flaky([database_error("40P01")] * 10)
+
+    with pytest.raises(OperationalError):
+        run()
+
+    assert len(calls) == 4
+    assert retries("test_operation", exhausted=True) == before + 1
+
+
+def test_other_database_errors_are_not_retried():
+    run, calls = flaky([database_error("08006")])
+
+    with pytest.raises(OperationalError):
+        run()
+
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_no_retry_inside_an_outer_transaction():
+    """The outer transaction is aborted too, only its owner can run it again"""
+    run, calls = flaky([database_error("40P01")])
+
+    with pytest.raises(OperationalError):
+        with transaction.atomic():
+            run()
+
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_products_are_locked_in_primary_key_order(order_factory, product_factory):
+    products = [product_factory(stock=5) for _ in range(3)]
+    order = order_factory()
+
+    with CaptureQueriesContext(connection) as queries:
+        order.place_order([(product.id, 1) for product in reversed(products)])
+
+    product_query = next(query["sql"] for query in queries if 'FROM "shop_product"' in query["sql"])
+    assert 'ORDER BY "shop_product"."id" ASC' in product_query
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deadlocked_place_order_is_retried(order_factory, product_factory):
+    product = product_factory(stock=5)
+    order = order_factory()
+    before = retries("place_order")
+
+    with patch.object(
+        models, "lock_products", side_effect=[database_error("40P01"), {product.id: product}]
+    ) as lock_products:
+        order.place_order([(product.id, 2)])
+
+    assert lock_products.call_count == 2
+    assert retries("place_order") == before + 1
+    # the aborted attempt left nothing behind
+    assert OrderItem.objects.filter(order=order).count() == 1
+
+
+@pytest.mark.django_db
+def test_stale_order_is_not_approved_twice(order_factory, order_item_factory, product_factory):
+    product = product_factory(stock=5)
+    order = order_factory()
+    order_item_factory(order=order, product=product, quantity=2)
+    stale_copy = Order.objects.get(pk=order.pk)
+
+    assert order.approve_order()
+    assert not stale_copy.approve_order()
+
+    product.refresh_from_db()
+    assert product.stock == 3
+    assert stale_copy.status == Order.COMPLETED
+
+
+@pytest.mark.django_db
+def test_approved_order_cannot_be_cancelled_through_stale_copy(order_factory, order_item_factory):
+    order = order_factory()
+    order_item_factory(order=order, quantity=1)
+    stale_copy = Order.objects.get(pk=order.pk)
+
+    order.approve_order()
+
+    assert not stale_copy.cancel_order()
+    order.refresh_from_db()
+    assert order.status == Order.COMPLETED
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    "method, status", [("approve_order", Order.COMPLETED), ("cancel_order", Order.CANCELLED)]
+)
+def test_deadlock_on_status_save_is_retried(order_factory, order_item_factory, method, status):
+    order = order_factory()
+    order_item_factory(order=order, quantity=1)
+    errors = [database_error("40P01")]
+    save = Order.save
+
+    def flaky_save(self, *args, **kwargs):
+        if errors:
+            raise errors.pop(0)
+        return save(self, *args, **kwargs)
+
+    with patch.object(Order, "save", flaky_save):
+        assert getattr(order, method)()
+
+    order.refresh_from_db()
+    assert order.status == status
@@ -0,0 +1,121 @@
+import builtins
+import io
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.conf import settings
+
+from config import gunicorn
+from shop import warmup
+from shop.catalog_snapshot import RedisSnapshotStore, _local_snapshots
+from shop.redis_client import get_redis
+
+
+def cgroup_files(files):
+    """Serves the given cgroup files, any other path does not exist"""
+    real_open = builtins.open
+
+    def fake_open(path, *args, **kwargs):
+        if path in files:
+            return io.StringIO(files[path])
+        if str(path).startswith("/sys/fs/cgroup"):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    return patch("builtins.open", fake_open)
+
+
+@pytest.fixture
+def eight_cpus(monkeypatch):
+    monkeypatch.setattr(gunicorn.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+
+
+def test_cpus_are_limited_by_cgroup_v2_quota(eight_cpus):
+    with cgroup_files({"/sys/fs/cgroup/cpu.max": "150000 100000\n"}):
+        assert gunicorn.available_cpus() == 2
+
+
+def test_cpus_are_limited_by_cgroup_v1_quota(eight_cpus):
+    files = {
+        "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "50000\n",
+        "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+    }
+    with cgroup_files(files):
+        assert gunicorn.available_cpus() == 1
+
+
+def test_unlimited_container_uses_its_usable_cpus(eight_cpus):
+    with cgroup_files({"/sys/fs/cgroup/cpu.max": "max 100000\n"}):
+        assert gunicorn.available_cpus() == 8
+
+
+def test_workers_are_recycled_with_jitter():
+    assert gunicorn.preload_app is True
+    assert gunicorn.max_requests > 0
+    assert gunicorn.max_requests_jitter > 0
+
+
+def test_worker_is_warmed_up_before_serving():
+    with patch("shop.warmup.prime_caches") as prime_caches:
+        gunicorn.post_worker_init(MagicMock())
+
+    prime_caches.assert_called_once()
+
+
+def test_views_are_imported_before_the_first_request():
+    # a fresh interpreter, this one has long imported everything
+    code = (
+        "import sys, config.wsgi; from shop.warmup import import_application; "
+        "assert 'shop.views' not in sys.modules; import_application(); assert 'shop.views' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=settings.BASE_DIR, check=True, capture_output=True)
+
+
+def test_failed_warm_up_step_does_not_stop_the_others():
+    catalog = MagicMock()
+    failing = MagicMock(side_effect=ConnectionError("JWKS endpoint unreachable"))
+
+    with patch.dict(warmup.WARMERS, jwks=failing, catalog_snapshot=catalog):
+        warmup.prime_caches()
+
+    catalog.assert_called_once()
+
+
+def test_missing_catalog_snapshot_is_scheduled():
+    store = MagicMock()
+    store.load_meta.return_value = None
+
+    with (
+        patch("shop.catalog_snapshot.get_snapshot_store", return_value=store),
+        patch("shop.catalog_snapshot.schedule_catalog_snapshot") as schedule,
+    ):
+        warmup.prime_catalog_snapshot()
+
+    schedule.assert_called_once()
+
+
+def test_existing_catalog_snapshot_is_loaded_into_the_worker():
+    store = RedisSnapshotStore(prefix="test_snapshot")
+    meta = {"etag": "abc", "size": 7}
+    store.save(b"catalog", meta)
+
+    try:
+        with patch("shop.catalog_snapshot.get_snapshot_store", return_value=store):
+            warmup.prime_catalog_snapshot()
+
+        with patch.object(get_redis(), "getrange") as getrange, patch.object(get_redis(), "get") as get:
+            assert store.read(meta, 0, 2) == b"cat"
+        getrange.assert_not_called()
+        get.assert_not_called()
+    finally:
+        get_redis().delete(store._data_key("abc"), "test_snapshot:meta")
+        _local_snapshots.clear()
+
+
+def test_jwks_is_loaded_when_jwt_authentication_is_enabled():
+    with patch("shop.jwks.JWKSCache.refresh") as refresh:
+        warmup.prime_jwks()
+
+    refresh.assert_called_once()
@@ -0,0 +1,54 @@
+import pytest
+
+from benchmarks.fake_sms_gateway import start_fake_sms_gateway
+from shop.africastalking_client import (
+    AfricasTalkingClient,
+    get_africastalking_client,
+    reset_africastalking_client,
+)
+from shop.tasks import init_worker_clients
+
+
+@pytest.fixture
+def gateway(settings):
+    server = start_fake_sms_gateway()
+    settings.AT_API_URL = server.url
+    yield server
+    server.shutdown()
+    server.server_close()
+    reset_africastalking_client()
+
+
+def test_sends_reuse_one_connection(gateway):
+    client = AfricasTalkingClient()
+
+    for number in ["+254700000001", "+254700000002", "+254700000003"]:
+        assert client.send_sms(number, "Hello") is not None
+
+    assert gateway.messages == 3
+    assert gateway.connections == 1
+
+
+def test_bulk_send_reports_status_per_recipient(gateway):
+    statuses = AfricasTalkingClient().send_bulk_sms(["+254700000001", "+254700000002"], "Hello")
+
+    assert {number: status["status"] for number, status in statuses.items()} == {
+        "+254700000001": "Success",
+        "+254700000002": "Success",
+    }
+
+
+def test_slow_gateway_times_out(gateway, settings):
+    settings.AT_READ_TIMEOUT = 0.1
+    gateway.latency = 0.5
+
+    assert AfricasTalkingClient().send_sms("+254700000001", "Hello") is None
+
+
+def test_worker_process_gets_its_own_client(gateway):
+    parent_client = get_africastalking_client()
+
+    init_worker_clients()
+
+    assert get_africastalking_client() is not parent_client
+    assert get_africastalking_client() is get_africastalking_client()
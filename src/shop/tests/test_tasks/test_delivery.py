@@ -0,0 +1,234 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.fake_sms_gateway import start_fake_sms_gateway
+from benchmarks.fake_smtp_server import start_fake_smtp_server
+from shop.africastalking_client import reset_africastalking_client
+from shop.delivery import (
+    EMAIL,
+    SMS,
+    get_breaker,
+    parked_key,
+    parked_queue,
+    replay_parked,
+    retry_or_park,
+)
+from shop.models import Notification
+from shop.redis_client import get_redis
+from shop.sms_batching import QUEUE_KEY
+from shop.tasks import replay_parked_notifications_task, send_email_task, send_sms_task
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(settings):
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 2
+    settings.CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+    settings.NOTIFICATION_RETRY_BACKOFF = 2
+
+
+@pytest.fixture
+def failing_sms_gateway(settings):
+    server = start_fake_sms_gateway(fail_status=503)
+    settings.AT_API_URL = server.url
+    reset_africastalking_client()
+    yield server
+    server.shutdown()
+    server.server_close()
+    reset_africastalking_client()
+
+
+@pytest.fixture
+def smtp_server(settings):
+    server = start_fake_smtp_server()
+    settings.EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    settings.EMAIL_HOST, settings.EMAIL_PORT = server.server_address
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_HOST_USER = settings.EMAIL_HOST_PASSWORD = ""
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def send_sms(order_id):
+    send_sms_task("+254700000001", "order_placed", order_id=order_id)
+
+
+@pytest.mark.django_db
+def test_open_breaker_parks_sms_without_calling_gateway(failing_sms_gateway):
+    send_sms(1)
+    send_sms(2)
+    assert failing_sms_gateway.requests == 2
+    assert get_breaker(SMS).is_open()
+
+    send_sms(3)
+
+    assert failing_sms_gateway.requests == 2
+    assert get_redis().llen(parked_key(SMS)) == 3
+    assert Notification.objects.filter(status=Notification.PARKED).count() == 3
+
+
+@pytest.mark.django_db
+def test_trial_call_after_reset_timeout_closes_breaker(failing_sms_gateway):
+    send_sms(1)
+    send_sms(2)
+    # the open period is over
+    get_redis().delete(get_breaker(SMS).open_key)
+    failing_sms_gateway.fail_status = None
+
+    send_sms(3)
+
+    assert failing_sms_gateway.requests == 3
+    assert not get_breaker(SMS).is_open()
+    assert Notification.objects.filter(order_id=3).get().status == "Success"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("to", ["", None, "0700000001"])
+def test_invalid_recipient_fails_without_touching_breaker(failing_sms_gateway, to):
+    for order_id in range(3):
+        send_sms_task(to, "order_placed", order_id=order_id)
+
+    assert failing_sms_gateway.requests == 0
+    assert get_redis().get(get_breaker(SMS).failures_key) is None
+    assert get_redis().llen(parked_key(SMS)) == 0
+    assert set(Notification.objects.values_list("recipient", "status")) == {(to or "", Notification.FAILED)}
+
+
+def test_half_open_breaker_allows_one_trial_call():
+    breaker = get_breaker(SMS)
+    breaker.record_failure()
+    breaker.record_failure()
+    get_redis().delete(breaker.open_key)
+
+    assert [breaker.allow() for _ in range(3)] == [True, False, False]
+
+
+def test_failed_trial_call_reopens_breaker():
+    breaker = get_breaker(SMS)
+    breaker.record_failure()
+    breaker.record_failure()
+    get_redis().delete(breaker.open_key)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.is_open()
+
+
+@pytest.mark.django_db
+def test_smtp_outage_parks_email(smtp_server):
+    smtp_server.fail = True
+
+    send_email_task("New Order #1", "message", ["admin@ekiosk.com"], order_id=1)
+
+    assert Notification.objects.get().status == Notification.PARKED
+    assert get_redis().llen(parked_key(EMAIL)) == 1
+
+
+@pytest.mark.django_db
+def test_email_is_sent_through_smtp(smtp_server):
+    send_email_task("New Order #1", "message", ["admin@ekiosk.com"], order_id=1)
+
+    assert smtp_server.messages == 1
+    assert Notification.objects.get().status == Notification.SUCCESS
+
+
+def make_task(retries, max_retries=5):
+    task = MagicMock(max_retries=max_retries)
+    task.request.called_directly = False
+    task.request.retries = retries
+    task.retry.side_effect = RuntimeError("retry")
+    return task
+
+
+def test_failed_send_is_retried_with_exponential_backoff():
+    task = make_task(retries=3)
+
+    with pytest.raises(RuntimeError, match="retry"):
+        retry_or_park(task, SMS, {"to": "+254700000001"}, ConnectionError())
+
+    countdown = task.retry.call_args.kwargs["countdown"]
+    # 2s doubled three times, with jitter
+    assert 8 <= countdown <= 16
+    assert get_redis().llen(parked_key(SMS)) == 0
+
+
+def test_message_is_parked_once_retries_are_used_up():
+    task = make_task(retries=5)
+
+    assert retry_or_park(task, SMS, {"to": "+254700000001"}, ConnectionError())
+
+    task.retry.assert_not_called()
+    assert get_redis().llen(parked_key(SMS)) == 1
+
+
+def test_parked_messages_are_replayed_once_breaker_closes():
+    get_redis().rpush(
+        parked_key(SMS), '{"to": "+254700000001", "template_name": "order_placed", "order_id": 1}'
+    )
+    breaker = get_breaker(SMS)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    send = MagicMock()
+    assert replay_parked(SMS, send) == 0
+    breaker.record_success()
+    assert replay_parked(SMS, send) == 1
+
+    send.assert_called_once_with({"to": "+254700000001", "template_name": "order_placed", "order_id": 1})
+    assert get_redis().llen(parked_key(SMS)) == 0
+
+
+def park_messages(count):
+    for order_id in range(1, count + 1):
+        get_redis().rpush(parked_key(SMS), f'{{"order_id": {order_id}}}')
+
+
+def test_parked_messages_are_not_replayed_while_breaker_is_half_open():
+    park_messages(1)
+    breaker = get_breaker(SMS)
+    breaker.record_failure()
+    breaker.record_failure()
+    # the open period ended, no trial call has succeeded yet
+    get_redis().delete(breaker.open_key)
+    send = MagicMock()
+
+    assert replay_parked(SMS, send) == 0
+
+    send.assert_not_called()
+    assert get_redis().llen(parked_key(SMS)) == 1
+
+
+def test_failed_replay_keeps_the_messages_it_did_not_send():
+    park_messages(3)
+    send = MagicMock(side_effect=[None, ConnectionError("broker unreachable")])
+
+    assert replay_parked(SMS, send) == 1
+
+    assert get_redis().lrange(parked_key(SMS), 0, -1) == [b'{"order_id": 2}', b'{"order_id": 3}']
+
+
+def test_messages_of_a_crashed_replay_are_replayed_again():
+    park_messages(2)
+    # a worker popped the messages and died before re-queueing them
+    batch, _ = parked_queue(SMS).pop(10)
+    get_redis().delete(parked_queue(SMS).lease_key(batch.id))
+    send = MagicMock()
+
+    assert replay_parked(SMS, send) == 2
+
+    assert [call.args[0] for call in send.call_args_list] == [{"order_id": 1}, {"order_id": 2}]
+    assert get_redis().llen(parked_key(SMS)) == 0
+
+
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+def test_parked_sms_are_replayed_through_the_batch_queue(mock_apply_async):
+    get_redis().rpush(
+        parked_key(SMS), '{"to": "+254700000001", "template_name": "order_placed", "order_id": 1}'
+    )
+
+    replay_parked_notifications_task()
+
+    assert get_redis().llen(QUEUE_KEY) == 1
+    mock_apply_async.assert_called_once_with(countdown=2)
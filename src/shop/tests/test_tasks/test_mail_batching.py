@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+import pytest
+from django.core import mail
+from django.core.mail import get_connection
+
+from shop.mail_batching import QUEUE, QUEUE_KEY, SCHEDULED_KEY, dispatch_admin_email
+from shop.models import Notification, Order
+from shop.outbox import drain_outbox
+from shop.redis_client import get_redis
+from shop.tasks import flush_mail_batch_task
+
+
+@pytest.fixture(autouse=True)
+def mail_queue(settings):
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    settings.ADMIN_EMAIL_BATCH_WINDOW = 5
+    settings.ADMIN_EMAIL_DIGEST = False
+    clear_queue()
+    yield
+    clear_queue()
+
+
+def clear_queue():
+    redis = get_redis()
+    redis.delete(QUEUE_KEY, SCHEDULED_KEY, QUEUE.batches_key, *redis.scan_iter("mail_batch:*"))
+
+
+def queue_order_alerts(count):
+    with patch("shop.tasks.flush_mail_batch_task.apply_async") as mock_apply_async:
+        for order_id in range(1, count + 1):
+            dispatch_admin_email(
+                f"New Order #{order_id}",
+                f"A new order #{order_id} requires your attention.",
+                ["admin@ekiosk.com"],
+            )
+    return mock_apply_async
+
+
+@patch("shop.tasks.send_email_task.delay")
+def test_email_is_sent_directly_without_batch_window(mock_delay, settings):
+    settings.ADMIN_EMAIL_BATCH_WINDOW = 0
+
+    dispatch_admin_email("New Order #1", "message", ["admin@ekiosk.com"])
+
+    mock_delay.assert_called_once_with(
+        "New Order #1", "message", ["admin@ekiosk.com"], order_id=None, outbox_id=None
+    )
+
+
+def test_burst_of_emails_schedules_one_flush():
+    mock_apply_async = queue_order_alerts(3)
+
+    mock_apply_async.assert_called_once_with(countdown=5)
+    assert get_redis().llen(QUEUE_KEY) == 3
+
+
+@pytest.mark.django_db
+def test_batch_is_sent_over_one_connection():
+    queue_order_alerts(3)
+
+    with patch("shop.mail_batching.get_connection", wraps=get_connection) as mock_get_connection:
+        flush_mail_batch_task()
+
+    mock_get_connection.assert_called_once()
+    assert [message.subject for message in mail.outbox] == ["New Order #1", "New Order #2", "New Order #3"]
+    assert Notification.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_emails_of_a_crashed_flush_are_sent_by_the_next():
+    queue_order_alerts(2)
+    # a worker popped the batch and died before sending it
+    batch, _ = QUEUE.pop(10)
+    get_redis().delete(QUEUE.lease_key(batch.id))
+
+    flush_mail_batch_task()
+
+    assert [message.subject for message in mail.outbox] == ["New Order #1", "New Order #2"]
+    assert not get_redis().exists(batch.processing_key, QUEUE.batches_key)
+
+
+@pytest.mark.django_db
+def test_failed_flush_leaves_emails_to_be_requeued():
+    queue_order_alerts(1)
+
+    with patch("shop.mail_batching.EmailMessage", side_effect=RuntimeError("boom")):
+        flush_mail_batch_task()
+
+    assert mail.outbox == []
+    assert get_redis().llen(QUEUE_KEY) == 0
+    assert sum(get_redis().llen(key) for key in get_redis().scan_iter("mail_batch:processing:*")) == 1
+
+
+@pytest.mark.django_db
+def test_digest_mode_rolls_alerts_into_one_email(settings):
+    settings.ADMIN_EMAIL_DIGEST = True
+    queue_order_alerts(3)
+
+    flush_mail_batch_task()
+
+    (digest,) = mail.outbox
+    assert digest.subject == "3 new notifications"
+    assert digest.to == ["admin@ekiosk.com"]
+    assert all(f"A new order #{order_id}" in digest.body for order_id in (1, 2, 3))
+    # the log keeps one row per alert
+    assert Notification.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_order_alert_is_queued_from_the_outbox(user_customer):
+    order = Order.objects.create(customer=user_customer)
+    order.notify_admin()
+
+    with patch("shop.tasks.flush_mail_batch_task.apply_async"):
+        drain_outbox()
+
+    assert get_redis().llen(QUEUE_KEY) == 1
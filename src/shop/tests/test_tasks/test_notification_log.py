@@ -0,0 +1,67 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+
+from shop.models import Notification
+from shop.notification_log import prune_notifications
+from shop.tasks import send_email_task, send_sms_task
+
+
+def gateway_response(number):
+    return {
+        "SMSMessageData": {"Recipients": [{"number": number, "status": "Success", "messageId": "ATXid_1"}]}
+    }
+
+
+@patch(
+    "africastalking.SMS.SMSService.send",
+    side_effect=lambda message, recipients: gateway_response(recipients[0]),
+)
+def test_sms_is_logged_with_delivery_details(mock_send, order_factory):
+    order = order_factory()
+
+    send_sms_task("+254799887766", "order_placed", order_id=order.id)
+
+    notification = order.notifications.get()
+    assert notification.channel == Notification.SMS
+    assert notification.recipient == "+254799887766"
+    assert (notification.status, notification.message_id) == ("Success", "ATXid_1")
+    assert notification.latency_ms is not None
+
+
+@patch("africastalking.SMS.SMSService.send", side_effect=ConnectionError("gateway unreachable"))
+def test_failed_sms_is_logged(mock_send, order_factory):
+    order = order_factory()
+
+    send_sms_task("+254799887766", "order_placed", order_id=order.id)
+
+    # kept for a later retry, see test_delivery
+    assert order.notifications.get().status == Notification.PARKED
+
+
+@pytest.mark.django_db
+def test_email_is_logged_per_recipient(settings):
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+    send_email_task("New Order", "Test message", ["admin@ekiosk.com", "ops@ekiosk.com"], order_id=7)
+
+    assert sorted(Notification.objects.filter(order_id=7).values_list("channel", "recipient", "status")) == [
+        ("email", "admin@ekiosk.com", "Success"),
+        ("email", "ops@ekiosk.com", "Success"),
+    ]
+
+
+@pytest.mark.django_db
+def test_prune_deletes_old_rows_in_batches():
+    Notification.objects.bulk_create(Notification(message=f"old {i}") for i in range(5))
+    Notification.objects.update(created_at=timezone.now() - timedelta(days=100))
+    Notification.objects.create(message="recent")
+
+    with patch("shop.models.Notification.objects.filter", wraps=Notification.objects.filter) as mock_filter:
+        assert prune_notifications(retention_days=90, batch_size=2) == 5
+
+    # 3 batches of ids, each followed by its delete, then the empty lookup
+    assert mock_filter.call_count == 7
+    assert list(Notification.objects.values_list("message", flat=True)) == ["recent"]
@@ -0,0 +1,95 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from shop.models import Order
+from shop.outbox import drain_outbox
+from shop.redis_client import get_redis
+from shop.sms_batching import QUEUE_KEY, SCHEDULED_KEY
+from shop.tasks import flush_sms_batch_task, send_sms_task
+
+SUCCESS_RESPONSE = {"SMSMessageData": {"Recipients": [{"status": "Success", "messageId": "ATPid_1"}]}}
+
+
+def sample(name, template, suffix="count"):
+    return REGISTRY.get_sample_value(f"ekiosk_sms_{name}_seconds_{suffix}", {"template": template}) or 0
+
+
+@pytest.fixture(autouse=True)
+def sms_queue():
+    get_redis().delete(QUEUE_KEY, SCHEDULED_KEY)
+    yield
+    get_redis().delete(QUEUE_KEY, SCHEDULED_KEY)
+
+
+@pytest.mark.django_db
+@patch("shop.africastalking_client.AfricasTalkingClient.send_sms", return_value=SUCCESS_RESPONSE)
+def test_sms_task_records_queue_wait_send_and_delivery(mock_send_sms):
+    before = {name: sample(name, "order_approved") for name in ("queue_wait", "send", "delivery")}
+    wait_sum = sample("queue_wait", "order_approved", "sum")
+
+    now = time.time()
+    send_sms_task("+254700000001", "order_approved", order_id=1, event_at=now - 10, queued_at=now - 4)
+
+    for name in ("queue_wait", "send", "delivery"):
+        assert sample(name, "order_approved") == before[name] + 1
+    assert 4 <= sample("queue_wait", "order_approved", "sum") - wait_sum < 10
+
+
+@pytest.mark.django_db
+def test_failed_sms_is_not_counted_as_delivered():
+    before = sample("delivery", "order_approved")
+
+    with patch("shop.africastalking_client.AfricasTalkingClient.send_sms", return_value=None):
+        send_sms_task("+254700000001", "order_approved", order_id=1, event_at=time.time())
+
+    assert sample("delivery", "order_approved") == before
+
+
+@pytest.mark.django_db
+def test_order_event_is_timed_through_outbox(user_customer):
+    user_customer.phone_number = "+254700123456"
+    user_customer.save()
+    order = Order.objects.create(customer=user_customer)
+    order.notify_customer("order_cancelled", order_id=order.id)
+    before = {name: sample(name, "order_cancelled") for name in ("enqueue", "queue_wait", "send", "delivery")}
+
+    with (
+        patch(
+            "shop.tasks.flush_sms_batch_task.apply_async", side_effect=lambda **kwargs: flush_sms_batch_task()
+        ),
+        patch(
+            "shop.africastalking_client.AfricasTalkingClient.send_bulk_sms",
+            return_value={"+254700123456": {"status": "Success", "messageId": "ATPid_1"}},
+        ),
+    ):
+        drain_outbox()
+
+    for name in ("enqueue", "queue_wait", "send", "delivery"):
+        assert sample(name, "order_cancelled") == before[name] + 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client, settings):
+    settings.METRICS_TOKEN = ""
+    settings.DEBUG = True
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert b"ekiosk_sms_queue_wait_seconds" in response.content
+
+
+def test_metrics_endpoint_requires_token_when_set(client, settings):
+    settings.METRICS_TOKEN = "scrape-secret"
+
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").status_code == 200
+
+
+def test_metrics_endpoint_is_closed_without_token_in_production(client, settings):
+    settings.METRICS_TOKEN = ""
+    settings.DEBUG = False
+
+    assert client.get("/metrics").status_code == 403
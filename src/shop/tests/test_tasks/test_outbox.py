@@ -0,0 +1,152 @@
+from datetime import timedelta
+from unittest.mock import ANY, patch
+
+import pytest
+from django.db import connection, transaction
+from django.utils import timezone
+
+from shop import outbox
+from shop.models import Notification, NotificationOutbox, Order
+from shop.outbox import SCHEDULED_KEY, drain_outbox
+from shop.redis_client import get_redis
+from shop.tasks import send_email_task, send_sms_task
+
+SUCCESS_RESPONSE = {"SMSMessageData": {"Recipients": [{"status": "Success", "messageId": "ATPid_1"}]}}
+
+
+@pytest.fixture(autouse=True)
+def clear_schedule():
+    get_redis().delete(SCHEDULED_KEY)
+    yield
+    get_redis().delete(SCHEDULED_KEY)
+
+
+@pytest.fixture
+def order(user_customer):
+    user_customer.phone_number = "+254700123456"
+    user_customer.save()
+    return Order.objects.create(customer=user_customer)
+
+
+def test_order_events_are_written_to_the_outbox(order, product_factory, django_capture_on_commit_callbacks):
+    product = product_factory(stock=5)
+
+    with patch("shop.tasks.drain_notification_outbox_task.delay") as mock_delay:
+        with django_capture_on_commit_callbacks() as callbacks:
+            order.place_order([(product.id, 1)])
+
+        # nothing is sent while the order's transaction is open
+        mock_delay.assert_not_called()
+        assert sorted(NotificationOutbox.objects.values_list("channel", flat=True)) == ["email", "sms"]
+
+        for callback in callbacks:
+            callback()
+
+    # one drain for all events of the commit
+    mock_delay.assert_called_once_with()
+
+
+def test_rolled_back_order_sends_nothing(order):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            order.notify_customer("order_placed", order_id=order.id)
+            raise RuntimeError("order failed")
+
+    assert not NotificationOutbox.objects.exists()
+
+
+@patch("shop.mail_batching.dispatch_admin_email")
+@patch("shop.sms_batching.dispatch_sms")
+def test_drain_dispatches_and_deletes_entries(mock_dispatch_sms, mock_dispatch_email, order):
+    order.notify_customer("order_approved", order_id=order.id)
+    order.notify_admin()
+
+    assert drain_outbox() == 2
+
+    mock_dispatch_sms.assert_called_once_with(
+        to="+254700123456", template_name="order_approved", order_id=order.id, event_at=ANY, outbox_id=ANY
+    )
+    mock_dispatch_email.assert_called_once()
+    assert not NotificationOutbox.objects.exists()
+
+
+@patch("shop.sms_batching.dispatch_sms")
+def test_drain_works_in_batches(mock_dispatch_sms, order):
+    for _ in range(5):
+        order.notify_customer("order_placed", order_id=order.id)
+
+    with patch("shop.outbox.claim_entries", wraps=outbox.claim_entries) as claim_entries:
+        assert drain_outbox(batch_size=2) == 5
+
+    assert mock_dispatch_sms.call_count == 5
+    # three batches, then an empty claim
+    assert claim_entries.call_count == 4
+
+
+@patch("shop.sms_batching.dispatch_sms", side_effect=ConnectionError("redis down"))
+def test_failed_dispatch_keeps_entries(mock_dispatch_sms, order):
+    order.notify_customer("order_placed", order_id=order.id)
+
+    with pytest.raises(ConnectionError):
+        drain_outbox()
+
+    # released for the next drain
+    assert NotificationOutbox.objects.get().claimed_at is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_entries_are_published_after_their_claim_commits(order):
+    order.notify_customer("order_placed", order_id=order.id)
+    published = []
+
+    def dispatch_sms(**kwargs):
+        published.append((connection.in_atomic_block, NotificationOutbox.objects.get().claimed_at))
+
+    with patch("shop.sms_batching.dispatch_sms", side_effect=dispatch_sms):
+        drain_outbox()
+
+    ((in_transaction, claimed_at),) = published
+    assert not in_transaction
+    assert claimed_at is not None
+
+
+@patch("shop.sms_batching.dispatch_sms")
+def test_entries_claimed_by_a_live_drain_are_skipped(mock_dispatch_sms, order, settings):
+    settings.NOTIFICATION_OUTBOX_CLAIM_TIMEOUT = 300
+    order.notify_customer("order_placed", order_id=order.id)
+    order.notify_customer("order_approved", order_id=order.id)
+    live, abandoned = NotificationOutbox.objects.order_by("id")
+    live.claimed_at = timezone.now()
+    live.save()
+    abandoned.claimed_at = timezone.now() - timedelta(seconds=301)
+    abandoned.save()
+
+    assert drain_outbox() == 1
+
+    mock_dispatch_sms.assert_called_once_with(
+        to="+254700123456",
+        template_name="order_approved",
+        order_id=order.id,
+        event_at=ANY,
+        outbox_id=abandoned.id,
+    )
+    assert list(NotificationOutbox.objects.all()) == [live]
+
+
+@pytest.mark.django_db
+@patch("shop.africastalking_client.AfricasTalkingClient.send_sms", return_value=SUCCESS_RESPONSE)
+def test_redispatched_sms_is_sent_once(mock_send_sms):
+    for _ in range(2):
+        send_sms_task("+254700123456", "order_placed", order_id=None, outbox_id=7)
+
+    mock_send_sms.assert_called_once()
+    assert Notification.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_redispatched_email_is_sent_once(settings, mailoutbox):
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    for _ in range(2):
+        send_email_task("New Order #1", "message", ["admin@ekiosk.com"], outbox_id=8)
+
+    assert len(mailoutbox) == 1
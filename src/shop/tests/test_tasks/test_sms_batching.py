@@ -0,0 +1,252 @@
+from unittest.mock import ANY, patch
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from shop.constants import NOTIFICATION_TEMPLATES
+from shop.delivery import delivered_ids, mark_delivered
+from shop.models import Notification
+from shop.redis_client import get_redis
+from shop.sms_batching import QUEUE, QUEUE_KEY, SCHEDULED_KEY, dispatch_sms
+from shop.tasks import flush_sms_batch_task
+
+FLASH_SALE = "Flash sale at the kiosk today!"
+
+
+def clear_queue():
+    redis = get_redis()
+    redis.delete(QUEUE_KEY, SCHEDULED_KEY, QUEUE.batches_key, *redis.scan_iter("sms_batch:*"))
+
+
+@pytest.fixture(autouse=True)
+def sms_queue(settings):
+    settings.SMS_BATCH_WINDOW = 2
+    clear_queue()
+    with patch.dict(NOTIFICATION_TEMPLATES, {"flash_sale": FLASH_SALE}):
+        yield
+    clear_queue()
+
+
+def gateway_response(recipients, status="Success"):
+    return {
+        "SMSMessageData": {
+            "Message": f"Sent to {len(recipients)}/{len(recipients)}",
+            "Recipients": [
+                {"number": number, "status": status, "statusCode": 101, "messageId": f"ATPid_{number}"}
+                for number in recipients
+            ],
+        }
+    }
+
+
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch("shop.tasks.send_sms_task.delay")
+def test_sms_are_flushed_at_once_without_batch_window(mock_delay, mock_apply_async, settings):
+    settings.SMS_BATCH_WINDOW = 0
+
+    dispatch_sms("+254700000001", "order_placed", order_id=1)
+    dispatch_sms("+254700000002", "order_placed", order_id=2)
+
+    mock_delay.assert_not_called()
+    mock_apply_async.assert_called_once_with(countdown=0)
+    assert get_redis().llen(QUEUE_KEY) == 2
+
+
+@patch("shop.tasks.send_sms_task.delay")
+def test_sms_is_sent_directly_when_it_cannot_be_queued(mock_delay):
+    with patch.object(QUEUE, "push", side_effect=ConnectionError("redis down")):
+        dispatch_sms("+254700000001", "order_placed", order_id=1)
+
+    mock_delay.assert_called_once_with(
+        to="+254700000001",
+        template_name="order_placed",
+        order_id=1,
+        event_at=None,
+        queued_at=ANY,
+        outbox_id=None,
+    )
+
+
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+def test_burst_of_sms_schedules_one_flush(mock_apply_async):
+    for order_id in range(5):
+        dispatch_sms(f"+25470000000{order_id}", "flash_sale", order_id=order_id)
+
+    assert get_redis().llen(QUEUE_KEY) == 5
+    mock_apply_async.assert_called_once_with(countdown=2)
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_identical_messages_are_sent_in_one_call(mock_send, mock_apply_async):
+    recipients = ["+254700000001", "+254700000002", "+254700000003"]
+    for number in recipients:
+        dispatch_sms(number, "flash_sale", order_id=None)
+    flush_sms_batch_task()
+
+    mock_send.assert_called_once_with(FLASH_SALE, recipients)
+    assert sorted(Notification.objects.values_list("recipient", "status")) == [
+        (number, "Success") for number in recipients
+    ]
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch("shop.tasks.send_sms_task.delay")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_order_sms_are_sent_by_one_flush(mock_send, mock_delay, mock_apply_async):
+    for order_id in range(1, 4):
+        dispatch_sms(f"+25470000000{order_id}", "order_placed", order_id=order_id)
+    mock_delay.assert_not_called()
+    mock_apply_async.assert_called_once_with(countdown=2)
+
+    with CaptureQueriesContext(connection) as context:
+        flush_sms_batch_task()
+
+    # one call per text, the order SMS all differ
+    assert sorted(call.args[1] for call in mock_send.call_args_list) == [
+        ["+254700000001"],
+        ["+254700000002"],
+        ["+254700000003"],
+    ]
+    assert [query["sql"].split(" ", 1)[0] for query in context.captured_queries] == ["INSERT"]
+    assert sorted(Notification.objects.values_list("order_id", "recipient", "status", "message_id")) == [
+        (order_id, f"+25470000000{order_id}", "Success", f"ATPid_+25470000000{order_id}")
+        for order_id in range(1, 4)
+    ]
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch("africastalking.SMS.SMSService.send", side_effect=ConnectionError("gateway unreachable"))
+def test_open_breaker_stops_the_rest_of_the_flush(mock_send, mock_apply_async, settings):
+    settings.SMS_BATCH_CONCURRENCY = 1
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 1
+    for order_id in range(1, 4):
+        dispatch_sms(f"+25470000000{order_id}", "order_placed", order_id=order_id)
+
+    flush_sms_batch_task()
+
+    mock_send.assert_called_once()
+    assert list(Notification.objects.values_list("status", flat=True)) == [Notification.PARKED] * 3
+    assert get_redis().llen("notifications:parked:sms") == 3
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_duplicate_recipient_gets_a_separate_call(mock_send, mock_apply_async):
+    for number in ["+254700000001", "+254700000002", "+254700000001"]:
+        dispatch_sms(number, "flash_sale", order_id=None)
+
+    flush_sms_batch_task()
+
+    assert [call.args for call in mock_send.call_args_list] == [
+        (FLASH_SALE, ["+254700000001", "+254700000002"]),
+        (FLASH_SALE, ["+254700000001"]),
+    ]
+    assert Notification.objects.filter(recipient="+254700000001", status=Notification.SUCCESS).count() == 2
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_sms_of_a_crashed_flush_are_sent_by_the_next(mock_send, mock_apply_async):
+    for number in ["+254700000001", "+254700000002"]:
+        dispatch_sms(number, "flash_sale", order_id=None)
+    # a worker popped the batch and died before sending it
+    batch, _ = QUEUE.pop(10)
+    assert get_redis().llen(QUEUE_KEY) == 0
+    get_redis().delete(QUEUE.lease_key(batch.id))
+
+    flush_sms_batch_task()
+
+    mock_send.assert_called_once_with(FLASH_SALE, ["+254700000001", "+254700000002"])
+    assert not get_redis().exists(batch.processing_key, QUEUE.batches_key)
+
+
+def test_batch_of_a_running_flush_is_not_requeued():
+    QUEUE.push({"to": "+254700000001", "template_name": "flash_sale", "order_id": None})
+    batch, _ = QUEUE.pop(10)
+
+    QUEUE.requeue_abandoned()
+
+    assert get_redis().llen(QUEUE_KEY) == 0
+    assert get_redis().llen(batch.processing_key) == 1
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_invalid_recipient_is_dropped_from_batch(mock_send, mock_apply_async):
+    for number in ["+254700000001", "", None, "+254700000002"]:
+        dispatch_sms(number, "flash_sale", order_id=None)
+    flush_sms_batch_task()
+
+    mock_send.assert_called_once_with(FLASH_SALE, ["+254700000001", "+254700000002"])
+    assert sorted(Notification.objects.values_list("recipient", "status")) == [
+        ("", Notification.FAILED),
+        ("", Notification.FAILED),
+        ("+254700000001", Notification.SUCCESS),
+        ("+254700000002", Notification.SUCCESS),
+    ]
+    assert get_redis().llen("notifications:parked:sms") == 0
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch("africastalking.SMS.SMSService.send", side_effect=ConnectionError("gateway unreachable"))
+def test_failed_send_parks_messages(mock_send, mock_apply_async):
+    dispatch_sms("+254700000001", "flash_sale", order_id=1)
+
+    flush_sms_batch_task()
+
+    notification = Notification.objects.get()
+    assert (notification.recipient, notification.status) == ("+254700000001", Notification.PARKED)
+    assert get_redis().llen("notifications:parked:sms") == 1
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.delay")
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_flush_is_bounded_and_reschedules(mock_send, mock_apply_async, mock_delay, settings):
+    settings.SMS_BATCH_MAX_SIZE = 2
+    for order_id in range(3):
+        dispatch_sms(f"+25470000000{order_id}", "flash_sale", order_id=order_id)
+
+    flush_sms_batch_task()
+
+    mock_send.assert_called_once_with(FLASH_SALE, ["+254700000000", "+254700000001"])
+    assert get_redis().llen(QUEUE_KEY) == 1
+    mock_delay.assert_called_once_with()
+
+
+@pytest.mark.django_db
+@patch("shop.tasks.flush_sms_batch_task.apply_async")
+@patch(
+    "africastalking.SMS.SMSService.send", side_effect=lambda message, recipients: gateway_response(recipients)
+)
+def test_already_delivered_outbox_entry_is_not_sent_again(mock_send, mock_apply_async):
+    mark_delivered([5])
+    dispatch_sms("+254700000001", "flash_sale", order_id=None, outbox_id=5)
+    dispatch_sms("+254700000002", "flash_sale", order_id=None, outbox_id=6)
+
+    flush_sms_batch_task()
+
+    mock_send.assert_called_once_with(FLASH_SALE, ["+254700000002"])
+    assert delivered_ids([5, 6]) == {5, 6}
@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from shop.tasks import drain_notification_outbox_task
+
+TASK = "shop.tasks.drain_notification_outbox_task"
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+def test_task_run_is_timed():
+    before = sample("ekiosk_celery_task_seconds_count", {"task": TASK, "state": "SUCCESS"})
+
+    drain_notification_outbox_task.apply()
+
+    assert sample("ekiosk_celery_task_seconds_count", {"task": TASK, "state": "SUCCESS"}) == before + 1
+
+
+@pytest.mark.django_db
+def test_task_failure_is_counted_per_exception():
+    failures = sample("ekiosk_celery_task_failures_total", {"task": TASK, "exception": "ConnectionError"})
+    runs = sample("ekiosk_celery_task_seconds_count", {"task": TASK, "state": "FAILURE"})
+
+    with patch("shop.outbox.drain_outbox", side_effect=ConnectionError("redis is down")):
+        drain_notification_outbox_task.apply()
+
+    assert (
+        sample("ekiosk_celery_task_failures_total", {"task": TASK, "exception": "ConnectionError"})
+        == failures + 1
+    )
+    assert sample("ekiosk_celery_task_seconds_count", {"task": TASK, "state": "FAILURE"}) == runs + 1
@@ -0,0 +1,40 @@
+import pytest
+
+from config.celery import app
+from shop import tasks
+
+
+def get_queue(task):
+    return app.amqp.router.route({}, task.name)["queue"].name
+
+
+@pytest.mark.parametrize(
+    "task, queue",
+    [
+        (tasks.send_sms_task, "sms"),
+        (tasks.flush_sms_batch_task, "sms"),
+        (tasks.send_email_task, "email"),
+        (tasks.flush_mail_batch_task, "email"),
+        (tasks.build_catalog_snapshot_task, "import"),
+        (tasks.flush_last_login_task, "maintenance"),
+        (tasks.prune_notifications_task, "maintenance"),
+        (tasks.replay_parked_notifications_task, "maintenance"),
+        (tasks.drain_notification_outbox_task, "default"),
+    ],
+)
+def test_task_is_routed_to_its_queue(task, queue):
+    assert get_queue(task) == queue
+
+
+def test_every_task_is_routed_to_a_worker_queue():
+    """A task routed to a queue no worker consumes would never run"""
+    worker_queues = {"default", "sms", "email", "import", "maintenance"}
+    shop_tasks = [name for name in app.tasks if name.startswith("shop.")]
+
+    assert shop_tasks
+    assert {app.amqp.router.route({}, name)["queue"].name for name in shop_tasks} <= worker_queues
+
+
+def test_task_results_are_not_stored():
+    assert tasks.send_sms_task.ignore_result
+    assert tasks.send_email_task.ignore_result
@@ -0,0 +1,74 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from shop.models import User
+
+
+@pytest.fixture
+def customer_client(user_customer):
+    client = Client()
+    client.force_login(user_customer)
+    return client
+
+
+@pytest.mark.django_db
+def test_async_product_list_matches_viewset(customer_client, user_customer, product_factory):
+    product_factory(name="Laptop", price=1000, discount_price=900)
+    product_factory(name="Cable", price=10)
+    api_client = APIClient()
+    api_client.force_authenticate(user=user_customer)
+
+    response = customer_client.get(reverse("async_product_list"))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == api_client.get(reverse("product-list")).json()
+
+
+@pytest.mark.django_db
+def test_async_product_detail_not_found(customer_client):
+    response = customer_client.get(reverse("async_product_detail", args=[999]))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_async_category_list(customer_client, category_factory):
+    category_factory(name="Electronics")
+
+    response = customer_client.get(reverse("async_category_list"))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [category["name"] for category in response.json()] == ["Electronics"]
+
+
+@pytest.mark.django_db
+def test_async_views_require_authentication(product_factory):
+    response = Client().get(reverse("async_product_list"))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_async_views_are_read_only(customer_client):
+    response = customer_client.post(reverse("async_product_list"))
+    assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+
+@pytest.mark.django_db
+def test_customer_retrieves_own_order_asynchronously(customer_client, order_item_factory):
+    order_item = order_item_factory(quantity=2)
+
+    response = customer_client.get(reverse("async_order_detail", args=[order_item.order.id]))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["order_items"][0]["quantity"] == 2
+
+
+@pytest.mark.django_db
+def test_customer_cannot_retrieve_other_customers_order_asynchronously(customer_client, order_factory):
+    other_customer = User.objects.create(email="other@example.com", role=User.CUSTOMER)
+    order = order_factory(customer=other_customer)
+
+    response = customer_client.get(reverse("async_order_detail", args=[order.id]))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,170 @@
+import gzip
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from shop.catalog_snapshot import (
+    RedisSnapshotStore,
+    build_catalog_snapshot,
+    clear_scheduled_snapshot,
+    get_snapshot_store,
+)
+from shop.redis_client import get_redis
+
+
+@pytest.fixture
+def disk_snapshots(settings, tmp_path):
+    """Store snapshots in a temporary directory instead of Redis"""
+    settings.CATALOG_SNAPSHOT_STORAGE = "disk"
+    settings.CATALOG_SNAPSHOT_DIR = str(tmp_path)
+    return get_snapshot_store()
+
+
+@pytest.fixture
+def snapshot_client(user_customer):
+    client = APIClient()
+    client.force_authenticate(user=user_customer)
+    return client
+
+
+@pytest.mark.django_db
+def test_snapshot_contains_products_category_tree_and_effective_prices(
+    disk_snapshots, snapshot_client, category_factory, product_factory
+):
+    root = category_factory(name="Electronics")
+    child = category_factory(name="Laptops", parent=root)
+    product_factory(name="Ultrabook", category=child, price=1000, discount_price=900)
+    product_factory(name="Cable", category=root, price=10)
+    build_catalog_snapshot()
+
+    response = snapshot_client.get(reverse("catalog_snapshot"))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "application/gzip"
+    catalog = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+    assert catalog["categories"][0]["name"] == "Electronics"
+    assert catalog["categories"][0]["subcategories"][0]["name"] == "Laptops"
+    prices = {product["name"]: product["effective_price"] for product in catalog["products"]}
+    assert prices == {"Ultrabook": "900.00", "Cable": "10.00"}
+
+
+@pytest.mark.django_db
+def test_snapshot_is_only_rewritten_when_catalog_changes(disk_snapshots, product_factory):
+    product = product_factory(price=100)
+    first = build_catalog_snapshot()
+
+    assert build_catalog_snapshot()["etag"] == first["etag"]
+
+    product.price = 120
+    product.save()
+    assert build_catalog_snapshot()["etag"] != first["etag"]
+
+
+@pytest.mark.django_db
+def test_snapshot_matching_etag_returns_not_modified(disk_snapshots, snapshot_client, product_factory):
+    product_factory()
+    meta = build_catalog_snapshot()
+
+    response = snapshot_client.get(reverse("catalog_snapshot"), HTTP_IF_NONE_MATCH=f'"{meta["etag"]}"')
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == f'"{meta["etag"]}"'
+
+
+@pytest.mark.django_db
+def test_snapshot_range_request_returns_partial_content(disk_snapshots, snapshot_client, product_factory):
+    product_factory()
+    meta = build_catalog_snapshot()
+    full = disk_snapshots.read(meta, 0, meta["size"] - 1)
+
+    response = snapshot_client.get(reverse("catalog_snapshot"), HTTP_RANGE="bytes=10-19")
+
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response["Content-Range"] == f"bytes 10-19/{meta['size']}"
+    assert response.content == full[10:20]
+
+
+@pytest.mark.django_db
+def test_snapshot_unsatisfiable_range(disk_snapshots, snapshot_client, product_factory):
+    product_factory()
+    meta = build_catalog_snapshot()
+
+    response = snapshot_client.get(reverse("catalog_snapshot"), HTTP_RANGE=f"bytes={meta['size']}-")
+
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+
+@pytest.mark.django_db
+def test_snapshot_not_built_yet(disk_snapshots, snapshot_client):
+    response = snapshot_client.get(reverse("catalog_snapshot"))
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+@pytest.mark.django_db
+def test_stock_only_save_schedules_slower_rebuild(
+    product_factory, django_capture_on_commit_callbacks, settings
+):
+    settings.CATALOG_SNAPSHOT_DEBOUNCE = 5
+    settings.CATALOG_SNAPSHOT_STOCK_DEBOUNCE = 60
+    product = product_factory(stock=10)
+    clear_scheduled_snapshot()
+
+    with patch("shop.tasks.build_catalog_snapshot_task.apply_async") as mock_apply_async:
+        with django_capture_on_commit_callbacks(execute=True):
+            product.reduce_stock(1)
+        with django_capture_on_commit_callbacks(execute=True):
+            product.reduce_stock(1)
+        mock_apply_async.assert_called_once_with(countdown=60)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.price = 120
+            product.save()
+        mock_apply_async.assert_called_with(countdown=5)
+
+    clear_scheduled_snapshot()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("range_header", [None, "bytes=0-9"])
+def test_snapshot_file_deleted_from_disk_is_rebuilt(
+    disk_snapshots, snapshot_client, product_factory, range_header
+):
+    product_factory()
+    meta = build_catalog_snapshot()
+    os.remove(disk_snapshots._path(meta["etag"]))
+    headers = {"HTTP_RANGE": range_header} if range_header else {}
+
+    with patch("shop.views.schedule_catalog_snapshot") as schedule:
+        response = snapshot_client.get(reverse("catalog_snapshot"), **headers)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response["Retry-After"] == "10"
+    schedule.assert_called_once_with()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("range_header", [None, "bytes=0-9"])
+def test_snapshot_evicted_from_redis_is_rebuilt(snapshot_client, settings, range_header):
+    settings.CATALOG_SNAPSHOT_STORAGE = "redis"
+    store = RedisSnapshotStore(prefix="test_snapshot")
+    # metadata left behind by a build whose body was evicted or expired
+    get_redis().set("test_snapshot:meta", json.dumps({"etag": "gone", "size": 100}))
+    headers = {"HTTP_RANGE": range_header} if range_header else {}
+
+    try:
+        with (
+            patch("shop.views.get_snapshot_store", return_value=store),
+            patch("shop.views.schedule_catalog_snapshot") as schedule,
+        ):
+            response = snapshot_client.get(reverse("catalog_snapshot"), **headers)
+    finally:
+        get_redis().delete("test_snapshot:meta")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response["Retry-After"] == "10"
+    schedule.assert_called_once_with()
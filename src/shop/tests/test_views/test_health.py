@@ -0,0 +1,83 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from shop import health
+
+
+@pytest.fixture(autouse=True)
+def fresh_readiness(monkeypatch):
+    monkeypatch.setattr(health, "_readiness", None)
+    monkeypatch.setattr(health, "_migrations_applied", False)
+
+
+def test_liveness_does_no_io(client):
+    # no django_db mark: any query would fail the test
+    with patch("shop.health.run_checks") as run_checks:
+        response = client.get("/health/", HTTP_HOST="10.0.0.7")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    run_checks.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_ready_when_database_redis_and_migrations_are_ok(client):
+    response = client.get("/health/ready/", HTTP_HOST="10.0.0.7")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "ready",
+        "checks": {"database": "ok", "redis": "ok", "migrations": "ok"},
+    }
+    assert response["Cache-Control"] == "no-store"
+
+
+@pytest.mark.django_db
+def test_not_ready_when_redis_is_down(client):
+    with patch.dict(health.CHECKS, redis=Mock(side_effect=ConnectionError("refused"))):
+        response = client.get("/health/ready/")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["redis"] == "failed"
+    assert response.json()["checks"]["database"] == "ok"
+
+
+@pytest.mark.django_db
+def test_not_ready_while_migrations_are_pending(client):
+    with patch("django.db.migrations.executor.MigrationExecutor.migration_plan", return_value=[("m", False)]):
+        response = client.get("/health/ready/")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["migrations"] == "failed"
+
+
+@pytest.mark.django_db
+def test_readiness_is_cached(client, settings, django_assert_num_queries):
+    client.get("/health/ready/")
+
+    with django_assert_num_queries(0), patch("shop.health.run_checks") as run_checks:
+        for _ in range(5):
+            assert client.get("/health/ready/").status_code == 200
+
+    run_checks.assert_not_called()
+
+
+def test_readiness_is_checked_again_once_expired():
+    cache = health.ReadinessCache(ttl=0)
+
+    with patch("shop.health.run_checks", side_effect=[(False, {}), (True, {})]):
+        assert cache.get() == (False, {})
+        assert cache.get() == (True, {})
+
+
+def test_concurrent_probe_gets_last_result_while_checks_run():
+    cache = health.ReadinessCache(ttl=0)
+    with patch("shop.health.run_checks", return_value=(True, {"database": "ok"})):
+        cache.get()
+
+    with cache._lock, patch("shop.health.run_checks") as run_checks:
+        assert cache.get() == (True, {"database": "ok"})
+
+    run_checks.assert_not_called()
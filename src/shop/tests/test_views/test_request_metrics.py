@@ -0,0 +1,84 @@
+import pytest
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from shop.auth_cache import get_cached_user
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def request_count(view, method="GET", status="200"):
+    return sample("ekiosk_http_request_seconds_count", {"view": view, "method": method, "status": status})
+
+
+@pytest.mark.django_db
+def test_request_is_timed_per_viewset_action(user_admin, product_factory):
+    product_factory()
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+    before = request_count("ProductViewSet.list")
+    queries_before = sample("ekiosk_http_request_queries_sum", {"view": "ProductViewSet.list"})
+
+    response = client.get(reverse("product-list"))
+
+    assert response.status_code == 200
+    assert request_count("ProductViewSet.list") == before + 1
+    assert sample("ekiosk_http_request_queries_sum", {"view": "ProductViewSet.list"}) > queries_before
+    assert sample("ekiosk_http_request_db_seconds_count", {"view": "ProductViewSet.list"}) >= 1
+
+
+@pytest.mark.django_db
+def test_detail_action_and_status_are_labelled(user_admin, product_factory):
+    product = product_factory()
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+    before = request_count("ProductViewSet.partial_update", "PATCH", "400")
+
+    client.patch(reverse("product-detail", args=[product.id]), {"price": "not a price"}, format="json")
+
+    assert request_count("ProductViewSet.partial_update", "PATCH", "400") == before + 1
+
+
+@pytest.mark.django_db
+def test_unknown_urls_share_one_label():
+    client = APIClient()
+    before = request_count("unmatched", status="404")
+
+    client.get("/no-such-page/1")
+    client.get("/no-such-page/2")
+
+    assert request_count("unmatched", status="404") == before + 2
+
+
+@pytest.mark.django_db
+def test_no_requests_left_in_progress(user_admin):
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+
+    client.get(reverse("product-list"))
+
+    assert sample("ekiosk_http_requests_in_progress", {}) == 0
+
+
+@pytest.mark.django_db
+def test_cache_hits_and_misses_are_counted(user_customer):
+    hits = sample("ekiosk_cache_requests_total", {"cache": "user", "result": "hit"})
+    misses = sample("ekiosk_cache_requests_total", {"cache": "user", "result": "miss"})
+
+    get_cached_user(user_customer.pk)
+    get_cached_user(user_customer.pk)
+
+    assert sample("ekiosk_cache_requests_total", {"cache": "user", "result": "miss"}) == misses + 1
+    assert sample("ekiosk_cache_requests_total", {"cache": "user", "result": "hit"}) == hits + 1
+
+
+def test_metrics_endpoint_serves_request_metrics(client, settings):
+    settings.METRICS_TOKEN = "scrape-secret"
+    response = client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-secret")
+
+    assert response.status_code == 200
+    assert b"ekiosk_http_request_seconds" in response.content
+    assert b"ekiosk_celery_task_seconds" in response.content
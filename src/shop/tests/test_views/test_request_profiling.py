@@ -0,0 +1,91 @@
+import os
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.profiling import load_samples, normalize_sql
+
+
+@pytest.fixture
+def profiles_dir(settings, tmp_path):
+    settings.REQUEST_PROFILING_DIR = str(tmp_path)
+    settings.REQUEST_PROFILING_TOKEN = "profile-me"
+    settings.REQUEST_PROFILING_RATE = 0
+    return tmp_path
+
+
+@pytest.fixture
+def admin_client(user_admin):
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+    return client
+
+
+@pytest.mark.django_db
+def test_requests_are_not_profiled_by_default(profiles_dir, admin_client):
+    admin_client.get(reverse("product-list"))
+
+    assert load_samples(profiles_dir) == []
+
+
+@pytest.mark.django_db
+def test_request_with_token_is_profiled_with_its_sql(
+    profiles_dir, admin_client, category_factory, product_factory
+):
+    category = category_factory()
+    product_factory(category=category)
+
+    response = admin_client.get(
+        reverse("category-calculate-average-price", args=[category.id]) + "?secret=1",
+        HTTP_X_PROFILE_TOKEN="profile-me",
+    )
+
+    assert response.status_code == 200
+    [(profile_path, sample)] = load_samples(profiles_dir)
+    assert os.path.dirname(profile_path) == str(profiles_dir / "CategoryViewSet.calculate_average_price")
+    assert sample["path"] == f"/api/v1/categories/{category.id}/calculate_average_price/"
+    assert sample["status"] == 200
+    assert any('FROM "shop_product"' in query["sql"] for query in sample["queries"])
+    assert os.path.getsize(profile_path) > 0
+
+
+@pytest.mark.django_db
+def test_wrong_token_is_not_profiled(profiles_dir, admin_client):
+    admin_client.get(reverse("product-list"), HTTP_X_PROFILE_TOKEN="guess")
+
+    assert load_samples(profiles_dir) == []
+
+
+@pytest.mark.django_db
+def test_sampled_requests_are_profiled(profiles_dir, admin_client, settings):
+    settings.REQUEST_PROFILING_RATE = 1
+
+    admin_client.get(reverse("product-list"))
+    admin_client.get(reverse("product-list"))
+
+    samples = load_samples(profiles_dir, view="ProductViewSet.list")
+    assert len(samples) == 2
+
+
+@pytest.mark.django_db
+def test_sql_kept_per_request_is_capped(profiles_dir, admin_client, settings, product_factory):
+    settings.REQUEST_PROFILING_RATE = 1
+    settings.REQUEST_PROFILING_MAX_QUERIES = 1
+    product_factory()
+    product_factory()
+
+    admin_client.get(reverse("product-list"))
+
+    [(_, sample)] = load_samples(profiles_dir)
+    assert len(sample["queries"]) == 1
+    assert sample["dropped_queries"] >= 1
+
+
+def test_normalize_sql_folds_lists_of_any_length():
+    short = 'SELECT * FROM "shop_product" WHERE "shop_product"."id" IN (%s, %s)'
+    long = 'SELECT * FROM "shop_product" WHERE "shop_product"."id" IN (%s, %s, %s, %s)'
+    insert = 'INSERT INTO "shop_orderitem" ("a", "b") VALUES (%s, %s), (%s, %s), (%s, %s)'
+
+    assert normalize_sql(short) == normalize_sql(long)
+    assert normalize_sql(insert) == 'INSERT INTO "shop_orderitem" ("a", "b") VALUES (%s, %s), ...'
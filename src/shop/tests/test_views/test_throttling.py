@@ -0,0 +1,98 @@
+import io
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from shop.models import Order, User
+
+
+@pytest.fixture
+def throttle_rates(settings):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            "order_create.customer": "2/min",
+            "order_create.admin": "4/min",
+            "bulk_upload.admin": "1/hour",
+        },
+    }
+
+
+def place_order(user, product):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client.post(
+        reverse("order-list"),
+        data={"customer": user.id, "order_items": [{"product": product.id, "quantity": 1}]},
+        format="json",
+    )
+
+
+@pytest.mark.django_db
+def test_customer_order_placement_is_throttled(throttle_rates, user_customer, product_factory):
+    product = product_factory(stock=100)
+
+    statuses = [place_order(user_customer, product).status_code for _ in range(3)]
+
+    assert statuses == [status.HTTP_201_CREATED, status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS]
+    assert Order.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_throttled_response_has_retry_after(throttle_rates, user_customer, product_factory):
+    product = product_factory(stock=100)
+    place_order(user_customer, product)
+    place_order(user_customer, product)
+
+    response = place_order(user_customer, product)
+
+    # one token refills every 30 seconds at 2/min
+    assert 0 < int(response["Retry-After"]) <= 30
+
+
+@pytest.mark.django_db
+def test_limits_are_per_user_and_role(throttle_rates, user_customer, user_admin, product_factory):
+    product = product_factory(stock=100)
+    other_customer = User.objects.create(email="other@example.com", role=User.CUSTOMER)
+    place_order(user_customer, product)
+    place_order(user_customer, product)
+
+    assert place_order(other_customer, product).status_code == status.HTTP_201_CREATED
+    assert [place_order(user_admin, product).status_code for _ in range(5)].count(
+        status.HTTP_429_TOO_MANY_REQUESTS
+    ) == 1
+
+
+@pytest.mark.django_db
+def test_reads_are_not_throttled(throttle_rates, user_customer):
+    client = APIClient()
+    client.force_authenticate(user=user_customer)
+
+    assert all(client.get(reverse("order-list")).status_code == status.HTTP_200_OK for _ in range(5))
+
+
+@pytest.mark.django_db
+def test_bulk_upload_is_throttled(throttle_rates, user_admin):
+    client = APIClient()
+    client.force_authenticate(user=user_admin)
+
+    def upload():
+        csv_file = io.BytesIO(b"name,stock,price,category\nProduct 1,10,100.0,Category A")
+        csv_file.name = "products.csv"
+        return client.post(reverse("product-bulk-upload"), {"file": csv_file}, format="multipart")
+
+    assert upload().status_code == status.HTTP_201_CREATED
+    assert upload().status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.mark.django_db
+def test_throttle_fails_open_without_redis(throttle_rates, user_customer, product_factory):
+    product = product_factory(stock=100)
+
+    with patch("shop.throttling.get_token_bucket_script", side_effect=ConnectionError("redis down")):
+        statuses = [place_order(user_customer, product).status_code for _ in range(3)]
+
+    assert statuses == [status.HTTP_201_CREATED] * 3
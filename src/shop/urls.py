@@ -1,9 +1,12 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (
+    CatalogSnapshotView,
     CategoryViewSet,
     CustomOIDCCallbackView,
+    DatabasePoolStatsView,
     OrderViewSet,
     ProductViewSet,
     UpdateProfileView,
@@ -19,4 +22,12 @@ urlpatterns = [
     path("oidc/callback/", CustomOIDCCallbackView.as_view(), name="oidc_callback"),
     path("oidc/", include("mozilla_django_oidc.urls")),
     path("update-profile/", UpdateProfileView.as_view(), name="update_profile"),
+    path("catalog/snapshot/", CatalogSnapshotView.as_view(), name="catalog_snapshot"),
+    path("db-pool-stats/", DatabasePoolStatsView.as_view(), name="db_pool_stats"),
+    # async read endpoints, served without a thread per request under ASGI
+    path("async/products/", async_views.product_list, name="async_product_list"),
+    path("async/products/<int:pk>/", async_views.product_detail, name="async_product_detail"),
+    path("async/categories/", async_views.category_list, name="async_category_list"),
+    path("async/categories/<int:pk>/", async_views.category_detail, name="async_category_detail"),
+    path("async/orders/<int:pk>/", async_views.order_detail, name="async_order_detail"),
 ]
@@ -1,8 +1,10 @@
 import csv
 import io
+import logging
 
 from django.contrib.auth import get_user_model
 from django.db.models import Avg, Q
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import redirect
 from mozilla_django_oidc.views import OIDCAuthenticationCallbackView
 from rest_framework import status, viewsets
@@ -12,12 +14,26 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .catalog_snapshot import (
+    SnapshotMissing,
+    get_snapshot_store,
+    parse_byte_range,
+    schedule_catalog_snapshot,
+)
+from .db_pool import get_pool_stats
 from .models import Category, Order, Product
-from .permissions import IsAdminOrReadOnly, IsOrderOwnerOrAdminWithLimitedUpdate
+from .permissions import (
+    IsAdmin,
+    IsAdminOrReadOnly,
+    IsOrderOwnerOrAdminWithLimitedUpdate,
+)
 from .serializers import CategorySerializer, OrderSerializer, ProductSerializer
+from .throttling import BulkUploadThrottle, OrderCreateThrottle
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class ProductViewSet(viewsets.ModelViewSet):
     """
@@ -28,7 +44,12 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
 
-    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser])
+    @action(
+        detail=False,
+        methods=["post"],
+        parser_classes=[MultiPartParser],
+        throttle_classes=[BulkUploadThrottle],
+    )
     def bulk_upload(self, request):
         """Bulk upload products from a CSV file."""
         file = request.FILES.get("file")
@@ -152,6 +173,83 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Admins can see all orders
         return Order.objects.all()
 
+    def get_throttles(self):
+        """Placing orders takes row locks on products, so it is rate limited"""
+        if self.action == "create":
+            return [OrderCreateThrottle()]
+        return super().get_throttles()
+
+
+class CatalogSnapshotView(APIView):
+    """
+    Serves the precomputed, compressed catalog snapshot to kiosks on cold start.
+    Supports conditional requests (ETag) and single byte ranges so interrupted downloads can resume.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        store = get_snapshot_store()
+        meta = store.load_meta()
+        if meta is None:
+            return self.snapshot_not_ready()
+
+        etag = f'"{meta["etag"]}"'
+        headers = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, no-cache",
+            "X-Catalog-Version": meta["etag"],
+        }
+
+        if etag in request.headers.get("If-None-Match", ""):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        size = meta["size"]
+        byte_range = None
+        range_header = request.headers.get("Range")
+        # a stale If-Range means the client holds a different snapshot, so it gets the full new one
+        if range_header and request.headers.get("If-Range", etag) == etag:
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                headers["Content-Range"] = f"bytes */{size}"
+                return HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+
+        try:
+            if byte_range:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                return HttpResponse(
+                    store.read(meta, start, end),
+                    status=status.HTTP_206_PARTIAL_CONTENT,
+                    content_type="application/gzip",
+                    headers=headers,
+                )
+
+            snapshot_file = store.open(meta)
+            if snapshot_file:
+                # file responses go through the server's file wrapper (sendfile) instead of Python
+                response = FileResponse(snapshot_file, content_type="application/gzip", headers=headers)
+            else:
+                response = HttpResponse(
+                    store.read(meta, 0, size - 1), content_type="application/gzip", headers=headers
+                )
+        except SnapshotMissing:
+            logger.warning(f"Catalog snapshot {meta['etag']} has metadata but no body, rebuilding it.")
+            return self.snapshot_not_ready()
+        response["Content-Length"] = size
+        return response
+
+    def snapshot_not_ready(self):
+        """Asks the kiosk to retry while a snapshot is (re)built"""
+        schedule_catalog_snapshot()
+        return Response(
+            {"error": "The catalog snapshot is being built. Please retry shortly."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "10"},
+        )
+
 
 class CustomOIDCCallbackView(OIDCAuthenticationCallbackView):
     def get(self, request, *args, **kwargs):
@@ -183,3 +281,12 @@ class UpdateProfileView(APIView):
         user.save()
 
         return Response({"message": "Profile updated successfully."}, status=status.HTTP_200_OK)
+
+
+class DatabasePoolStatsView(APIView):
+    """Reports database connection reuse and pool counters of the worker process serving the request."""
+
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response(get_pool_stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,66 @@
+"""
+Start-up warm-up for API processes, run by the gunicorn hooks in config/gunicorn.py.
+
+Django imports the URLconf, and with it every view, serializer and authentication class,
+only when the first request arrives. import_application() does it up front. With preload it
+runs once in the gunicorn master, so the workers are forked with everything imported.
+
+prime_caches() runs in each worker before it accepts requests. It loads the signing keys
+JWTAuthentication verifies tokens against, from the copy another worker shared when there is one,
+and the catalog snapshot kiosks download on cold start, queueing a build if there is none yet.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def import_application():
+    """Imports the modules Django would load on the first request. Does no I/O, so it is safe before a fork"""
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+
+    # walking the URL patterns imports every included URLconf and view module
+    get_resolver().reverse_dict
+    # authentication, permission, throttle, renderer and parser classes
+    for name in api_settings.import_strings:
+        getattr(api_settings, name)
+
+
+def prime_jwks():
+    from rest_framework.settings import api_settings
+
+    from .authentication import JWTAuthentication
+    from .jwks import get_jwks_cache
+
+    if JWTAuthentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        get_jwks_cache().refresh()
+
+
+def prime_catalog_snapshot():
+    from .catalog_snapshot import get_snapshot_store, schedule_catalog_snapshot
+
+    store = get_snapshot_store()
+    meta = store.load_meta()
+    if meta is None:
+        schedule_catalog_snapshot()
+    else:
+        store.prime(meta)
+
+
+WARMERS = {"jwks": prime_jwks, "catalog_snapshot": prime_catalog_snapshot}
+
+
+def prime_caches():
+    """
+    Fills this process's caches. A failing step is logged and skipped:
+    the worker still starts, its first requests are just slower.
+    """
+    started = time.perf_counter()
+    for name, warm in WARMERS.items():
+        try:
+            warm()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed. Exception: {e}")
+    logger.info(f"Worker caches primed in {(time.perf_counter() - started) * 1000:.0f}ms.")